@@ -0,0 +1,206 @@
+import os
+import json
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from utils.config import assistant_config, setting, provide_client
+from utils.runtime import build_assistant, warm_up_assistant
+from utils.coalescer import AdmissionGate, RequestCoalescer
+from utils.response_cache import normalize_query
+from utils.session_store import is_follow_up
+from utils.telemetry import REGISTRY, Trace, configure_sinks
+from essentials.uploaddb import ingest_csv, acquire_ingest_lock
+from llm.Errors import ServiceOverloadedError
+
+#Headless service: python api.py (or uvicorn api:app --workers N); every worker process builds its own assistant
+
+
+class AskRequest(BaseModel):
+    question: str
+    by_sentence: bool = False
+    #The client's session summary and last turns; the service itself keeps no per-user state
+    conversation: str = None
+
+
+def _summary(trace: Trace, timings: dict) -> dict:
+    return {
+        "trace_id": trace.trace_id,
+        "route": trace.attrs.get("route", "cache"),
+        "models": trace.attrs.get("models", {}),
+        "timings": timings,
+        "stages": trace.breakdown(),
+        "tokens": sum(value for name, value in trace.counters.items() if name.startswith("llm_tokens")),
+        "errors": trace.errors,
+    }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_sinks(setting("TELEMETRY_SINKS"))
+    connections = int(setting("API_HTTP_CONNECTIONS"))
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    http_client = httpx.Client(limits=limits)
+    http_async_client = httpx.AsyncClient(limits=limits)
+    provide_client("http_client", http_client)
+    provide_client("http_async_client", http_async_client)
+
+    assistant = await asyncio.to_thread(
+        build_assistant, assistant_config(), http_client, http_async_client, int(setting("API_REDIS_CONNECTIONS"))
+    )
+    await asyncio.to_thread(warm_up_assistant, assistant)
+    app.state.assistant = assistant
+    app.state.gate = AdmissionGate(
+        max_concurrent=int(setting("API_MAX_CONCURRENT")),
+        max_waiting=int(setting("API_MAX_QUEUE")),
+        wait_timeout=float(setting("API_QUEUE_TIMEOUT"))
+    )
+    app.state.coalescer = RequestCoalescer()
+    REGISTRY.register_collector("admission", app.state.gate.stats)
+    REGISTRY.register_collector("coalescer", app.state.coalescer.stats)
+    try:
+        yield
+    finally:
+        if assistant.graph_executor is not None:
+            await assistant.graph_executor.close()
+        await http_async_client.aclose()
+        http_client.close()
+        if assistant.redis_pool is not None:
+            assistant.redis_pool.disconnect()
+
+
+app = FastAPI(title="Royal Enfield Assistant", lifespan=lifespan)
+
+
+#Overload is reported as 503 with Retry-After so load balancers and clients back off
+@app.exception_handler(ServiceOverloadedError)
+async def overloaded(request: Request, exc: ServiceOverloadedError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+#Identical standalone questions share a run across sessions; a follow-up only within its own conversation
+def _flight_key(kind: str, body: AskRequest, question: str) -> tuple:
+    follow_up = body.conversation and is_follow_up(question)
+    return (kind, body.by_sentence, normalize_query(question), hash(body.conversation) if follow_up else None)
+
+
+def _question(body: AskRequest) -> str:
+    question = body.question.strip()
+    if not question:
+        raise HTTPException(status_code=422, detail="question must not be empty")
+    return question
+
+
+@app.post("/ask")
+async def ask(body: AskRequest, request: Request):
+    state = request.app.state
+    question = _question(body)
+
+    async def run():
+        async with state.gate.slot():
+            trace = Trace("api_ask", query=question)
+            answer = await state.assistant.processed_query(question, trace=trace, conversation=body.conversation)
+            trace.finish()
+            return answer, _summary(trace, {})
+
+    (answer, summary), coalesced = await state.coalescer.run(_flight_key("ask", body, question), run)
+    if answer is None:
+        raise HTTPException(status_code=502, detail={"errors": summary["errors"]})
+    return {"answer": answer, "coalesced": coalesced, **summary}
+
+
+#NDJSON: {"delta": ...} per chunk, then {"done": true, ...timings and stages} or {"error": ...}
+@app.post("/ask/stream")
+async def ask_stream(body: AskRequest, request: Request):
+    state = request.app.state
+    question = _question(body)
+    if state.gate.saturated():
+        raise ServiceOverloadedError(f"{state.gate.active} running and {state.gate.waiting} queued")
+
+    async def produce(meta):
+        async with state.gate.slot():
+            trace = Trace("api_stream", query=question)
+            timings = {}
+            async for chunk in state.assistant.stream_query(
+                question, by_sentence=body.by_sentence, timings=timings, trace=trace, conversation=body.conversation
+            ):
+                yield chunk
+            trace.finish()
+            meta.update(_summary(trace, timings))
+
+    flight, coalesced = state.coalescer.stream(_flight_key("stream", body, question), produce)
+
+    async def events():
+        try:
+            async for chunk in flight.subscribe():
+                yield json.dumps({"delta": chunk}) + "\n"
+            yield json.dumps({"done": True, "coalesced": coalesced, **flight.meta}, default=str) + "\n"
+        except ServiceOverloadedError as e:
+            yield json.dumps({"error": str(e), "overloaded": True}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+#Raw CSV body; a Redis lock keeps two workers from ingesting the same source at once
+@app.post("/ingest")
+async def ingest(request: Request, source: str, key_column: str = None):
+    redis_client = request.app.state.assistant.redis_cache
+    index_name = setting("VECTOR_INDEX")
+    lock_key = await asyncio.to_thread(acquire_ingest_lock, redis_client, index_name, source)
+    if lock_key is None:
+        raise HTTPException(status_code=409, detail=f"{source} is already being ingested")
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp_file:
+            tmp_path = tmp_file.name
+            async for block in request.stream():
+                tmp_file.write(block)
+        report = await asyncio.to_thread(
+            ingest_csv,
+            csv_path=tmp_path,
+            redis_url=setting("REDIS_URL", required=True),
+            index_name=index_name,
+            source=source,
+            key_column=key_column
+        )
+    finally:
+        await asyncio.to_thread(redis_client.delete, lock_key)
+        if tmp_path:
+            os.unlink(tmp_path)
+    if report is None:
+        raise HTTPException(status_code=500, detail="ingestion failed, see the service log")
+    return report
+
+
+@app.get("/health")
+async def health(request: Request):
+    state = request.app.state
+    status = {"redis": False, "admission": state.gate.stats(), "coalescer": state.coalescer.stats()}
+    try:
+        status["redis"] = bool(await asyncio.to_thread(state.assistant.redis_cache.ping))
+    except Exception as e:
+        print(f"The Redis Health Check Error : {e}")
+    return JSONResponse(status_code=200 if status["redis"] else 503, content=status)
+
+
+#Only the metrics of the worker that served the request; with API_WORKERS > 1 scrape the ports of a
+#"prometheus:first-last" sink instead, one per worker
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "api:app",
+        host=setting("API_HOST"),
+        port=int(setting("API_PORT")),
+        #One worker per core by default; each has its own event loop, assistant and connection pools
+        workers=int(setting("API_WORKERS") or os.cpu_count() or 1)
+    )
@@ -1,14 +1,16 @@
+import io
+import csv
+import uuid
 import tempfile
-import re
-import asyncio
 import streamlit as st
-from dotenv import load_dotenv
-from utils.tts import speaker_stream
-from utils.assistant_agent import RoyalEnfieldBikeAssistant
-from utils.utilsreq import clean_text
-from essentials.uploaddb import ingest_csv
-# Load environment variables
-load_dotenv()
+from utils.tts import SpeechPipeline, audio_format, get_speech_executor
+from utils.audio_cache import get_audio_store
+from utils.runtime import get_runtime
+from utils.telemetry import Trace
+from utils.config import assistant_config, setting, get_client
+from utils.api_client import AssistantClient
+from utils.session_store import SessionHistory
+from essentials.uploaddb import ingest_csv, acquire_ingest_lock, guess_key_column
 
 # Set Streamlit page configuration
 st.set_page_config(
@@ -17,11 +19,63 @@ st.set_page_config(
     initial_sidebar_state="collapsed"  
 )
 
-# Initialize session state variables
-if "query_history" not in st.session_state:
-    st.session_state.query_history = []
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# "gtts" (online, MP3) or "pyttsx3" (offline, WAV)
+TTS_ENGINE = "gtts"
+
+# When set, the app is a thin client of the headless service (api.py) instead of running the pipeline itself
+API_URL = setting("ASSISTANT_API_URL")
+
+@st.cache_resource
+def load_client():
+    return AssistantClient(API_URL)
+
+# One synthesis pool per process, reused by every message instead of a new pool each time
+@st.cache_resource
+def load_speech_executor():
+    return get_speech_executor(TTS_ENGINE)
+
+# Shared assistant runtime, built once per process and reused across sessions and reruns
+@st.cache_resource(show_spinner="Starting assistant...")
+def load_runtime():
+    # Settings come from the environment, .env or .streamlit/secrets.toml, in that order
+    runtime = get_runtime(
+        assistant_config=assistant_config(),
+        redis_max_connections=16
+    )
+    runtime.warm_up()
+    return runtime
+
+# Messages per "show earlier" page in the chat and question cards per sidebar page
+CHAT_PAGE_SIZE = 10
+SIDEBAR_PAGE_SIZE = 5
+
+# Older turns are kept in Redis; without it the session keeps only its recent window and summary
+def session_redis():
+    try:
+        if API_URL:
+            return get_client("redis")
+        return getattr(load_runtime().assistant, "redis_cache", None)
+    except Exception as e:
+        print(f"The Session Store Connection Error : {e}")
+        return None
+
+# Initialize session state variables; only the recent window of the conversation is held here
+if "history" not in st.session_state:
+    st.session_state.history = SessionHistory(
+        session_id=uuid.uuid4().hex,
+        redis_client=session_redis(),
+        window=int(setting("SESSION_WINDOW")),
+        ttl=int(setting("SESSION_TTL"))
+    )
+    st.session_state.earlier_pages = 0
+    st.session_state.sidebar_page = 0
+history = st.session_state.history
+
+def show_earlier():
+    st.session_state.earlier_pages += 1
+
+def turn_sidebar_page(step):
+    st.session_state.sidebar_page = max(0, st.session_state.sidebar_page + step)
 
 st.markdown("""
     <style>
@@ -76,116 +130,199 @@ st.markdown("""
 # Main Title
 st.title("🚲 Conversational Assistant")
 
-# Display chat messages from history on app rerun
-for message in st.session_state.messages: 
+# Display chat messages from history on app rerun; session state only holds audio store keys
+audio_store = get_audio_store()
+
+# Earlier messages are read back from Redis a page at a time, and only once asked for, as plain text
+older = history.older_count()
+hidden = older - st.session_state.earlier_pages * CHAT_PAGE_SIZE
+if hidden > 0:
+    st.button(f"Show earlier messages ({hidden} more)", on_click=show_earlier)
+for page in reversed(range(st.session_state.earlier_pages)):
+    for message in history.older_page(page, CHAT_PAGE_SIZE):
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+# The recent window is the only part rendered with audio players, so rerun cost does not grow with the chat
+for message in history.recent: 
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
-        if message.get("audio"):
-            st.audio(message["audio"], format="audio/mp3", autoplay=True)
+        if message.get("audio") and audio_store.contains(message["audio"]):
+            st.audio(audio_store.path(message["audio"]), format=audio_format(TTS_ENGINE))
 
 # User input and chatbot logic
 if prompt := st.chat_input("Ask your question:"):
     
+    # Rolling summary plus the last turns, taken before this question joins the history
+    conversation = history.context()
+
     # Append user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    history.append({"role": "user", "content": prompt})
     
     # Display user message in chat message container
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Get assistant response
-    with st.spinner("Assistant is thinking..."):
-        try:
-            agent = RoyalEnfieldBikeAssistant(
-                llm_model="gpt-4",
-                openai_api_key=st.secrets["openai"]["api_key"],
-                tavily_api_key=st.secrets["tavily"]["api_key"],
-                redis_url=st.secrets["redis"]["REDIS_URL"],
-                redis_cache_host=st.secrets["redis"]["REDIS_HOST"],
-                redis_port=17094,
-                redis_cache_password=st.secrets["redis"]["REDIS_PASSWORD"],
-                redis_cache_db=0,
-                vector_index="bike_index"
-            )
-            
-            results = asyncio.run(agent.processed_query(user_query=prompt))
-            
-            content = None
-            if isinstance(results, dict) and "content" in results:
-                content = results["content"]
-            else:
-                if isinstance(results, str):
-                    content = re.split(r"additional_kwargs", results, 1)[0]
-                    content = clean_text(content)
-                else:
-                    content = clean_text(str(results))
-            
-            if content and content.lower().startswith("content"):
-                content = content[7:].strip()
-            
-            st.session_state.query_history.append((prompt, content))
-            
-            # Display assistant message
-            with st.chat_message("assistant"):
-                if content and str(content).strip():
-                    st.markdown(content)
-                    audio_buf = speaker_stream(content)
-                    st.audio(audio_buf, format="audio/mp3", autoplay=True)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": content,
-                        "audio": audio_buf
-                    })
+    # Stream the assistant response into the chat message as it is generated
+    try:
+        timings = {}
+        # One trace per message collects retrieval, generation and speech spans for the sidebar breakdown
+        trace = Trace("message", query=prompt)
+        # Speech synthesis starts sentence by sentence while the text is still streaming
+        speech = SpeechPipeline(engine=TTS_ENGINE, trace=trace, executor=load_speech_executor())
+
+        def speak_along(fragments):
+            for fragment in fragments:
+                speech.feed(fragment)
+                yield fragment
+
+        with st.chat_message("assistant"):
+            with st.spinner("Assistant is thinking..."):
+                if API_URL:
+                    answer_stream = load_client().ask_stream(prompt, timings=timings, conversation=conversation)
                 else:
-                    no_results_text = "No results found."
-                    st.markdown(no_results_text)
-                    audio_buf = speaker_stream(no_results_text)
-                    st.audio(audio_buf, format="audio/mp3", autoplay=True)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": no_results_text,
-                        "audio": audio_buf
-                    })
-        except Exception as e:
-            with st.chat_message("assistant"):
-                error_message = f"Error: {str(e)}"
-                st.markdown(error_message)
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": error_message,
-                    "audio": None
-                })
-            st.error(f"Unexpected error: {e}")
+                    answer_stream = load_runtime().ask_stream(prompt, timings=timings, trace=trace, conversation=conversation)
+                content = st.write_stream(speak_along(answer_stream))
+            if not (content and str(content).strip()):
+                content = "No results found."
+                speech.feed(content)
+                st.markdown(content)
+            if "time_to_first_token" in timings:
+                st.caption(
+                    f"First token in {timings['time_to_first_token']:.2f}s · "
+                    f"full answer in {timings['total_time']:.2f}s · "
+                    f"route: {timings.get('route', 'cache')}"
+                )
+            audio_key = speech.save(content)
+            st.audio(audio_store.path(audio_key), format=audio_format(TTS_ENGINE), autoplay=True)
+        trace.finish()
+        # In client mode retrieval and generation stages come from the service; speech stages are local
+        server = timings.get("server", {})
+
+        history.append({
+            "role": "assistant",
+            "content": content,
+            "audio": audio_key,
+            "trace": {
+                "query": prompt,
+                "total": trace.duration,
+                "route": server.get("route") or trace.attrs.get("route", "cache"),
+                "models": server.get("models") or trace.attrs.get("models", {}),
+                "stages": server.get("stages", []) + trace.breakdown(),
+                "tokens": server.get("tokens", 0) + sum(v for k, v in trace.counters.items() if k.startswith("llm_tokens")),
+                "errors": server.get("errors", []) + trace.errors
+            }
+        })
+    except Exception as e:
+        with st.chat_message("assistant"):
+            error_message = f"Error: {str(e)}"
+            st.markdown(error_message)
+            history.append({
+                "role": "assistant",
+                "content": error_message,
+                "audio": None
+            })
+        st.error(f"Unexpected error: {e}")
 
 # Sidebar for Query History
 with st.sidebar:
     st.markdown("<h3 class='sidebar-header'>🕘 Query History</h3>", unsafe_allow_html=True)
-    if st.session_state.query_history:
-        for i, (q, c) in enumerate(reversed(st.session_state.query_history), 1):
+    turns = history.turn_count()
+    if turns:
+        pages = -(-turns // SIDEBAR_PAGE_SIZE)
+        page = min(st.session_state.sidebar_page, pages - 1)
+        # Newest first; pages beyond the recent window are read from Redis
+        for i, (q, c) in enumerate(history.turns_page(page, SIDEBAR_PAGE_SIZE)):
             st.markdown(
-                f"<div class='query-card'><strong>Q{i}:</strong> {q}<br><em>A:</em> {c}</div>",
+                f"<div class='query-card'><strong>Q{turns - page * SIDEBAR_PAGE_SIZE - i}:</strong> {q}<br><em>A:</em> {c}</div>",
                 unsafe_allow_html=True
             )
+        if pages > 1:
+            newer, position, older_button = st.columns([1, 1, 1])
+            newer.button("◀ Newer", on_click=turn_sidebar_page, args=(-1,), disabled=page == 0)
+            position.caption(f"{page + 1} / {pages}")
+            older_button.button("Older ▶", on_click=turn_sidebar_page, args=(1,), disabled=page >= pages - 1)
+        if history.summary:
+            with st.expander("Conversation summary"):
+                st.caption(history.summary)
     else:
         st.write("No queries yet.")
+
+    # Per-message latency breakdown, newest first
+    st.markdown("<h3 class='sidebar-header'>⏱️ Latency Breakdown</h3>", unsafe_allow_html=True)
+    traced = [m["trace"] for m in history.recent if m.get("trace")]
+    if traced:
+        for i, t in enumerate(reversed(traced), 1):
+            with st.expander(f"Q{i}: {t['query'][:40]} · {t['total']:.2f}s", expanded=(i == 1)):
+                st.caption(f"route: {t['route']} · {t['tokens']:.0f} tokens")
+                # Model per LLM stage, next to that stage's latency below
+                if t.get("models"):
+                    st.caption(" · ".join(f"{stage}: {model}" for stage, model in t["models"].items()))
+                for stage in t["stages"]:
+                    indent = "&nbsp;" * 4 * stage["depth"]
+                    calls = f" ×{stage['calls']}" if stage["calls"] > 1 else ""
+                    st.markdown(f"{indent}`{stage['stage']}`{calls}: {stage['seconds']:.3f}s", unsafe_allow_html=True)
+                for error in t["errors"]:
+                    st.caption(f"⚠️ {error['stage']}: {error['error']}")
+    else:
+        st.write("No timings yet.")
     
     #Querying custom Data
     st.markdown("<h3 class='sidebar-header'>📤 Upload Custom Data</h3>", unsafe_allow_html=True)
     uploaded_file = st.file_uploader("Upload your CSV file", type=["csv"])
     if uploaded_file is not None:
+        data = uploaded_file.getvalue()
+        columns = next(csv.reader(io.StringIO(data.decode("utf-8-sig", errors="replace"))), [])
+        # A key column lets a re-upload recognise an edited row; without one an edit is a new row plus a removed one
+        no_key = "(none: match rows by content)"
+        options = [no_key] + columns
+        guess = guess_key_column(columns)
+        key_choice = st.selectbox("Row key column", options, index=options.index(guess) if guess else 0)
+        key_column = None if key_choice == no_key else key_choice
         with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp_file:
-            tmp_file.write(uploaded_file.read())
+            tmp_file.write(data)
             tmp_path = tmp_file.name
-        redis_url = st.secrets["redis"]["REDIS_URL"]
-        index_name = "bike_index"
+        progress_text = st.empty()
         with st.spinner("Vectorizing and uploading to Redis..."):
-            result = ingest_csv(
-                csv_path=tmp_path,
-                redis_url=redis_url,
-                index_name=index_name
-            )
-        if result:
-            st.success("CSV uploaded and vectorized successfully!")
+            if API_URL:
+                try:
+                    result = load_client().ingest(tmp_path, source=uploaded_file.name, key_column=key_column)
+                except Exception as e:
+                    print(f"The Service Ingest Error : {e}")
+                    result = None
+            else:
+                # Same lock as the service, so two sessions never append to one index from the same row count
+                lock_client = get_client("redis")
+                lock_key = acquire_ingest_lock(lock_client, setting("VECTOR_INDEX"), uploaded_file.name)
+                result = None
+                if lock_key:
+                    try:
+                        result = ingest_csv(
+                            csv_path=tmp_path,
+                            redis_url=setting("REDIS_URL", required=True),
+                            index_name=setting("VECTOR_INDEX"),
+                            source=uploaded_file.name,
+                            key_column=key_column,
+                            on_progress=lambda p: progress_text.caption(
+                                f"{p['rows']} rows · {p['rows_per_s']:.0f} rows/s · {p['embeddings_per_s']:.0f} embeddings/s"
+                            )
+                        )
+                    finally:
+                        lock_client.delete(lock_key)
+        progress_text.empty()
+        if not API_URL and not lock_key:
+            st.warning("Another upload is being ingested; try again when it finishes.")
+        elif result:
+            if key_column:
+                st.success(
+                    f"CSV synced: {result['added']} added, {result['updated']} updated, "
+                    f"{result['deleted']} deleted, {result['unchanged']} unchanged."
+                )
+            else:
+                st.success(
+                    f"CSV synced: {result['added']} added, {result['deleted']} deleted, "
+                    f"{result['unchanged']} unchanged (edited rows count as one added and one deleted)."
+                )
         else:
             st.error("Failed to vectorize and upload CSV.")
 
@@ -0,0 +1,281 @@
+import re
+import json
+import time
+import uuid
+import asyncio
+import fnmatch
+import hashlib
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+#In-process Redis stand-in covering the commands the assistant, caches and ingestion use
+class LocalRedis:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.commands = 0
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    def _round_trip(self):
+        self.commands += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _alive(self, key):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at < time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _call(self, name, *args, **kwargs):
+        self._round_trip()
+        with self._lock:
+            return getattr(self, f"_{name}")(*args, **kwargs)
+
+    def pipeline(self, transaction: bool = True):
+        return LocalPipeline(self)
+
+    def __getattr__(self, name):
+        if name.startswith("_") or not hasattr(type(self), f"_{name}"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._call(name, *args, **kwargs)
+
+    def _ping(self):
+        return True
+
+    def _get(self, key):
+        return self._data.get(key) if self._alive(key) else None
+
+    def _set(self, key, value, ex=None):
+        self._data[key] = value
+        if ex:
+            self._expires[key] = time.time() + ex
+        else:
+            self._expires.pop(key, None)
+        return True
+
+    def _mget(self, keys):
+        return [self._get(key) for key in keys]
+
+    def _delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def _exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def _incr(self, key, amount=1):
+        value = int(self._get(key) or 0) + amount
+        self._data[key] = str(value)
+        return value
+
+    def _hash(self, name):
+        if not self._alive(name):
+            self._data[name] = {}
+        return self._data[name]
+
+    def _hget(self, name, field):
+        return self._hash(name).get(field)
+
+    def _hmget(self, name, fields):
+        values = self._hash(name)
+        return [values.get(field) for field in fields]
+
+    def _hset(self, name, key=None, value=None, mapping=None):
+        values = self._hash(name)
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        added = sum(1 for field in items if field not in values)
+        values.update(items)
+        return added
+
+    def _hgetall(self, name):
+        return dict(self._hash(name))
+
+    def _hdel(self, name, *fields):
+        values = self._hash(name)
+        return sum(1 for field in fields if values.pop(field, None) is not None)
+
+    def _hscan(self, name, cursor=0, count=None):
+        return 0, dict(self._hash(name))
+
+    def _sadd(self, name, *members):
+        if not self._alive(name):
+            self._data[name] = set()
+        before = len(self._data[name])
+        self._data[name].update(members)
+        return len(self._data[name]) - before
+
+    def _sismember(self, name, member):
+        return self._alive(name) and member in self._data[name]
+
+    def scan_iter(self, match=None, count=None, _type=None):
+        self._round_trip()
+        with self._lock:
+            keys = [key for key in list(self._data) if self._alive(key)]
+        for key in keys:
+            if match and not fnmatch.fnmatchcase(key, match):
+                continue
+            if _type == "HASH" and not isinstance(self._data.get(key), dict):
+                continue
+            yield key
+
+
+#Queues commands and applies them in one simulated round trip
+class LocalPipeline:
+    def __init__(self, client: LocalRedis):
+        self.client = client
+        self._queued = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._queued.clear()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def queue(*args, **kwargs):
+            self._queued.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        self.client._round_trip()
+        with self.client._lock:
+            results = [getattr(self.client, f"_{name}")(*args, **kwargs) for name, args, kwargs in self._queued]
+        self._queued.clear()
+        return results
+
+
+#Deterministic chat model: JSON sub-questions for the expansion prompt, a fixed-length pitch otherwise
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.3
+    token_latency: float = 0.01
+    answer_words: int = 120
+    sub_questions: int = 4
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, messages) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if "JSON" in prompt:
+            match = re.search(r"The Query to be given is:\s*(.*)", prompt)
+            query = match.group(1).strip() if match else "Royal Enfield"
+            aspects = ["price", "features", "availability", "service", "mileage", "colours"]
+            return json.dumps({"questions": [f"{query} {aspect}" for aspect in aspects[:self.sub_questions]]})
+        words = [f"word{i % 37}" for i in range(self.answer_words)]
+        sentences = [" ".join(words[i:i + 12]) + "." for i in range(0, len(words), 12)]
+        return " ".join(sentences)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._reply(messages)
+        time.sleep(self.latency + self.token_latency * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._reply(messages)
+        await asyncio.sleep(self.latency + self.token_latency * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for word in self._reply(messages).split(" "):
+            await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+#Unit vectors seeded from the text hash, with a fixed latency per embeddings request
+class FakeEmbeddings(Embeddings):
+    def __init__(self, dimensions: int = 256, latency: float = 0.05):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.model = "fake-embedding"
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        self.calls += 1
+        self.texts += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+#Brute-force cosine store that writes its chunks as hashes into LocalRedis, like RedisVectorStore
+class FakeVectorStore:
+    def __init__(self, redis_client: LocalRedis, index_name: str, embeddings: Embeddings, latency: float = 0.01):
+        self.redis = redis_client
+        self.index_name = index_name
+        self.embeddings = embeddings
+        self.latency = latency
+        self._vectors = {}
+        self._lock = threading.Lock()
+
+    def add_texts(self, texts: list, metadatas: list = None, keys: list = None, **kwargs) -> list:
+        vectors = self.embeddings.embed_documents(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        keys = keys or [uuid.uuid4().hex for _ in texts]
+        full_keys = [f"{self.index_name}:{key}" for key in keys]
+        pipe = self.redis.pipeline(transaction=False)
+        for full_key, text, metadata in zip(full_keys, texts, metadatas):
+            pipe.hset(full_key, mapping={"text": text, "metadata": json.dumps(metadata)})
+        pipe.execute()
+        with self._lock:
+            for full_key, vector in zip(full_keys, vectors):
+                self._vectors[full_key] = np.asarray(vector, dtype=np.float32)
+        return full_keys
+
+    def similarity_search_by_vector(self, embedding: list, k: int = 4, **kwargs) -> list:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            #Vectors whose hash was deleted by ingestion are dropped lazily
+            for key in [key for key in self._vectors if not self.redis._alive(key)]:
+                del self._vectors[key]
+            keys = list(self._vectors)
+            if not keys:
+                return []
+            matrix = np.stack([self._vectors[key] for key in keys])
+        scores = matrix @ np.asarray(embedding, dtype=np.float32)
+        top = np.argsort(-scores)[:k]
+        return [
+            Document(page_content=self.redis._hget(keys[i], "text") or "", metadata={"id": keys[i], "score": float(scores[i])})
+            for i in top
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> list:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k)
+
+
+def fake_synthesizer(seconds_per_char: float = 0.0005):
+    def synthesize(text, lang):
+        time.sleep(seconds_per_char * len(text))
+        return hashlib.sha256(text.encode("utf-8")).digest() * 16
+    return synthesize
@@ -0,0 +1,311 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import contextvars
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import LocalRedis, FakeChatModel, FakeEmbeddings, FakeVectorStore, fake_synthesizer
+from utils.embedding_cache import CachedEmbeddings
+from utils.document_store import DocumentStore
+from utils.web_search import StubSearchBackend
+from utils.assistant_agent import RoyalEnfieldBikeAssistant
+from utils.tts import SpeechPipeline, register_engine, speak_stream, speaker_stream
+from essentials.uploaddb import ingest_csv
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+INDEX_NAME = "bench_inventory"
+MODELS = ["Classic 350", "Bullet 350", "Hunter 350", "Meteor 350", "Interceptor 650", "Continental GT 650", "Himalayan 450", "Scram 411"]
+TYPES = ["Cruiser", "Standard", "Roadster", "Adventure", "Scrambler", "Cafe Racer"]
+PARTS = ["Engine Assembly", "Clutch Plate", "Brake Pads", "Chain Sprocket Kit", "Front Suspension", "Silencer", "Headlight", "Fuel Tank"]
+QUESTIONS = [
+    "What is the price of the {model}?",
+    "Is the {part} for the {model} in stock?",
+    "Compare the {model} with the Interceptor 650 for touring",
+    "Which bike should I buy for city rides, maybe the {model}?",
+    "Tell me about the features of the {model}",
+    "How much does a {part} cost?",
+]
+
+#Stage of the query currently running, so concurrent queries record their own timings
+_stage_times = contextvars.ContextVar("stage_times")
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": statistics.fmean(ordered)}
+
+
+def write_inventory(path: str, rows: int, seed: int = 7, changed_every: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Part Name", "Bike Model", "Bike Type", "Quantity", "Price"])
+        for i in range(rows):
+            price = rng.randint(500, 50000)
+            #A re-run with changed_every rewrites every n-th price to exercise the incremental path
+            if changed_every and i % changed_every == 0:
+                price += 1
+            writer.writerow([f"{rng.choice(PARTS)} #{i}", rng.choice(MODELS), rng.choice(TYPES), rng.randint(0, 40), price])
+
+
+def build_stack(args):
+    redis_client = LocalRedis(latency=args.redis_latency)
+    raw_embeddings = FakeEmbeddings(latency=args.embed_latency)
+    embeddings = CachedEmbeddings(raw_embeddings, redis_client=redis_client)
+    store = FakeVectorStore(redis_client, INDEX_NAME, embeddings, latency=args.vector_latency)
+    return {"redis": redis_client, "raw_embeddings": raw_embeddings, "embeddings": embeddings, "store": store}
+
+
+def bench_ingestion(stack, args, workdir: str) -> dict:
+    csv_path = os.path.join(workdir, "inventory.csv")
+    results = {}
+    for run, changed_every in (("first", 0), ("unchanged", 0), ("incremental", 10)):
+        write_inventory(csv_path, args.rows, changed_every=changed_every)
+        calls_before = stack["raw_embeddings"].texts
+        started = time.perf_counter()
+        report = ingest_csv(
+            csv_path, redis_url=None, index_name=INDEX_NAME, source="inventory.csv",
+            batch_size=args.batch_size, embed_workers=args.embed_workers, resume=False,
+            embeddings=stack["embeddings"], vector_store=stack["store"], redis_client=stack["redis"]
+        ) or {}
+        elapsed = time.perf_counter() - started
+        results[run] = {
+            "elapsed": elapsed,
+            "rows_per_s": args.rows / elapsed if elapsed else 0.0,
+            "texts_embedded": stack["raw_embeddings"].texts - calls_before,
+            "report": report,
+        }
+    return results
+
+
+def build_assistant(stack, args):
+    doc_store = DocumentStore(
+        redis_url=None, index_name=INDEX_NAME, embeddings=stack["embeddings"],
+        redis_client=stack["redis"], vector_store=stack["store"]
+    )
+    return RoyalEnfieldBikeAssistant(
+        llm_model="fake-chat", openai_api_key=None, tavily_api_key=None, redis_url=None,
+        redis_cache_host=None, redis_port=None, redis_cache_password=None, redis_cache_db=0,
+        vector_index=INDEX_NAME,
+        llm=FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency),
+        redis_client=stack["redis"],
+        doc_store=doc_store,
+        search_backend=StubSearchBackend(latency=args.search_latency)
+    )
+
+
+#Wraps the assistant's stages so each query records where its time went
+def instrument(assistant):
+    def timed(name, fn):
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                stages = _stage_times.get(None)
+                if stages is not None:
+                    stages[name] = stages.get(name, 0.0) + time.perf_counter() - started
+        return wrapper
+
+    assistant._expand_query = timed("expansion", assistant._expand_query)
+    assistant._graph_context = timed("graph", assistant._graph_context)
+    assistant._gather_context = timed("retrieval", assistant._gather_context)
+
+
+async def _timed_query(assistant, query: str):
+    stages = {}
+    _stage_times.set(stages)
+    started = time.perf_counter()
+    answer = await assistant.processed_query(query)
+    total = time.perf_counter() - started
+    if answer is None:
+        raise RuntimeError(f"processed_query returned nothing for {query!r}")
+    stages["generation"] = max(0.0, total - sum(stages.values()))
+    return total, stages
+
+
+async def _run_queries(assistant, queries: list, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query):
+        async with semaphore:
+            return await _timed_query(assistant, query)
+
+    started = time.perf_counter()
+    #gather runs each query in its own task and context, so stage timings never mix
+    results = await asyncio.gather(*(one(query) for query in queries))
+    return results, time.perf_counter() - started
+
+
+def bench_queries(stack, args) -> dict:
+    assistant = build_assistant(stack, args)
+    instrument(assistant)
+    assistant.retriever.ensure_index()
+    rng = random.Random(11)
+    results = {}
+    for concurrency in args.concurrency:
+        #Distinct questions per level so the response cache only serves the "cached" pass
+        queries = [
+            rng.choice(QUESTIONS).format(model=rng.choice(MODELS), part=rng.choice(PARTS)) + f" (ref {concurrency}-{i})"
+            for i in range(args.queries)
+        ]
+        for label, batch in (("cold", queries), ("cached", queries)):
+            timings, wall = asyncio.run(_run_queries(assistant, batch, concurrency))
+            totals = [total for total, _ in timings]
+            stage_names = sorted({name for _, stages in timings for name in stages})
+            results[f"c{concurrency}_{label}"] = {
+                "total": percentiles(totals),
+                "stages": {name: percentiles([stages.get(name, 0.0) for _, stages in timings]) for name in stage_names},
+                "queries_per_s": len(batch) / wall if wall else 0.0,
+                "elapsed": wall,
+            }
+    results["router"] = {key: value for key, value in assistant.router.stats().items() if key != "recent"}
+    results["response_cache"] = assistant.response_cache.stats()
+    return results
+
+
+def bench_tts(args) -> dict:
+    register_engine("bench", fake_synthesizer(args.tts_seconds_per_char), format="audio/mp3")
+    text = " ".join(
+        f"The {MODELS[i % len(MODELS)]} is a great pick for weekend rides and daily commutes alike." for i in range(args.tts_sentences)
+    )
+    engines = ["bench"] + (["pyttsx3"] if args.real_tts else []) + (["gtts"] if args.network else [])
+    results = {}
+    for engine in engines:
+        for workers in args.tts_workers:
+            samples = []
+            for _ in range(args.tts_repeats):
+                started = time.perf_counter()
+                pipeline = SpeechPipeline(engine=engine, workers=workers, use_cache=False)
+                pipeline.feed(text)
+                pipeline.join()
+                samples.append(time.perf_counter() - started)
+            results[f"{engine}_pipeline_w{workers}"] = percentiles(samples)
+    #The unpipelined entry points, timed as whole-text calls running side by side
+    direct = [("speak_stream", speak_stream)] if args.real_tts else []
+    direct += [("speaker_stream", speaker_stream)] if args.network else []
+    for name, fn in direct:
+        for workers in args.tts_workers:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(fn, [text] * workers))
+            results[f"{name}_c{workers}"] = {"elapsed": time.perf_counter() - started}
+    return results
+
+
+#Flattens nested results into "a.b.c" -> number so runs can be compared key by key
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+#Throughput must not drop and median/mean latency must not grow past the tolerance. p95/p99 come from a few dozen
+#samples per tier and swing with scheduling, so they, counts and cache stats are informational.
+#A change smaller than noise_floor seconds is scheduling jitter, not a regression: latencies are compared by their
+#absolute growth, and a throughput only by how much longer the run it was measured over (its sibling elapsed) took
+def compare(results: dict, baseline: dict, tolerance: float, noise_floor: float = 0.05) -> list:
+    current = flatten(results)
+    recorded = flatten(baseline)
+    regressions = []
+    for key, expected in recorded.items():
+        if key not in current or expected <= 0:
+            continue
+        value = current[key]
+        if key.endswith("_per_s"):
+            elapsed = key.rsplit(".", 1)[0] + ".elapsed"
+            slower = current.get(elapsed, 0.0) - recorded.get(elapsed, 0.0)
+            if value < expected * (1 - tolerance) and slower > noise_floor:
+                regressions.append(f"{key}: {value:.4f} < {expected:.4f}")
+        elif key.endswith(("p50", "mean", "elapsed")):
+            if value > expected * (1 + tolerance) and value - expected > noise_floor:
+                regressions.append(f"{key}: {value:.4f} > {expected:.4f}")
+        elif key.endswith("texts_embedded"):
+            if value > expected:
+                regressions.append(f"{key}: {value:.0f} > {expected:.0f}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for queries, ingestion and speech with local stand-ins")
+    parser.add_argument("--suite", nargs="+", choices=["queries", "ingestion", "tts"], default=["ingestion", "queries", "tts"])
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=250)
+    parser.add_argument("--embed-workers", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.4)
+    parser.add_argument("--vector-latency", type=float, default=0.01)
+    parser.add_argument("--redis-latency", type=float, default=0.0005)
+    parser.add_argument("--tts-sentences", type=int, default=8)
+    parser.add_argument("--tts-workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--tts-repeats", type=int, default=3)
+    parser.add_argument("--tts-seconds-per-char", type=float, default=0.0005)
+    parser.add_argument("--real-tts", action="store_true", help="also time the offline pyttsx3 engine")
+    parser.add_argument("--network", action="store_true", help="also time gTTS, which calls Google")
+    parser.add_argument("--output", default=None, help="write the JSON results here as well as to stdout")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--noise-floor", type=float, default=0.05, help="seconds of change ignored as jitter")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--require-baseline", action="store_true", help="fail instead of passing when there is no baseline (for CI gates)")
+    args = parser.parse_args(argv)
+
+    stack = build_stack(args)
+    results = {"config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "update_baseline", "require_baseline", "noise_floor")}}
+    with tempfile.TemporaryDirectory() as workdir:
+        #Queries run after ingestion so retrieval searches a populated index
+        if "ingestion" in args.suite or "queries" in args.suite:
+            results["ingestion"] = bench_ingestion(stack, args, workdir)
+        if "queries" in args.suite:
+            results["queries"] = bench_queries(stack, args)
+        if "tts" in args.suite:
+            results["tts"] = bench_tts(args)
+    results["redis_commands"] = stack["redis"].commands
+
+    output = json.dumps(results, indent=2, default=str)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({key: results[key] for key in ("ingestion", "queries", "tts") if key in results}, f, indent=2, default=str)
+        print(f"The Baseline was written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"The Baseline {args.baseline} does not exist yet; run with --update-baseline to record one")
+        return 2 if args.require_baseline else 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.noise_floor)
+    for regression in regressions:
+        print(f"The Benchmark Regression : {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
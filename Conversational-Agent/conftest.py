@@ -0,0 +1 @@
+#Lets pytest import the flat utils/db/llm/essentials modules from this directory
@@ -0,0 +1,121 @@
+import re
+import threading
+from collections import OrderedDict
+
+#Literals worth lifting out of a question, by the graph label they name; anything else stays part of its shape
+KNOWN_NAMES = {
+    "model": [
+        "Classic 350", "Bullet 350", "Hunter 350", "Meteor 350", "Super Meteor 650", "Interceptor 650",
+        "Continental GT 650", "Shotgun 650", "Himalayan 450", "Himalayan", "Scram 411", "Guerrilla 450",
+    ],
+    "part": [
+        "Engine Assembly", "Clutch Plate", "Brake Pads", "Chain Sprocket Kit", "Front Suspension",
+        "Rear Suspension", "Silencer", "Handlebar", "Headlight", "Fuel Tank",
+    ],
+    "type": ["Cruiser", "Standard", "Roadster", "Adventure", "Scrambler", "Cafe Racer"],
+}
+#What each placeholder kind stands for, told to the model alongside the question shape
+KINDS = {
+    "model": "a BikeModel name",
+    "part": "a Part name",
+    "type": "a BikeType name",
+    "num": "a number",
+    "text": "a quoted value of unknown label",
+}
+QUOTED = re.compile(r"'([^']+)'|\"([^\"]+)\"")
+NAMES = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name in sorted((name for names in KNOWN_NAMES.values() for name in names), key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+NUMBER = re.compile(r"(?<![\w$])\d+(?:\.\d+)?(?![\w])")
+PARAMETER = re.compile(r"\$((?:" + "|".join(KINDS) + r")\d+)\b")
+CANONICAL = {name.lower(): (kind, name) for kind, names in KNOWN_NAMES.items() for name in names}
+
+
+#Turns "price of Classic 350 under 5000" into ("price of $model0 under $num0", {"model0": "Classic 350", "num0": 5000}).
+#The kind is part of the placeholder, so a BikeModel question never shares a shape with a Part or BikeType one
+def extract_literals(question: str):
+    params = {}
+    counts = dict.fromkeys(KINDS, 0)
+
+    def lift(kind, value):
+        name = f"{kind}{counts[kind]}"
+        counts[kind] += 1
+        params[name] = value
+        return f"${name}"
+
+    def lift_name(match):
+        kind, name = CANONICAL[match.group(1).lower()]
+        return lift(kind, name)
+
+    def lift_quoted(match):
+        value = match.group(1) or match.group(2)
+        kind, name = CANONICAL.get(value.lower(), ("text", value))
+        return lift(kind, name)
+
+    shape = QUOTED.sub(lift_quoted, question)
+    shape = NAMES.sub(lift_name, shape)
+    shape = NUMBER.sub(lambda m: lift("num", float(m.group(0)) if "." in m.group(0) else int(m.group(0))), shape)
+    shape = re.sub(r"[^\w\s$]", " ", shape.lower())
+    return re.sub(r"\s+", " ", shape).strip(), params
+
+
+#"$model0 is a BikeModel name; $num0 is a number" for the placeholders of one question shape
+def describe_parameters(shape: str) -> str:
+    names = sorted(set(PARAMETER.findall(shape)), key=shape.index)
+    return "; ".join(f"${name} is {KINDS[name.rstrip('0123456789')]}" for name in names)
+
+
+def strip_cypher(text: str) -> str:
+    text = text.strip()
+    fenced = re.search(r"```(?:cypher)?\s*(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    if fenced:
+        text = fenced.group(1).strip()
+    if "Cypher:" in text:
+        text = text.split("Cypher:", 1)[1].strip()
+    return text
+
+
+#Escapes parameters back into a literal query for callers that cannot pass parameters
+def render_cypher(cypher: str, params: dict) -> str:
+    def literal(match):
+        value = params.get(match.group(1))
+        if isinstance(value, str):
+            return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+        return match.group(0) if value is None else str(value)
+    return PARAMETER.sub(literal, cypher)
+
+
+#Caches parameterized Cypher per question shape, so same-shaped questions skip the LLM
+class CypherGenerator:
+    def __init__(self, complete, max_entries: int = 512):
+        #complete(question_shape, parameter_notes) -> raw LLM text containing the Cypher
+        self.complete = complete
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "uncacheable": 0}
+
+    def generate(self, question: str):
+        shape, params = extract_literals(question)
+        with self._lock:
+            cypher = self._cache.get(shape)
+            if cypher is not None:
+                self._cache.move_to_end(shape)
+                self.counters["hits"] += 1
+                return cypher, params
+
+        self.counters["misses"] += 1
+        cypher = strip_cypher(self.complete(shape, describe_parameters(shape)))
+        #Only cache when every literal stayed a parameter; an inlined literal would leak into other questions
+        if set(PARAMETER.findall(cypher)) >= set(params):
+            with self._lock:
+                self._cache[shape] = cypher
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        else:
+            self.counters["uncacheable"] += 1
+        return cypher, params
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": len(self._cache)}
@@ -0,0 +1,126 @@
+import re
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from utils.config import setting
+from llm.Errors import UnsafeCypherError
+
+DATA_VERSION_KEY = "graph:data_version"
+
+#Clauses and procedures that can modify the graph or reach outside it
+WRITE_CLAUSES = re.compile(
+    r"\b(CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|FOREACH|LOAD\s+CSV|IN\s+TRANSACTIONS|"
+    r"CALL\s+(?:dbms|db\.create|db\.index\.fulltext\.create|apoc\.(?:create|merge|refactor|periodic|load|trigger|cypher\.run(?:Write|Schema))))\b",
+    re.IGNORECASE
+)
+STRINGS_AND_COMMENTS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|//[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def ensure_read_only(cypher: str):
+    #Literals and comments are blanked first so "name: 'Set Screw'" is not mistaken for a SET clause
+    stripped = STRINGS_AND_COMMENTS.sub(" ", cypher)
+    match = WRITE_CLAUSES.search(stripped)
+    if match:
+        raise UnsafeCypherError(f"write clause {match.group(0).upper()!r} is not allowed")
+    if ";" in stripped.strip().rstrip(";"):
+        raise UnsafeCypherError("multiple statements are not allowed")
+
+
+def bump_data_version(redis_client) -> int:
+    return redis_client.incr(DATA_VERSION_KEY)
+
+
+#Read-only Cypher on a shared async driver, with a result cache invalidated by the graph data version
+class CypherExecutor:
+    def __init__(
+            self,
+            driver=None,
+            redis_client=None,
+            database: str = None,
+            timeout: float = 5.0,
+            row_limit: int = 200,
+            max_cache_entries: int = 512,
+            version_ttl: float = 2.0
+        ):
+        self._driver = driver
+        self.redis = redis_client
+        self.database = database
+        self.timeout = timeout
+        self.row_limit = row_limit
+        self.max_cache_entries = max_cache_entries
+        self.version_ttl = version_ttl
+        self._cache = OrderedDict()
+        self._version = (None, 0.0)
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "rejected": 0}
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            from neo4j import AsyncGraphDatabase
+            self._driver = AsyncGraphDatabase.driver(
+                setting("NEO4J_URI", required=True),
+                auth=(setting("NEO4J_USER", required=True), setting("NEO4J_PASSWORD", required=True)),
+                max_connection_pool_size=int(setting("NEO4J_POOL_SIZE"))
+            )
+        return self._driver
+
+    #The version is re-read at most every version_ttl seconds to keep Redis off the hot path,
+    #and on a worker thread so the blocking client never stalls the event loop
+    async def data_version(self):
+        if self.redis is None:
+            return 0
+        version, read_at = self._version
+        if time.monotonic() - read_at > self.version_ttl:
+            try:
+                version = int(await asyncio.to_thread(self.redis.get, DATA_VERSION_KEY) or 0)
+            except Exception as e:
+                print(f"The Data Version Read Error : {e}")
+            self._version = (version, time.monotonic())
+        return version
+
+    def _cache_key(self, cypher: str, params: dict, version):
+        return (" ".join(cypher.split()), json.dumps(params or {}, sort_keys=True, default=str), version)
+
+    async def _execute(self, cypher: str, params: dict):
+        from neo4j import Query, READ_ACCESS
+
+        async def work(tx):
+            result = await tx.run(Query(cypher, timeout=self.timeout), params or {})
+            rows = [record.data() for record in await result.fetch(self.row_limit)]
+            await result.consume()
+            return rows
+        async with self.driver.session(database=self.database, default_access_mode=READ_ACCESS) as session:
+            return await session.execute_read(work)
+
+    async def run(self, cypher: str, params: dict = None) -> list:
+        cypher = cypher.strip().rstrip(";")
+        try:
+            ensure_read_only(cypher)
+        except UnsafeCypherError:
+            self.counters["rejected"] += 1
+            raise
+
+        key = self._cache_key(cypher, params, await self.data_version())
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.counters["hits"] += 1
+                return self._cache[key]
+
+        self.counters["misses"] += 1
+        rows = await asyncio.wait_for(self._execute(cypher, params), timeout=self.timeout)
+        with self._lock:
+            self._cache[key] = rows
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+        return rows
+
+    async def close(self):
+        if self._driver is not None:
+            await self._driver.close()
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": len(self._cache), "data_version": self._version[0]}
@@ -0,0 +1,201 @@
+import re
+import csv
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from utils.config import setting
+from db.executor import bump_data_version
+
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT part_name IF NOT EXISTS FOR (p:Part) REQUIRE p.name IS UNIQUE",
+    "CREATE CONSTRAINT bike_model_name IF NOT EXISTS FOR (m:BikeModel) REQUIRE m.name IS UNIQUE",
+    "CREATE CONSTRAINT bike_type_name IF NOT EXISTS FOR (t:BikeType) REQUIRE t.name IS UNIQUE",
+    "CREATE INDEX used_in_price IF NOT EXISTS FOR ()-[u:USED_IN]-() ON (u.price)",
+]
+
+#MERGE keeps re-runs idempotent; SET refreshes quantity and price on existing relationships
+UPSERT_BATCH = """
+UNWIND $rows AS row
+MERGE (p:Part {name: row.part})
+MERGE (m:BikeModel {name: row.model})
+MERGE (p)-[u:USED_IN]->(m)
+SET u.quantity = row.quantity, u.price = row.price
+WITH m, row
+WHERE row.type IS NOT NULL
+MERGE (t:BikeType {name: row.type})
+MERGE (m)-[:IS_A]->(t)
+"""
+
+#Accepted spellings of each CSV header, compared after lower-casing and dropping non-alphanumerics
+COLUMN_ALIASES = {
+    "part": ["part", "partname", "parts", "component"],
+    "model": ["bikemodel", "model", "modelname", "bike"],
+    "type": ["biketype", "type", "category", "segment"],
+    "quantity": ["quantity", "qty", "count"],
+    "price": ["price", "unitprice", "cost", "partprice"],
+}
+
+
+def _normalize_header(header: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", (header or "").lower())
+
+
+def resolve_columns(headers: list, overrides: dict = None) -> dict:
+    overrides = overrides or {}
+    by_normalized = {_normalize_header(header): header for header in headers}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        if overrides.get(field):
+            columns[field] = overrides[field]
+            continue
+        columns[field] = next((by_normalized[alias] for alias in aliases if alias in by_normalized), None)
+    missing = [field for field in ("part", "model") if columns[field] is None]
+    if missing:
+        raise ValueError(f"The CSV has no column for {missing}; headers are {headers}")
+    return columns
+
+
+def _number(value, cast):
+    try:
+        return cast(str(value).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_row(record: dict, columns: dict):
+    part = (record.get(columns["part"]) or "").strip()
+    model = (record.get(columns["model"]) or "").strip()
+    if not part or not model:
+        return None
+    bike_type = (record.get(columns["type"]) or "").strip() if columns["type"] else ""
+    return {
+        "part": part,
+        "model": model,
+        "type": bike_type or None,
+        "quantity": _number(record.get(columns["quantity"]), int) if columns["quantity"] else None,
+        "price": _number(record.get(columns["price"]), float) if columns["price"] else None,
+    }
+
+
+def get_driver(uri: str = None, user: str = None, password: str = None, max_pool_size: int = 16):
+    from neo4j import GraphDatabase
+    return GraphDatabase.driver(
+        uri or setting("NEO4J_URI", required=True),
+        auth=(user or setting("NEO4J_USER", required=True), password or setting("NEO4J_PASSWORD", required=True)),
+        max_connection_pool_size=max_pool_size
+    )
+
+
+def create_schema(driver, database: str = None):
+    with driver.session(database=database) as session:
+        for statement in SCHEMA_STATEMENTS:
+            session.run(statement).consume()
+
+
+def _write_batch(driver, rows: list, database: str = None):
+    def work(tx):
+        return tx.run(UPSERT_BATCH, rows=rows).consume().counters
+    #execute_write retries transient failures such as deadlocks between concurrent batches
+    with driver.session(database=database) as session:
+        return session.execute_write(work)
+
+
+#Streams the inventory CSV into Part -[:USED_IN]-> BikeModel -[:IS_A]-> BikeType with batched UNWIND transactions
+def load_inventory_graph(
+        csv_path: str,
+        driver=None,
+        batch_size: int = 1000,
+        workers: int = 4,
+        columns: dict = None,
+        database: str = None,
+        on_progress=None,
+        redis_url: str = None
+    ):
+    own_driver = driver is None
+    driver = driver or get_driver(max_pool_size=max(1, workers) * 2)
+    report = {"rows": 0, "skipped": 0, "batches": 0, "nodes_created": 0, "relationships_created": 0, "properties_set": 0}
+    started = time.perf_counter()
+
+    def commit(rows_in_batch, future):
+        counters = future.result()
+        report["rows"] += rows_in_batch
+        report["batches"] += 1
+        report["nodes_created"] += counters.nodes_created
+        report["relationships_created"] += counters.relationships_created
+        report["properties_set"] += counters.properties_set
+        if on_progress:
+            on_progress(_with_rates(report, time.perf_counter() - started))
+
+    try:
+        create_schema(driver, database=database)
+        with open(csv_path, newline="", encoding="utf-8-sig") as f, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            reader = csv.DictReader(f)
+            resolved = resolve_columns(reader.fieldnames or [], columns)
+            pending = deque()
+            batch = []
+
+            def submit():
+                pending.append((len(batch), pool.submit(_write_batch, driver, list(batch), database)))
+                batch.clear()
+                #At most `workers` batches in flight keeps memory bounded on large catalogs
+                while len(pending) >= max(1, workers):
+                    commit(*pending.popleft())
+
+            for record in reader:
+                row = _to_row(record, resolved)
+                if row is None:
+                    report["skipped"] += 1
+                    continue
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    submit()
+            if batch:
+                submit()
+            while pending:
+                commit(*pending.popleft())
+        #Cached graph query results from before this load are no longer valid
+        if redis_url:
+            import redis
+            report["data_version"] = bump_data_version(redis.Redis.from_url(redis_url))
+        return _with_rates(report, time.perf_counter() - started)
+    finally:
+        if own_driver:
+            driver.close()
+
+
+def _with_rates(report: dict, elapsed: float) -> dict:
+    return {
+        **report,
+        "elapsed": elapsed,
+        "rows_per_s": report["rows"] / elapsed if elapsed else 0.0,
+        "nodes_per_s": report["nodes_created"] / elapsed if elapsed else 0.0,
+        "relationships_per_s": report["relationships_created"] / elapsed if elapsed else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load the inventory CSV into the Neo4j parts graph")
+    parser.add_argument("csv_path", nargs="?", default="../dataset/Inventory.csv")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--database", default=None)
+    for field in COLUMN_ALIASES:
+        parser.add_argument(f"--{field}-column", dest=f"{field}_column", default=None)
+    args = parser.parse_args()
+    try:
+        report = load_inventory_graph(
+            args.csv_path,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            database=args.database,
+            columns={field: getattr(args, f"{field}_column") for field in COLUMN_ALIASES},
+            redis_url=setting("REDIS_URL"),
+            on_progress=lambda p: print(
+                f"batch {p['batches']}: {p['rows']} rows, {p['nodes_per_s']:.0f} nodes/s, "
+                f"{p['relationships_per_s']:.0f} relationships/s"
+            )
+        )
+        print(report)
+    except Exception as e:
+        print(f"The Graph Load Error : {e}")
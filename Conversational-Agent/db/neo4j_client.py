@@ -1,95 +1,121 @@
 import os
-import openai
-from dotenv import load_dotenv
-
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
+from functools import lru_cache
+from utils.config import get_client, setting
+from utils.telemetry import span, record_tokens
+from db.cypher_cache import CypherGenerator, render_cypher
+
+# ✅ FULL GRAPH SCHEMA (ESCAPED CURLY BRACES FOR .format() SAFETY), built once at import
+GRAPH_SCHEMA = """
+    Nodes:
+      (:Part {{name}})
+      (:BikeModel {{name}})
+      (:BikeType {{name}})
+
+    Relationships:
+      (:Part)-[:USED_IN {{{{quantity, price}}}}]->(:BikeModel)
+      (:BikeModel)-[:IS_A]->(:BikeType)
+
+    Example Data:
+    MERGE (p:Part {{{{name: 'Engine Assembly'}}}})
+    MERGE (m:BikeModel {{{{name: 'Classic 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 1, price: 32412.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+
+    MERGE (p:Part {{{{name: 'Clutch Plate'}}}})
+    MERGE (m:BikeModel {{{{name: 'Classic 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 3, price: 833.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+
+    MERGE (p:Part {{{{name: 'Brake Pads'}}}})
+    MERGE (m:BikeModel {{{{name: 'Bullet 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Standard'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 3, price: 1290.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+
+    MERGE (p:Part {{{{name: 'Chain Sprocket Kit'}}}})
+    MERGE (m:BikeModel {{{{name: 'Hunter 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Roadster'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 3, price: 2614.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+
+    MERGE (p:Part {{{{name: 'Front Suspension'}}}})
+    MERGE (m:BikeModel {{{{name: 'Meteor 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 2, price: 4020.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+
+    MERGE (p:Part {{{{name: 'Rear Suspension'}}}})
+    MERGE (m:BikeModel {{{{name: 'Meteor 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 2, price: 3780.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+
+    MERGE (p:Part {{{{name: 'Silencer'}}}})
+    MERGE (m:BikeModel {{{{name: 'Classic 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 1, price: 4560.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+
+    MERGE (p:Part {{{{name: 'Handlebar'}}}})
+    MERGE (m:BikeModel {{{{name: 'Hunter 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Roadster'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 1, price: 870.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+
+    MERGE (p:Part {{{{name: 'Headlight'}}}})
+    MERGE (m:BikeModel {{{{name: 'Bullet 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Standard'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 1, price: 1450.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+
+    MERGE (p:Part {{{{name: 'Fuel Tank'}}}})
+    MERGE (m:BikeModel {{{{name: 'Meteor 350'}}}})
+    MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
+    MERGE (p)-[:USED_IN {{{{quantity: 1, price: 5290.0}}}}]->(m)
+    MERGE (m)-[:IS_A]->(t)
+    """.strip()
+
+PARAMETER_RULES = (
+    "Values written as $model0, $part0, $type0, $num0, ... in the question are query parameters. "
+    "Reference them by the same names in the Cypher and never replace them with literal values. "
+    "Match $modelN on BikeModel.name, $partN on Part.name and $typeN on BikeType.name."
+)
+
+#Shipped next to this module, so the graph route works from any working directory
+PROMPT_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_template.txt")
+
+#The template file is read and the schema substituted once per process
+@lru_cache(maxsize=1)
 def load_prompt_template():
-    with open("prompt_template.txt", "r") as f:
-        return f.read()
+    with open(PROMPT_TEMPLATE, "r", encoding="utf-8") as f:
+        return f.read().replace("<GRAPH_SCHEMA>", GRAPH_SCHEMA)
+
+def _complete(question_shape, parameter_notes=""):
+    formatted_prompt = load_prompt_template().format(question=question_shape)
+    model = setting("CYPHER_MODEL")
+    with span("cypher_generation", model=model) as attrs:
+        response = get_client("openai").chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": f"{PARAMETER_RULES} Parameters: {parameter_notes}." if parameter_notes else PARAMETER_RULES},
+                {"role": "user", "content": formatted_prompt}
+            ],
+            temperature=0.2
+        )
+        content = response.choices[0].message.content.strip()
+        usage = getattr(response, "usage", None)
+        usage = {"input_tokens": usage.prompt_tokens, "output_tokens": usage.completion_tokens} if usage else None
+        attrs["input_tokens"], attrs["output_tokens"] = record_tokens("cypher", usage, content, formatted_prompt, model=model)
+    return content
+
+cypher_generator = CypherGenerator(_complete)
+
+#Returns (cypher, params); questions of an already-seen shape reuse the cached query without an LLM call
+def generate_parameterized_cypher(user_question):
+    return cypher_generator.generate(user_question)
 
 def generate_cypher_query(user_question):
-    prompt = load_prompt_template()
-
-    # ✅ FULL GRAPH SCHEMA (ESCAPED CURLY BRACES FOR .format() SAFETY)
-    graph_schema = """
-        Nodes:
-          (:Part {{name}})
-          (:BikeModel {{name}})
-          (:BikeType {{name}})
-
-        Relationships:
-          (:Part)-[:USED_IN {{{{quantity, price}}}}]->(:BikeModel)
-          (:BikeModel)-[:IS_A]->(:BikeType)
-
-        Example Data:
-        MERGE (p:Part {{{{name: 'Engine Assembly'}}}})
-        MERGE (m:BikeModel {{{{name: 'Classic 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 1, price: 32412.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-
-        MERGE (p:Part {{{{name: 'Clutch Plate'}}}})
-        MERGE (m:BikeModel {{{{name: 'Classic 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 3, price: 833.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-
-        MERGE (p:Part {{{{name: 'Brake Pads'}}}})
-        MERGE (m:BikeModel {{{{name: 'Bullet 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Standard'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 3, price: 1290.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-
-        MERGE (p:Part {{{{name: 'Chain Sprocket Kit'}}}})
-        MERGE (m:BikeModel {{{{name: 'Hunter 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Roadster'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 3, price: 2614.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-
-        MERGE (p:Part {{{{name: 'Front Suspension'}}}})
-        MERGE (m:BikeModel {{{{name: 'Meteor 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 2, price: 4020.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-
-        MERGE (p:Part {{{{name: 'Rear Suspension'}}}})
-        MERGE (m:BikeModel {{{{name: 'Meteor 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 2, price: 3780.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-
-        MERGE (p:Part {{{{name: 'Silencer'}}}})
-        MERGE (m:BikeModel {{{{name: 'Classic 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 1, price: 4560.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-
-        MERGE (p:Part {{{{name: 'Handlebar'}}}})
-        MERGE (m:BikeModel {{{{name: 'Hunter 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Roadster'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 1, price: 870.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-
-        MERGE (p:Part {{{{name: 'Headlight'}}}})
-        MERGE (m:BikeModel {{{{name: 'Bullet 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Standard'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 1, price: 1450.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-
-        MERGE (p:Part {{{{name: 'Fuel Tank'}}}})
-        MERGE (m:BikeModel {{{{name: 'Meteor 350'}}}})
-        MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-        MERGE (p)-[:USED_IN {{{{quantity: 1, price: 5290.0}}}}]->(m)
-        MERGE (m)-[:IS_A]->(t)
-        """.strip()
-
-    formatted_prompt = prompt.replace("<GRAPH_SCHEMA>", graph_schema).format(question=user_question)
-
-    response = openai.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": formatted_prompt}],
-        temperature=0.2
-    )
-    return response.choices[0].message.content.strip()
+    cypher, params = generate_parameterized_cypher(user_question)
+    return render_cypher(cypher, params)
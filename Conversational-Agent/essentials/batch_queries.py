@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from utils.config import assistant_config, setting
+from utils.rate_limit import TokenBucket, langchain_rate_limiter, RateLimitedSearch, RateLimitedEmbeddings, RateLimitedCompletion
+from utils.telemetry import Trace, configure_sinks
+
+#Pre-answers a JSONL file of questions through the full pipeline, which also warms the response cache.
+#The output file is the checkpoint: every finished query is appended and flushed, and a rerun skips every id
+#already written, answered or failed, so each id has one record. retry_failed drops the failures first
+
+
+def read_queries(path: str) -> list:
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            #Either a bare JSON string or {"id": ..., "query" | "question": ...}
+            if isinstance(item, str):
+                item = {"query": item}
+            query = item.get("query") or item.get("question")
+            if query:
+                queries.append((str(item.get("id", f"line-{line_number}")), query))
+    return queries
+
+
+def _read_records(output_path: str) -> list:
+    records = []
+    if not os.path.exists(output_path):
+        return records
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                #A run killed mid-write leaves at most one torn last line
+                continue
+    return records
+
+
+def completed_ids(output_path: str) -> set:
+    return {record["id"] for record in _read_records(output_path)}
+
+
+#Rewrites the output without its failed records, so their ids run again; returns how many were dropped
+def drop_failed(output_path: str) -> int:
+    records = _read_records(output_path)
+    kept = [record for record in records if record.get("ok")]
+    if len(kept) == len(records):
+        return 0
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in kept:
+            f.write(json.dumps(record, default=str) + "\n")
+    os.replace(tmp_path, output_path)
+    return len(records) - len(kept)
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": statistics.fmean(ordered)}
+
+
+#One bucket per upstream API, shared by every concurrent query; only cache misses reach Tavily and embeddings
+def build_batch_assistant(rates: dict):
+    from utils.runtime import build_assistant
+    from utils.web_search import TavilyBackend
+    buckets = {name: TokenBucket(rate, name=name) for name, rate in rates.items()}
+    config = assistant_config()
+    assistant = build_assistant({
+        **config,
+        "rate_limiter": langchain_rate_limiter(buckets["openai"]),
+        "search_backend": RateLimitedSearch(TavilyBackend(api_key=config["tavily_api_key"]), buckets["tavily"])
+    })
+    cached = assistant.doc_store.embeddings
+    if hasattr(cached, "embeddings"):
+        cached.embeddings = RateLimitedEmbeddings(cached.embeddings, buckets["embeddings"])
+    #Cypher generation calls OpenAI directly, outside ChatOpenAI, so it takes from the same bucket here
+    from db.neo4j_client import cypher_generator
+    if not isinstance(cypher_generator.complete, RateLimitedCompletion):
+        cypher_generator.complete = RateLimitedCompletion(cypher_generator.complete, buckets["openai"])
+    return assistant, buckets
+
+
+async def _answer(assistant, query_id: str, query: str, retries: int, backoff: float, timeout: float, report: dict) -> dict:
+    errors = []
+    for attempt in range(retries + 1):
+        trace = Trace("batch_query", query=query, query_id=query_id)
+        started = time.perf_counter()
+        try:
+            answer = await asyncio.wait_for(assistant.processed_query(query, trace=trace), timeout=timeout)
+        except asyncio.TimeoutError as e:
+            trace.error("timeout", e)
+            answer = None
+        latency = time.perf_counter() - started
+        trace.finish()
+        if answer:
+            return {
+                "id": query_id,
+                "query": query,
+                "ok": True,
+                "answer": answer,
+                "attempts": attempt + 1,
+                "latency": latency,
+                "route": trace.attrs.get("route", "cache"),
+                "tokens": sum(value for name, value in trace.counters.items() if name.startswith("llm_tokens")),
+            }
+        errors = trace.errors or [{"stage": "answer", "error": "empty answer"}]
+        if attempt < retries:
+            report["retries"] += 1
+            #Exponential backoff with jitter so throttled workers do not retry in lockstep
+            await asyncio.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+    return {"id": query_id, "query": query, "ok": False, "attempts": retries + 1, "errors": errors}
+
+
+async def run_batch(
+        assistant,
+        queries: list,
+        output_path: str,
+        concurrency: int = 8,
+        retries: int = 3,
+        backoff: float = 1.0,
+        timeout: float = 120.0,
+        retry_failed: bool = False,
+        on_progress=None
+    ) -> dict:
+    if retry_failed:
+        drop_failed(output_path)
+    done = completed_ids(output_path)
+    pending = [(query_id, query) for query_id, query in queries if query_id not in done]
+    report = {"total": len(queries), "skipped": len(queries) - len(pending), "ok": 0, "failed": 0, "retries": 0, "cached": 0, "tokens": 0}
+    latencies = []
+    work = asyncio.Queue()
+    for item in pending:
+        work.put_nowait(item)
+
+    started = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out:
+        #A fixed set of workers pulls from the queue, so thousands of queries never become thousands of tasks
+        async def worker():
+            while True:
+                try:
+                    query_id, query = work.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                record = await _answer(assistant, query_id, query, retries, backoff, timeout, report)
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+                if record["ok"]:
+                    report["ok"] += 1
+                    report["tokens"] += record["tokens"]
+                    report["cached"] += record["route"] == "cache"
+                    latencies.append(record["latency"])
+                else:
+                    report["failed"] += 1
+                if on_progress:
+                    on_progress(report, time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+    elapsed = time.perf_counter() - started
+    finished = report["ok"] + report["failed"]
+    report.update(
+        elapsed=elapsed,
+        queries_per_s=finished / elapsed if elapsed else 0.0,
+        latency=percentiles(latencies)
+    )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions in bulk and warm the response cache")
+    parser.add_argument("queries", help='JSONL with one {"id": ..., "query": ...} (or a bare string) per line')
+    parser.add_argument("--output", default="batch_answers.jsonl", help="results JSONL, also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.0, help="first retry delay in seconds, doubled per attempt")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds per attempt")
+    parser.add_argument("--openai-rps", type=float, default=3.0, help="chat completions per second (0 = unlimited)")
+    parser.add_argument("--embeddings-rps", type=float, default=5.0, help="embedding requests per second")
+    parser.add_argument("--tavily-rps", type=float, default=1.0, help="Tavily searches per second")
+    parser.add_argument("--retry-failed", action="store_true", help="run again the queries that failed in earlier runs")
+    parser.add_argument("--report", default=None, help="also write the final report as JSON here")
+    args = parser.parse_args()
+
+    configure_sinks(setting("TELEMETRY_SINKS"))
+    queries = read_queries(args.queries)
+    assistant, buckets = build_batch_assistant({
+        "openai": args.openai_rps, "embeddings": args.embeddings_rps, "tavily": args.tavily_rps
+    })
+
+    def progress(report, elapsed):
+        finished = report["ok"] + report["failed"]
+        if finished % 25 == 0:
+            print(f"{finished}/{report['total'] - report['skipped']} done, {report['failed']} failed, {finished / elapsed:.2f} queries/s")
+
+    report = asyncio.run(run_batch(
+        assistant, queries, args.output,
+        concurrency=args.concurrency, retries=args.retries, backoff=args.backoff, timeout=args.timeout,
+        retry_failed=args.retry_failed, on_progress=progress
+    ))
+    report["rate_limits"] = {name: bucket.stats() for name, bucket in buckets.items()}
+
+    latency = report["latency"]
+    print(
+        f"{report['ok']} answered, {report['failed']} failed, {report['skipped']} already done, {report['retries']} retries\n"
+        f"{report['queries_per_s']:.2f} queries/s over {report['elapsed']:.1f}s, {report['cached']} from cache, {report['tokens']:.0f} tokens\n"
+        f"latency p50 {latency['p50']:.2f}s  p95 {latency['p95']:.2f}s  p99 {latency['p99']:.2f}s"
+    )
+    for name, stats in report["rate_limits"].items():
+        print(f"{name}: {stats['acquired']} requests, {stats['throttled']} throttled, {stats['waited_s']:.1f}s waiting")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
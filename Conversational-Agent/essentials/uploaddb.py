@@ -1,37 +1,297 @@
 import os
-from dotenv import load_dotenv
-from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_redis import RedisVectorStore
-from langchain_openai import OpenAIEmbeddings
-import streamlit as st
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from utils.config import get_client, setting
+from utils.embedding_cache import get_cached_embeddings
+from utils.hybrid_retriever import get_keyword_index, keyword_version_key
+from utils.telemetry import Trace, span, count
 
-load_dotenv()
+#Built on first use from the shared client registry, so importing this module needs no OpenAI credentials
+def default_embeddings():
+    return get_client("openai_embeddings")
 
-embeddings = OpenAIEmbeddings(api_key=st.secrets["openai"]["api_key"])
+def _row_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
+def _file_fingerprint(csv_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+#The local index keeps its own vectors, so stale chunks are deleted from it as well as from Redis
+def _is_local(vector_store) -> bool:
+    module = sys.modules.get("utils.vector_index")
+    return module is not None and isinstance(vector_store, module.LocalVectorIndex)
+
+#The local vector index has a single writer, so there the lock covers the whole index; Redis indexes lock per source
+def ingest_lock_key(index_name: str, source: str) -> str:
+    return f"ingest_lock:{index_name}" if setting("VECTOR_BACKEND") == "local" else f"ingest_lock:{index_name}:{source}"
+
+#Returns the lock key when this caller may ingest, None when another ingestion holds it
+def acquire_ingest_lock(client, index_name: str, source: str, ttl: int = 3600):
+    lock_key = ingest_lock_key(index_name, source)
+    return lock_key if client.set(lock_key, str(os.getpid()), nx=True, ex=ttl) else None
+
+#Header names that usually hold a stable row identity, in order of preference
+KEY_COLUMN_HINTS = ("id", "sku", "part number", "part_number", "part no", "model")
+
+#Best guess at the key column of a CSV header, None when no column looks like one
+def guess_key_column(columns: list):
+    normalized = {column.strip().lower(): column for column in columns}
+    for hint in KEY_COLUMN_HINTS:
+        if hint in normalized:
+            return normalized[hint]
+    for hint in KEY_COLUMN_HINTS:
+        for name, column in normalized.items():
+            if hint in name.split() or name.endswith(f"_{hint}"):
+                return column
+    return None
+
+#Same "column: value" layout CSVLoader produces, so streamed rows embed identically
+def _row_to_text(row: dict) -> str:
+    return "\n".join(
+        f"{k.strip() if k is not None else k}: {v.strip() if isinstance(v, str) else ','.join(map(str.strip, v)) if isinstance(v, list) else v}"
+        for k, v in row.items()
+    )
+
+#Stage 1: read the CSV lazily, batch_size rows at a time
+def _read_batches(csv_path: str, batch_size: int, skip_rows: int = 0):
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        batch = []
+        for row_number, row in enumerate(csv.DictReader(f)):
+            if row_number < skip_rows:
+                continue
+            batch.append((row_number, row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+#row_id -> (row_number, text, row_hash) for one batch; a later duplicate of a row_id within the batch wins
+def _identify_rows(batch, key_column):
+    rows = {}
+    for row_number, row in batch:
+        text = _row_to_text(row)
+        row_hash = _row_hash(text)
+        #With a key column a row keeps its identity across edits, otherwise the row content is its identity
+        row_id = str(row.get(key_column)) if key_column else row_hash
+        rows[row_id] = (row_number, text, row_hash)
+    return rows
+
+#Stage 2: diff a batch against the manifest and chunk only new or changed rows
+def _prepare_batch(batch, rows, client, manifest_key, splitter, source):
+    row_ids = list(rows)
+    entries = client.hmget(manifest_key, row_ids) if row_ids else []
+    counts = {"added": 0, "updated": 0, "unchanged": 0}
+    prepared = {"row_ids": row_ids, "rows": len(batch), "counts": counts, "stale_keys": [], "entries": {}, "texts": [], "metadatas": [], "keys": [], "owners": []}
+    for row_id, entry in zip(row_ids, entries):
+        row_number, text, row_hash = rows[row_id]
+        entry = json.loads(entry) if entry else None
+        if entry and entry["hash"] == row_hash:
+            counts["unchanged"] += 1
+            continue
+        if entry:
+            counts["updated"] += 1
+            prepared["stale_keys"].extend(entry["keys"])
+        else:
+            counts["added"] += 1
+        prepared["entries"][row_id] = {"hash": row_hash, "keys": []}
+        for n, chunk in enumerate(splitter.split_text(text)):
+            prepared["texts"].append(chunk)
+            prepared["metadatas"].append({"source": source, "row": row_number, "row_id": row_id})
+            #Deterministic keys make a replayed batch overwrite its own vectors instead of duplicating them
+            prepared["keys"].append(_row_hash(f"{source}:{row_id}:{row_hash}:{n}")[:32])
+            prepared["owners"].append(row_id)
+    return prepared
+
+#Stage 4: write vectors, then commit manifest, seen-set and checkpoint together
+def _commit_batch(prepared, vector_store, client, manifest_key, seen_key, checkpoint_key, checkpoint, keyword_index, version_key):
+    keys = []
+    if prepared["texts"]:
+        keys = vector_store.add_texts(prepared["texts"], metadatas=prepared["metadatas"], keys=prepared["keys"])
+        for row_id, key in zip(prepared["owners"], keys):
+            prepared["entries"][row_id]["keys"].append(key)
+    pipe = client.pipeline(transaction=True)
+    if prepared["stale_keys"]:
+        pipe.delete(*prepared["stale_keys"])
+    if prepared["entries"]:
+        pipe.hset(manifest_key, mapping={row_id: json.dumps(entry) for row_id, entry in prepared["entries"].items()})
+    if prepared["row_ids"]:
+        pipe.sadd(seen_key, *prepared["row_ids"])
+    pipe.set(checkpoint_key, json.dumps(checkpoint))
+    pipe.incr(version_key)
+    version = pipe.execute()[-1]
+    if prepared["stale_keys"] and _is_local(vector_store):
+        vector_store.delete(prepared["stale_keys"])
+    keyword_index.apply(added=list(zip(keys, prepared["texts"])), removed=prepared["stale_keys"], version=version)
+
+#Rows in the manifest that this run never saw were removed from the source
+def _delete_removed_rows(client, manifest_key, seen_key, report, batch_size, keyword_index, version_key, vector_store=None):
+    cursor = 0
+    while True:
+        cursor, entries = client.hscan(manifest_key, cursor=cursor, count=batch_size)
+        row_ids = list(entries)
+        if row_ids:
+            pipe = client.pipeline(transaction=False)
+            for row_id in row_ids:
+                pipe.sismember(seen_key, row_id)
+            removed = [row_id for row_id, seen in zip(row_ids, pipe.execute()) if not seen]
+            if removed:
+                stale_keys = [key for row_id in removed for key in json.loads(entries[row_id])["keys"]]
+                pipe = client.pipeline(transaction=True)
+                if stale_keys:
+                    pipe.delete(*stale_keys)
+                pipe.hdel(manifest_key, *removed)
+                pipe.incr(version_key)
+                version = pipe.execute()[-1]
+                if stale_keys and _is_local(vector_store):
+                    vector_store.delete(stale_keys)
+                keyword_index.apply(removed=stale_keys, version=version)
+                report["deleted"] += len(removed)
+        if cursor == 0:
+            break
+
+#Streaming, resumable, row-level incremental ingestion of a CSV into the vector index
 def ingest_csv(
         csv_path: str, 
         redis_url: str, 
         index_name: str, 
         chunk_size: int = 1000, 
-        chunk_overlap: int = 200
+        chunk_overlap: int = 200,
+        source: str = None,
+        key_column: str = None,
+        batch_size: int = 500,
+        embed_workers: int = 4,
+        on_progress=None,
+        resume: bool = True,
+        embeddings=None,
+        vector_store=None,
+        redis_client=None
     ):
+    #Batches are embedded on pool threads, so spans name this trace explicitly
+    trace = Trace("ingest", index=index_name, source=source or os.path.basename(csv_path))
+    stage = "setup"
     try:
-        loader = CSVLoader(file_path=csv_path)
-        documents = loader.load()
+        source = source or os.path.basename(csv_path)
+        if redis_client is None:
+            import redis
+            redis_client = redis.Redis.from_url(redis_url, decode_responses=True)
+        client = redis_client
+        manifest_key = f"ingest_manifest:{index_name}:{source}"
+        seen_key = f"ingest_seen:{index_name}:{source}"
+        checkpoint_key = f"ingest_checkpoint:{index_name}:{source}"
+
+        #Resume only when the checkpoint belongs to this exact file
+        fingerprint = _file_fingerprint(csv_path)
+        checkpoint = json.loads(client.get(checkpoint_key) or "null")
+        if not (resume and checkpoint and checkpoint["fingerprint"] == fingerprint):
+            client.delete(seen_key)
+            checkpoint = {"fingerprint": fingerprint, "rows": 0, "batches": 0, "report": None}
+        report = checkpoint["report"] or {"source": source, "added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        if checkpoint["rows"]:
+            print(f"The Ingestion resumes {source} after row {checkpoint['rows']}")
+
+        #An injected vector store must embed through the same embeddings object for the prefetch to pay off
+        cached_embeddings = embeddings or get_cached_embeddings(default_embeddings(), redis_url)
+        if vector_store is None and setting("VECTOR_BACKEND") == "local":
+            #Manifest and checkpoints stay in Redis; vectors and texts go to the memory-mapped index
+            from utils.vector_index import LocalVectorIndex, index_path
+            vector_store = LocalVectorIndex(index_path(index_name), embeddings=cached_embeddings, dtype=setting("LOCAL_INDEX_DTYPE"))
+        elif vector_store is None:
+            from langchain_redis import RedisVectorStore
+            vector_store = RedisVectorStore(
+                embeddings=cached_embeddings,
+                index_name=index_name,
+                redis_url=redis_url
+            )
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
         splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        chunks = splitter.split_documents(documents)
-        vector_store = RedisVectorStore.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            index_name=index_name,
-            redis_url=redis_url
-        )
-        return vector_store
+        #Keeps the in-process keyword index of this index name in step with every committed batch;
+        #other processes see the bumped version and rebuild theirs
+        keyword_index = get_keyword_index(index_name)
+        version_key = keyword_version_key(index_name)
+
+        started = time.perf_counter()
+        progress = {"rows": checkpoint["rows"], "batches": checkpoint["batches"], "embedded": 0}
+
+        def commit(prepared, future):
+            #Embeddings were computed ahead into the cache, so add_texts reads them back locally
+            future.result()
+            in_flight.difference_update(prepared["row_ids"])
+            for name, value in prepared["counts"].items():
+                report[name] += value
+            progress["rows"] += prepared["rows"]
+            progress["batches"] += 1
+            progress["embedded"] += len(prepared["texts"])
+            with span("ingest_commit", trace=trace, chunks=len(prepared["texts"])):
+                _commit_batch(
+                    prepared, vector_store, client, manifest_key, seen_key, checkpoint_key,
+                    {**checkpoint, "rows": progress["rows"], "batches": progress["batches"], "report": report},
+                    keyword_index, version_key
+                )
+            count("ingest_rows", prepared["rows"], trace=trace, index=index_name)
+            count("ingest_chunks_embedded", len(prepared["texts"]), trace=trace, index=index_name)
+            if on_progress:
+                elapsed = time.perf_counter() - started
+                on_progress({
+                    **report,
+                    **progress,
+                    "elapsed": elapsed,
+                    "rows_per_s": (progress["rows"] - checkpoint["rows"]) / elapsed if elapsed else 0.0,
+                    "embeddings_per_s": progress["embedded"] / elapsed if elapsed else 0.0
+                })
+
+        def embed(texts):
+            with span("ingest_embed", trace=trace, chunks=len(texts)):
+                return cached_embeddings.embed_documents(texts)
+
+        #Stage 3: embed with at most embed_workers batches in flight, committing strictly in order
+        stage = "batches"
+        pending = deque()
+        #row_ids of prepared batches not committed yet; their manifest entries are not in Redis so far
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=max(1, embed_workers)) as pool:
+            for batch in _read_batches(csv_path, batch_size, skip_rows=checkpoint["rows"]):
+                rows = _identify_rows(batch, key_column)
+                #A key repeated from a pending batch must diff against that batch's committed entry,
+                #otherwise its manifest entry is overwritten without marking the earlier vectors stale
+                if in_flight.intersection(rows):
+                    count("ingest_pending_flushes", trace=trace, index=index_name)
+                    while pending:
+                        commit(*pending.popleft())
+                with span("ingest_prepare", trace=trace, rows=len(batch)):
+                    prepared = _prepare_batch(batch, rows, client, manifest_key, splitter, source)
+                in_flight.update(prepared["row_ids"])
+                future = pool.submit(embed, prepared["texts"])
+                pending.append((prepared, future))
+                while len(pending) >= max(1, embed_workers):
+                    commit(*pending.popleft())
+            while pending:
+                commit(*pending.popleft())
+
+        stage = "delete"
+        with span("ingest_delete", trace=trace):
+            _delete_removed_rows(client, manifest_key, seen_key, report, batch_size, keyword_index, version_key, vector_store)
+        client.delete(seen_key, checkpoint_key)
+
+        trace.attrs.update(report)
+        print(f"The Ingestion Report : {report}")
+        return report
     
     except Exception as e:
+        trace.error(stage, e)
         print(f"The Ingestion : {e}")
+    finally:
+        trace.finish()
 
 def retrieve_from_redis(
         query: str, 
@@ -40,11 +300,17 @@ def retrieve_from_redis(
         k: int = 3
     ):
     try:
-        store = RedisVectorStore(
-            index_name=index_name,
-            embedding=embeddings,
-            redis_url=redis_url
-        )
+        embeddings = get_cached_embeddings(default_embeddings(), redis_url)
+        if setting("VECTOR_BACKEND") == "local":
+            from utils.vector_index import LocalVectorIndex, index_path
+            store = LocalVectorIndex(index_path(index_name), embeddings=embeddings, readonly=True)
+        else:
+            from langchain_redis import RedisVectorStore
+            store = RedisVectorStore(
+                index_name=index_name,
+                embeddings=embeddings,
+                redis_url=redis_url
+            )
         results = store.similarity_search(query=query, k=k)
         return results
     
@@ -53,17 +319,32 @@ def retrieve_from_redis(
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a CSV into the Redis vector index")
+    parser.add_argument("csv_path", nargs="?", default="../dataset/Inventory.csv")
+    parser.add_argument("--index", default="bike_index")
+    parser.add_argument("--source", default=None)
+    parser.add_argument("--key-column", default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--no-resume", action="store_true")
+    args = parser.parse_args()
     try:
         #Uploading the Db into the Vector Store
-        csv_path = "../dataset/Inventory.csv"
-        redis_url=os.environ["REDIS_URL"]
-        index_name = "bike_index"
-        vector_store = ingest_csv(
-            csv_path=csv_path,
-            redis_url=redis_url,
-            index_name=index_name
+        report = ingest_csv(
+            csv_path=args.csv_path,
+            redis_url=setting("REDIS_URL", required=True),
+            index_name=args.index,
+            source=args.source,
+            key_column=args.key_column,
+            batch_size=args.batch_size,
+            embed_workers=args.workers,
+            resume=not args.no_resume,
+            on_progress=lambda p: print(
+                f"batch {p['batches']}: {p['rows']} rows, {p['rows_per_s']:.1f} rows/s, "
+                f"{p['embeddings_per_s']:.1f} embeddings/s"
+            )
         )
-        print(vector_store)
+        print(report)
         
     except Exception as e:
         print(f"The Retrival Error : {e}")
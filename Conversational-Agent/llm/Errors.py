@@ -6,3 +6,29 @@ class RetrivalError(Exception):
     def __str__(self):
         return f"The Error During the Retrival process in the Redis Vector DB : {self.messages}"
 
+
+class UnsafeCypherError(Exception):
+    def __init__(self, messages):
+        super().__init__(messages)
+        self.messages = messages
+    
+    def __str__(self):
+        return f"The Cypher query was rejected before execution : {self.messages}"
+
+
+class ConfigurationError(Exception):
+    def __init__(self, messages):
+        super().__init__(messages)
+        self.messages = messages
+    
+    def __str__(self):
+        return f"The Configuration is incomplete : {self.messages}"
+
+
+class ServiceOverloadedError(Exception):
+    def __init__(self, messages):
+        super().__init__(messages)
+        self.messages = messages
+    
+    def __str__(self):
+        return f"The Service is at capacity, retry shortly : {self.messages}"
@@ -1,14 +1,8 @@
-import os
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from dotenv import load_dotenv
+from functools import lru_cache
+from utils.config import setting
+from db.cypher_cache import CypherGenerator, render_cypher
 
-load_dotenv()
-
-llm = ChatOpenAI(model_name="gpt-4o", temperature=0, openai_api_key=os.environ["OPENAI_API_KEY"])
-
-prompt_template = PromptTemplate.from_template("""
+PROMPT_TEXT = """
         OBJECTIVE:  
         Serve as a Neo4j Cypher expert. Your task is to translate natural language queries from users into accurate and efficient Cypher queries that retrieve information from the Neo4j database, specifically focusing on the `Product` nodes.
 
@@ -71,12 +65,38 @@ prompt_template = PromptTemplate.from_template("""
         WHERE p.available = true
         RETURN p.name, p.category
 
+        {parameter_rules}
+
         REMEMBER:
         Your sole job is to convert a user’s request into an accurate Cypher query focused on the `Product` node. Keep responses clean, minimal, and executable. Never provide explanations unless asked.
-        """)
-
-# Use the new RunnableSequence instead of LLMChain
-chain = prompt_template | llm
+        """
+
+PARAMETER_RULES = """
+        PARAMETERS:
+        - Values written as $model0, $part0, $type0, $num0, ... in the user query are query parameters.
+        - Reference them by the same names in the Cypher and never replace them with literal values.
+        """
+
+# Use the new RunnableSequence instead of LLMChain; LangChain is imported and the chain built on first use
+@lru_cache(maxsize=1)
+def get_chain():
+    from langchain_core.prompts import PromptTemplate
+    from langchain_openai import ChatOpenAI
+    prompt_template = PromptTemplate.from_template(PROMPT_TEXT)
+    llm = ChatOpenAI(model_name="gpt-4o", temperature=0, openai_api_key=setting("OPENAI_API_KEY", required=True))
+    return prompt_template | llm
+
+def _complete(question_shape, parameter_notes=""):
+    rules = f"{PARAMETER_RULES}        - In this query: {parameter_notes}.\n" if parameter_notes else PARAMETER_RULES
+    message = get_chain().invoke({"question": question_shape, "parameter_rules": rules})
+    return message.content if hasattr(message, "content") else str(message)
+
+cypher_generator = CypherGenerator(_complete)
+
+#Returns (cypher, params); questions of an already-seen shape reuse the cached query without an LLM call
+def generate_parameterized_cypher(question):
+    return cypher_generator.generate(question)
 
 def generate_cypher_query(question):
-    return chain.invoke({"question": question})
+    cypher, params = generate_parameterized_cypher(question)
+    return render_cypher(cypher, params)
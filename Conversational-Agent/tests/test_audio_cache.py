@@ -0,0 +1,44 @@
+import os
+from utils.audio_cache import AudioStore
+
+
+def test_same_sentence_is_synthesized_once(tmp_path):
+    store = AudioStore(str(tmp_path))
+    calls = []
+
+    def synthesize():
+        calls.append(1)
+        return b"mp3 frames"
+
+    first = store.get_or_create("The Classic 350 costs Rs. 1,93,000.", synthesize)
+    second = store.get_or_create("  The Classic 350 costs Rs. 1,93,000. ", synthesize)
+
+    assert first == second == b"mp3 frames"
+    assert len(calls) == 1
+    assert store.stats()["hits"] == 1
+    #Engine and language are part of the key
+    assert store.key_for("Hello", engine="gtts") != store.key_for("Hello", engine="pyttsx3")
+    assert store.key_for("Hello", lang="en") != store.key_for("Hello", lang="hi")
+
+
+def test_least_recently_used_files_are_evicted_over_the_byte_cap(tmp_path):
+    store = AudioStore(str(tmp_path), max_bytes=25)
+    for name in ("a", "b"):
+        store.put(store.key_for(name), b"x" * 10)
+    #Reading "a" makes "b" the oldest
+    store.get(store.key_for("a"))
+    store.put(store.key_for("c"), b"x" * 10)
+
+    assert store.contains(store.key_for("a")) and store.contains(store.key_for("c"))
+    assert not store.contains(store.key_for("b"))
+    assert not os.path.exists(store.path(store.key_for("b")))
+    assert store.stats()["bytes"] == 20 and store.stats()["evictions"] == 1
+
+
+def test_a_new_process_finds_the_files_left_by_the_last_one(tmp_path):
+    key = AudioStore(str(tmp_path)).put(AudioStore.key_for("Welcome back"), b"audio")
+
+    reopened = AudioStore(str(tmp_path))
+
+    assert reopened.get(key) == b"audio"
+    assert reopened.stats()["bytes"] == 5
@@ -0,0 +1,47 @@
+import json
+import asyncio
+from essentials.batch_queries import run_batch
+from utils.rate_limit import TokenBucket, RateLimitedCompletion
+
+
+class FlakyAssistant:
+    def __init__(self, failing: set):
+        self.failing = failing
+        self.calls = []
+
+    async def processed_query(self, query, trace=None):
+        self.calls.append(query)
+        return None if query in self.failing else f"answer to {query}"
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rerun_skips_failed_ids_unless_asked_to_retry(tmp_path):
+    output = str(tmp_path / "answers.jsonl")
+    queries = [("a", "price of the Classic 350"), ("b", "mileage of the Hunter 350")]
+
+    first = FlakyAssistant(failing={"mileage of the Hunter 350"})
+    report = asyncio.run(run_batch(first, queries, output, retries=0, backoff=0))
+    assert (report["ok"], report["failed"]) == (1, 1)
+
+    #A plain rerun writes nothing new: the failure is already recorded
+    again = FlakyAssistant(failing=set())
+    report = asyncio.run(run_batch(again, queries, output, retries=0, backoff=0))
+    assert report["skipped"] == 2 and again.calls == []
+    assert len(_records(output)) == 2
+
+    report = asyncio.run(run_batch(again, queries, output, retries=0, backoff=0, retry_failed=True))
+    assert again.calls == ["mileage of the Hunter 350"]
+    records = {record["id"]: record for record in _records(output)}
+    assert len(_records(output)) == 2
+    assert records["a"]["ok"] and records["b"]["ok"]
+
+
+def test_rate_limited_completion_takes_a_token_per_call():
+    bucket = TokenBucket(rate=1000)
+    complete = RateLimitedCompletion(lambda shape, notes="": f"MATCH ({shape})", bucket)
+    assert complete("m", notes="$model0") == "MATCH (m)"
+    assert bucket.stats()["acquired"] == 1
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from utils.coalescer import AdmissionGate, RequestCoalescer
+from llm.Errors import ServiceOverloadedError
+
+
+def test_gate_caps_running_work_and_turns_away_past_the_queue():
+    async def run():
+        gate = AdmissionGate(max_concurrent=2, max_waiting=2, wait_timeout=1.0)
+        release = asyncio.Event()
+        peak = []
+
+        async def request():
+            async with gate.slot():
+                peak.append(gate.active)
+                await release.wait()
+
+        admitted = [asyncio.ensure_future(request()) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        assert (gate.active, gate.waiting) == (2, 2) and gate.saturated()
+        with pytest.raises(ServiceOverloadedError):
+            async with gate.slot():
+                pass
+        release.set()
+        await asyncio.gather(*admitted)
+        return gate, max(peak)
+
+    gate, peak = asyncio.run(run())
+    assert peak == 2
+    assert gate.stats() == {"admitted": 4, "rejected": 1, "timed_out": 0, "active": 0, "waiting": 0, "max_concurrent": 2}
+
+
+def test_queued_request_times_out_when_no_slot_frees_up():
+    async def run():
+        gate = AdmissionGate(max_concurrent=1, max_waiting=4, wait_timeout=0.05)
+        async with gate.slot():
+            with pytest.raises(ServiceOverloadedError):
+                async with gate.slot():
+                    pass
+        return gate
+
+    gate = asyncio.run(run())
+    assert gate.counters["timed_out"] == 1 and gate.waiting == 0
+
+
+def test_identical_requests_share_one_run_that_survives_a_disconnect():
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "Rs. 1,93,000"
+
+    async def run():
+        coalescer = RequestCoalescer()
+        leaver = asyncio.ensure_future(coalescer.run("price", answer))
+        others = [asyncio.ensure_future(coalescer.run("price", answer)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leaver.cancel()
+        results = await asyncio.gather(*others)
+        #Finished runs are forgotten, so a later request starts a fresh one
+        await coalescer.run("price", answer)
+        return coalescer, results
+
+    coalescer, results = asyncio.run(run())
+    assert results == [("Rs. 1,93,000", True)] * 3
+    assert len(calls) == 2
+    assert coalescer.stats() == {"leaders": 2, "followers": 3, "in_flight": 0}
+
+
+def test_late_stream_subscriber_replays_from_the_first_chunk():
+    async def produce(meta):
+        meta["route"] = "lookup"
+        for word in ("The ", "Classic ", "350 "):
+            yield word
+            await asyncio.sleep(0.01)
+
+    async def collect(flight):
+        return [chunk async for chunk in flight.subscribe()]
+
+    async def run():
+        coalescer = RequestCoalescer()
+        flight, first_coalesced = coalescer.stream("features", produce)
+        first = asyncio.ensure_future(collect(flight))
+        await asyncio.sleep(0.015)
+        late, late_coalesced = coalescer.stream("features", produce)
+        assert late is flight and late_coalesced and not first_coalesced
+        return await first, await collect(late), flight.meta
+
+    first, late, meta = asyncio.run(run())
+    assert first == late == ["The ", "Classic ", "350 "]
+    assert meta == {"route": "lookup"}
+
+
+def test_stream_error_reaches_every_subscriber():
+    async def produce(meta):
+        yield "The "
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        flight, _ = RequestCoalescer().stream("broken", produce)
+        with pytest.raises(RuntimeError):
+            [chunk async for chunk in flight.subscribe()]
+        return flight
+
+    assert asyncio.run(run()).chunks == ["The "]
@@ -0,0 +1,62 @@
+import pytest
+import utils.config as config
+from llm.Errors import ConfigurationError
+
+SECRETS = """
+VECTOR_INDEX = "top_level_index"
+
+[redis]
+REDIS_URL = "redis://from-secrets:6379"
+
+[openai]
+api_key = "sk-from-secrets"
+"""
+
+
+@pytest.fixture
+def secrets_dir(tmp_path, monkeypatch):
+    (tmp_path / ".streamlit").mkdir()
+    (tmp_path / ".streamlit" / "secrets.toml").write_text(SECRETS, encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "_load_dotenv", lambda: False)
+    config._secrets.cache_clear()
+    for name in ("REDIS_URL", "OPENAI_API_KEY", "VECTOR_INDEX", "TAVILY_API_KEY", "LLM_MODEL"):
+        monkeypatch.delenv(name, raising=False)
+    yield tmp_path
+    config._secrets.cache_clear()
+
+
+def test_environment_then_secrets_then_defaults(secrets_dir, monkeypatch):
+    #Sectioned secrets, then top-level secrets, then the built-in defaults
+    assert config.setting("REDIS_URL") == "redis://from-secrets:6379"
+    assert config.setting("OPENAI_API_KEY") == "sk-from-secrets"
+    assert config.setting("VECTOR_INDEX") == "top_level_index"
+    assert config.setting("LLM_MODEL") == config.DEFAULTS["LLM_MODEL"]
+    assert config.setting("LLM_MODEL", default="gpt-4o") == "gpt-4o"
+
+    monkeypatch.setenv("REDIS_URL", "redis://from-env:6379")
+    assert config.setting("REDIS_URL") == "redis://from-env:6379"
+
+
+def test_required_setting_without_a_value_raises(secrets_dir):
+    assert config.setting("TAVILY_API_KEY") is None
+    with pytest.raises(ConfigurationError):
+        config.setting("TAVILY_API_KEY", required=True)
+
+
+def test_clients_are_built_on_first_use_and_then_shared():
+    built = []
+    config.register_client("test_client", lambda: built.append(object()) or built[-1])
+    try:
+        assert built == []
+        first = config.get_client("test_client")
+        assert config.get_client("test_client") is first and len(built) == 1
+
+        provided = object()
+        config.provide_client("test_client", provided)
+        assert config.get_client("test_client") is provided
+        with pytest.raises(ConfigurationError):
+            config.get_client("no_such_client")
+    finally:
+        config._factories.pop("test_client", None)
+        config._clients.pop("test_client", None)
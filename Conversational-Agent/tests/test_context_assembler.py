@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document
+from utils.context_assembler import ContextAssembler
+
+
+def _row(colour: str, price: str, stock: str) -> Document:
+    text = "\n".join([
+        "model: Classic 350",
+        "type: Cruiser",
+        "engine: 349cc single cylinder air-oil cooled",
+        "power: 20.2 bhp at 6100 rpm",
+        "torque: 27 Nm at 4000 rpm",
+        "brakes: dual channel ABS with front and rear disc",
+        "fuel tank: 13 litres",
+        "kerb weight: 195 kg",
+        "seat height: 805 mm",
+        "ground clearance: 170 mm",
+        "wheels: 19 inch front and 18 inch rear spoke wheels",
+        "gearbox: 5 speed constant mesh",
+        "dealer: Royal Enfield authorised showroom",
+        f"colour: {colour}",
+        f"price: {price}",
+        f"stock: {stock}",
+    ])
+    return Document(page_content=text, metadata={"row_id": f"classic-350-{colour}"})
+
+
+def test_variant_rows_of_one_model_are_both_kept():
+    assembler = ContextAssembler(token_budget=2000)
+    documents = [[_row("Halcyon Black", "193000", "4"), _row("Signals Marsh Grey", "201000", "0")]]
+    context, report = assembler.assemble(["price and stock of the Classic 350"], [], documents)
+    assert report["duplicates"] == 0
+    for fact in ("Halcyon Black", "193000", "stock: 4", "Signals Marsh Grey", "201000", "stock: 0"):
+        assert fact in context["docs"]
+
+
+def test_same_row_found_by_two_sub_questions_is_dropped_once():
+    assembler = ContextAssembler(token_budget=2000)
+    row = _row("Halcyon Black", "193000", "4")
+    documents = [[row], [Document(page_content=row.page_content, metadata=row.metadata)]]
+    context, report = assembler.assemble(["Classic 350 price", "Classic 350 colours"], [], documents)
+    assert report["duplicates"] == 1
+    assert context["docs"].count("price: 193000") == 1
+
+
+def test_reworded_web_copy_without_new_facts_is_dropped():
+    assembler = ContextAssembler(token_budget=2000)
+    text = "The Classic 350 is a retro cruiser with a 349cc engine, dual channel ABS and a 13 litre tank, sold across India"
+    results = [{"results": [
+        {"title": "Classic 350 review", "content": text, "url": "https://example.com/a"},
+        {"title": "Classic 350 review", "content": text + " and", "url": "https://example.com/a"},
+    ]}]
+    context, report = assembler.assemble(["Classic 350 review"], results, [])
+    assert report["duplicates"] == 1
@@ -0,0 +1,30 @@
+from db.cypher_cache import CypherGenerator, describe_parameters, extract_literals, render_cypher
+
+
+def test_placeholders_carry_the_label_of_the_literal():
+    shapes = {extract_literals(f"price of {name}")[0] for name in ("Classic 350", "Clutch Plate", "Cruiser")}
+    assert shapes == {"price of $model0", "price of $part0", "price of $type0"}
+
+
+def test_literals_are_numbered_per_kind():
+    shape, params = extract_literals("parts of Classic 350 under 5000 shared with 'bullet 350'")
+    assert shape == "parts of $model1 under $num0 shared with $model0"
+    assert params == {"model0": "Bullet 350", "model1": "Classic 350", "num0": 5000}
+    assert describe_parameters(shape) == "$model1 is a BikeModel name; $num0 is a number; $model0 is a BikeModel name"
+
+
+def test_cached_cypher_is_not_replayed_for_another_label():
+    prompts = []
+
+    def complete(shape, notes):
+        prompts.append((shape, notes))
+        label = {"$model0": "BikeModel", "$part0": "Part"}[shape.split()[-1]]
+        return f"MATCH (n:{label} {{name: {shape.split()[-1]}}}) RETURN n.name"
+
+    generator = CypherGenerator(complete)
+    generator.generate("price of Classic 350")
+    cypher, params = generator.generate("price of Hunter 350")
+    assert render_cypher(cypher, params) == "MATCH (n:BikeModel {name: 'Hunter 350'}) RETURN n.name"
+    cypher, params = generator.generate("price of Clutch Plate")
+    assert render_cypher(cypher, params) == "MATCH (n:Part {name: 'Clutch Plate'}) RETURN n.name"
+    assert prompts == [("price of $model0", "$model0 is a BikeModel name"), ("price of $part0", "$part0 is a Part name")]
@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+np = pytest.importorskip("numpy")
+from types import SimpleNamespace
+from benchmarks.fakes import LocalRedis, FakeEmbeddings, FakeVectorStore
+from utils.document_store import DocumentStore
+
+ROWS = ["model: Classic 350\nprice: 193000", "model: Hunter 350\nprice: 150000", "model: Meteor 350\nprice: 205000"]
+QUERIES = ["price of the Classic 350", "price of the Hunter 350", "price of the Meteor 350"]
+
+
+def _doc_store(**kwargs):
+    redis_client = LocalRedis()
+    embeddings = FakeEmbeddings(latency=0)
+    store = FakeVectorStore(redis_client, "doc_index", embeddings, latency=0)
+    store.add_texts(ROWS)
+    return DocumentStore(redis_url=None, index_name="doc_index", embeddings=embeddings, redis_client=redis_client, vector_store=store, **kwargs)
+
+
+def test_batch_search_embeds_all_queries_in_one_request():
+    doc_store = _doc_store()
+    calls = doc_store.embeddings.calls
+
+    batched = doc_store.retrieve_similar_batch(QUERIES, k=2)
+
+    assert doc_store.embeddings.calls == calls + 1
+    single = [doc_store.retrieve_similar(query, k=2) for query in QUERIES]
+    assert [[d.page_content for d in docs] for docs in batched] == [[d.page_content for d in docs] for docs in single]
+    assert doc_store.retrieve_similar_batch([]) == []
+
+
+def test_local_store_handle_is_opened_once(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCAL_INDEX_DIR", str(tmp_path))
+    doc_store = DocumentStore(redis_url=None, index_name="doc_index", embeddings=FakeEmbeddings(latency=0), vector_backend="local")
+
+    assert doc_store.load_existing_store() is doc_store.load_existing_store()
+
+
+#Records commands and replies with canned FT.SEARCH results, like a redis-py pipeline
+class RecordingRedis:
+    def __init__(self, replies):
+        self.replies = replies
+        self.commands = []
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute_command(self, *args):
+        self.commands.append(args)
+
+    def execute(self):
+        self.round_trips += 1
+        return self.replies[:len(self.commands)]
+
+
+def test_pipelined_knn_sends_every_search_in_one_round_trip():
+    reply = [1, b"doc_index:a", [b"text", b"model: Classic 350", b"vector_distance", b"0.125"]]
+    client = RecordingRedis([reply, [0], reply])
+    doc_store = _doc_store()
+    doc_store._redis = client
+    store = SimpleNamespace(config=SimpleNamespace(content_field="text", embedding_field="embedding", vector_datatype="FLOAT32"))
+
+    results = doc_store._pipelined_knn(store, [[0.1] * 4, [0.2] * 4, [0.3] * 4], k=3)
+
+    assert client.round_trips == 1
+    assert [command[0] for command in client.commands] == ["FT.SEARCH"] * 3
+    assert np.frombuffer(client.commands[0][6], dtype=np.float32).tolist() == pytest.approx([0.1] * 4)
+    assert [len(docs) for docs in results] == [1, 0, 1]
+    assert results[0][0].page_content == "model: Classic 350"
+    assert results[0][0].metadata == {"id": "doc_index:a", "distance": 0.125}
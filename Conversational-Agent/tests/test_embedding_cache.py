@@ -0,0 +1,20 @@
+import time
+import pytest
+
+pytest.importorskip("langchain_core")
+from benchmarks.fakes import LocalRedis, FakeEmbeddings
+from utils.embedding_cache import CachedEmbeddings
+
+
+def test_redis_entries_expire_after_the_ttl():
+    redis_client = LocalRedis()
+    raw = FakeEmbeddings(dimensions=8, latency=0)
+    embeddings = CachedEmbeddings(raw, redis_client=redis_client, ttl=60)
+    embeddings.embed_documents(["Classic 350 price", "Hunter 350 price"])
+
+    assert len(redis_client._expires) == 2
+    assert all(0 < expires_at - time.time() <= 60 for expires_at in redis_client._expires.values())
+
+    #A second process (empty local tier) reads them back without calling the API
+    CachedEmbeddings(raw, redis_client=redis_client, ttl=60).embed_query("Classic 350 price")
+    assert raw.calls == 1
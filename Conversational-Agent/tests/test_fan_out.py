@@ -0,0 +1,64 @@
+import time
+import asyncio
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("numpy")
+from types import SimpleNamespace
+from benchmarks.run import build_stack, build_assistant
+
+
+def _assistant(search_latency: float, **overrides):
+    args = SimpleNamespace(
+        redis_latency=0, embed_latency=0, vector_latency=0, llm_latency=0, token_latency=0, search_latency=search_latency
+    )
+    stack = build_stack(args)
+    stack["store"].add_texts(["model: Classic 350\nprice: 193000", "model: Hunter 350\nprice: 150000"])
+    assistant = build_assistant(stack, args)
+    for name, value in overrides.items():
+        setattr(assistant, name, value)
+    return assistant
+
+
+def test_run_source_degrades_to_none_on_timeout_and_error():
+    assistant = _assistant(search_latency=0)
+
+    def slow(query):
+        time.sleep(0.3)
+        return {"results": [query]}
+
+    def broken(query):
+        raise RuntimeError("upstream 500")
+
+    async def run(fn):
+        started = time.perf_counter()
+        result = await assistant._run_source(asyncio.Semaphore(1), 0.05, "Tavily", fn, "price of the Classic 350")
+        return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(run(slow))
+    assert result is None and elapsed < 0.25
+    assert asyncio.run(run(broken))[0] is None
+
+
+def test_searches_for_every_sub_question_run_concurrently():
+    assistant = _assistant(search_latency=0.2)
+    questions = ["price of the Classic 350", "mileage of the Hunter 350", "colours of the Meteor 350", "weight of the Bullet 350"]
+
+    started = time.perf_counter()
+    web_results, documents = asyncio.run(assistant._fan_out(questions, include_web=True))
+    elapsed = time.perf_counter() - started
+
+    assert len(web_results) == 4 and len(documents) == 4
+    #Sequential searches would take 0.8s
+    assert elapsed < 0.6
+
+
+def test_timed_out_web_search_still_returns_the_vector_documents():
+    assistant = _assistant(search_latency=0.5, tavily_timeout=0.05)
+    questions = ["price of the Classic 350", "price of the Hunter 350"]
+
+    web_results, documents = asyncio.run(assistant._fan_out(questions, include_web=True))
+
+    assert web_results == []
+    assert len(documents) == 2
+    assert any("Classic 350" in document.page_content for document in documents[0])
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+from db.executor import CypherExecutor
+from db.neo4j_client import load_prompt_template
+
+
+def test_prompt_template_loads_from_any_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    load_prompt_template.cache_clear()
+    prompt = load_prompt_template().format(question="price of $model0")
+    assert "(:BikeModel" in prompt
+    assert prompt.rstrip().endswith("User Query: price of $model0\nCypher:")
+
+
+class VersionStore:
+    def __init__(self):
+        self.version = 1
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.current_thread())
+        return str(self.version)
+
+
+class CountingExecutor(CypherExecutor):
+    executed = 0
+
+    async def _execute(self, cypher, params):
+        self.executed += 1
+        return [{"price": 833.0, "run": self.executed}]
+
+
+def test_results_are_cached_per_data_version_read_off_the_event_loop():
+    store = VersionStore()
+    executor = CountingExecutor(redis_client=store, version_ttl=0)
+    cypher = "MATCH (p:Part {name: $part0})-[r:USED_IN]->(m) RETURN r.price AS price"
+
+    async def scenario():
+        first = await executor.run(cypher, {"part0": "Clutch Plate"})
+        again = await executor.run(cypher, {"part0": "Clutch Plate"})
+        store.version = 2
+        fresh = await executor.run(cypher, {"part0": "Clutch Plate"})
+        return first, again, fresh, threading.current_thread()
+
+    first, again, fresh, loop_thread = asyncio.run(scenario())
+    assert first == again and fresh[0]["run"] == 2
+    assert store.threads and loop_thread not in store.threads
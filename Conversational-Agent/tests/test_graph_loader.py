@@ -0,0 +1,73 @@
+import csv
+import threading
+import pytest
+from types import SimpleNamespace
+from db.graph_loader import load_inventory_graph, resolve_columns, UPSERT_BATCH, SCHEMA_STATEMENTS
+
+
+#Neo4j driver stand-in: records each statement and the rows of every UNWIND batch
+class RecordingDriver:
+    def __init__(self):
+        self.statements = []
+        self.batches = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def session(self, database=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, statement, **params):
+        with self._lock:
+            self.statements.append(statement)
+            if statement == UPSERT_BATCH:
+                self.batches.append(params["rows"])
+        rows = len(params.get("rows", []))
+        counters = SimpleNamespace(nodes_created=2 * rows, relationships_created=rows, properties_set=2 * rows)
+        return SimpleNamespace(consume=lambda: SimpleNamespace(counters=counters))
+
+    def execute_write(self, work):
+        return work(self)
+
+    def close(self):
+        self.closed = True
+
+
+def _write(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def test_rows_are_loaded_in_unwind_batches(tmp_path):
+    csv_path = str(tmp_path / "inventory.csv")
+    rows = [[f"Part {i}", "Classic 350", "Cruiser", str(i), "1,250.50"] for i in range(25)]
+    rows.append(["", "Classic 350", "Cruiser", "1", "10"])
+    _write(csv_path, ["Part Name", "Bike Model", "Bike Type", "Qty", "Unit Price"], rows)
+    driver = RecordingDriver()
+
+    report = load_inventory_graph(csv_path, driver=driver, batch_size=10, workers=2)
+
+    assert driver.statements[:len(SCHEMA_STATEMENTS)] == SCHEMA_STATEMENTS
+    assert sorted(len(batch) for batch in driver.batches) == [5, 10, 10]
+    assert (report["rows"], report["skipped"], report["batches"]) == (25, 1, 3)
+    assert report["relationships_created"] == 25
+    first = next(row for batch in driver.batches for row in batch if row["part"] == "Part 3")
+    assert first == {"part": "Part 3", "model": "Classic 350", "type": "Cruiser", "quantity": 3, "price": 1250.5}
+    #A driver passed in belongs to the caller
+    assert not driver.closed
+
+
+def test_columns_resolve_by_alias_or_override():
+    assert resolve_columns(["Component", "Bike", "Segment", "Count", "Cost"]) == {
+        "part": "Component", "model": "Bike", "type": "Segment", "quantity": "Count", "price": "Cost"
+    }
+    assert resolve_columns(["Item", "Bike"], overrides={"part": "Item"})["part"] == "Item"
+    with pytest.raises(ValueError):
+        resolve_columns(["Item", "Bike"])
@@ -0,0 +1,17 @@
+import os
+import sys
+import subprocess
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+#Heavy dependencies are imported on the code paths that use them, never by importing a module
+@pytest.mark.parametrize("module", ["utils.assistant_agent", "utils.document_store", "essentials.uploaddb", "utils.runtime"])
+def test_importing_does_not_load_heavy_dependencies(module):
+    probe = (
+        f"import sys, {module}; "
+        "print(','.join(name for name in ('langchain_core', 'langchain_openai', 'langchain_redis', 'redis', 'numpy', 'neo4j') if name in sys.modules))"
+    )
+    loaded = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    assert loaded == ""
@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+from utils.query_router import QueryRouter, LOOKUP, EXPAND
+
+
+@pytest.mark.parametrize("query, route", [
+    ("What is the price of the Classic 350?", LOOKUP),
+    ("Is the clutch plate in stock?", LOOKUP),
+    ("Hunter 350", LOOKUP),
+    ("Compare the Classic 350 with the Interceptor 650 for touring", EXPAND),
+    ("Price of the Classic 350 and the Hunter 350", EXPAND),
+    ("What is the price? Is it in stock?", EXPAND),
+    ("Which bike should I buy for city rides?", EXPAND),
+    ("What is the price of the Classic 350 with every accessory fitted from the showroom this month", EXPAND),
+    ("Hello there", EXPAND),
+])
+def test_routes(query, route):
+    assert QueryRouter().classify(query)[0] == route
+
+
+def test_follow_ups_are_always_expanded_and_routes_are_counted():
+    router = QueryRouter()
+    assert router.route("What is its price?", follow_up=True) == EXPAND
+    router.route("What is the price of the Classic 350?")
+
+    stats = router.stats()
+    assert (stats["total"], stats[LOOKUP], stats[EXPAND]) == (2, 1, 1)
+    assert stats["recent"][0]["reason"] == "follow-up"
+
+
+def test_lookup_skips_the_expansion_call():
+    pytest.importorskip("langchain_core")
+    pytest.importorskip("numpy")
+    from types import SimpleNamespace
+    from benchmarks.run import build_stack, build_assistant
+
+    args = SimpleNamespace(redis_latency=0, embed_latency=0, vector_latency=0, llm_latency=0, token_latency=0, search_latency=0)
+    assistant = build_assistant(build_stack(args), args)
+    expansions = []
+    original = assistant._expand_query
+
+    async def expand(user_query, conversation=None):
+        expansions.append(user_query)
+        return await original(user_query, conversation=conversation)
+
+    assistant._expand_query = expand
+    lookup = {}
+    asyncio.run(assistant._prepare_answer("What is the price of the Classic 350?", timings=lookup))
+    expanded = {}
+    asyncio.run(assistant._prepare_answer("Tell me about the features of the Classic 350", timings=expanded))
+
+    assert (lookup["route"], expanded["route"]) == (LOOKUP, EXPAND)
+    assert expansions == ["Tell me about the features of the Classic 350"]
@@ -0,0 +1,77 @@
+import zlib
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.embeddings import Embeddings
+from benchmarks.fakes import LocalRedis
+from utils.embedding_cache import CachedEmbeddings
+from utils.response_cache import ResponseCache, normalize_query
+
+
+#Bag-of-words vectors, so reworded questions land close together
+class WordEmbeddings(Embeddings):
+    def __init__(self, dimensions: int = 64):
+        self.dimensions = dimensions
+        self.model = "word-embedding"
+        self.calls = 0
+
+    def _vector(self, text: str) -> list:
+        vector = [0.0] * self.dimensions
+        for word in normalize_query(text).split():
+            vector[zlib.crc32(word.encode("utf-8")) % self.dimensions] += 1.0
+        return vector
+
+    def embed_documents(self, texts: list) -> list:
+        self.calls += 1
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+def _cache(max_semantic_entries=256):
+    raw = WordEmbeddings()
+    embeddings = CachedEmbeddings(raw, redis_client=LocalRedis())
+    cache = ResponseCache(LocalRedis(), embeddings=embeddings, semantic_threshold=0.8, max_semantic_entries=max_semantic_entries)
+    return cache, raw, embeddings
+
+
+def test_a_miss_and_its_retrieval_share_one_embedding_call():
+    cache, raw, embeddings = _cache()
+    query = "What is the price of the Classic 350?"
+    assert cache.get(query) is None
+    #Retrieval embeds the same text through the shared embedding cache
+    embeddings.embed_documents([query])
+    cache.set(query, "About 1.93 lakh.")
+    assert raw.calls == 1
+
+
+def test_semantic_tier_matches_only_the_same_numbers_and_stays_capped():
+    cache, raw, embeddings = _cache(max_semantic_entries=3)
+    cache.set("What is the price of the Classic 350?", "About 1.93 lakh.")
+    assert cache.get("what's the price of the classic 350 bike") == "About 1.93 lakh."
+    assert cache.get("What is the price of the Classic 650?") is None
+    for n in range(5):
+        cache.set(f"Hunter 350 colour option {n}", f"answer {n}")
+    assert cache.stats()["semantic_entries"] == 3
+
+
+
+def test_counters_are_updated_under_the_lock():
+    cache = ResponseCache(LocalRedis())
+
+    #Request threads share one cache, so every counter write must happen while the cache lock is held
+    class LockedCounters(dict):
+        def __setitem__(self, name, value):
+            assert cache._lock.locked(), f"{name} updated outside the lock"
+            super().__setitem__(name, value)
+
+    cache.counters = LockedCounters(cache.counters)
+    cache.set("price of the Classic 350", "Rs. 1,93,000")
+    cache.get("price of the Classic 350")
+    cache._local.clear()
+    cache.get("price of the Classic 350")
+    cache.get("price of the Meteor 350")
+
+    stats = cache.stats()
+    assert (stats["local_hits"], stats["redis_hits"], stats["misses"]) == (1, 1, 1)
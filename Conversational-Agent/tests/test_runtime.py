@@ -0,0 +1,83 @@
+import threading
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("numpy")
+pytest.importorskip("httpx")
+from benchmarks.fakes import LocalRedis, FakeChatModel, FakeEmbeddings, FakeVectorStore
+from utils.embedding_cache import CachedEmbeddings
+from utils.document_store import DocumentStore
+from utils.web_search import StubSearchBackend
+from utils.config import reset_clients
+import utils.runtime as runtime
+
+
+def _config():
+    redis_client = LocalRedis()
+    embeddings = CachedEmbeddings(FakeEmbeddings(latency=0), redis_client=redis_client)
+    store = FakeVectorStore(redis_client, "runtime_index", embeddings, latency=0)
+    store.add_texts(["model: Classic 350\nprice: 193000"])
+    doc_store = DocumentStore(
+        redis_url=None, index_name="runtime_index", embeddings=embeddings, redis_client=redis_client, vector_store=store
+    )
+    return {
+        "llm_model": "fake-chat", "openai_api_key": None, "tavily_api_key": None, "redis_url": None,
+        "redis_cache_host": None, "redis_port": None, "redis_cache_password": None, "redis_cache_db": 0,
+        "vector_index": "runtime_index", "llm": FakeChatModel(latency=0, token_latency=0),
+        "redis_client": redis_client, "doc_store": doc_store, "search_backend": StubSearchBackend()
+    }
+
+
+@pytest.fixture
+def fresh_runtime(monkeypatch):
+    monkeypatch.setattr(runtime, "_runtime", None)
+    yield
+    if runtime._runtime is not None:
+        runtime._runtime.close()
+    reset_clients()
+
+
+def test_runtime_needs_a_config_before_first_use(fresh_runtime):
+    with pytest.raises(ValueError):
+        runtime.get_runtime()
+
+
+def test_sessions_share_one_runtime_built_once(fresh_runtime, monkeypatch):
+    built = []
+    original = runtime.AssistantRuntime.__init__
+
+    def counting_init(self, *args, **kwargs):
+        built.append(self)
+        original(self, *args, **kwargs)
+
+    monkeypatch.setattr(runtime.AssistantRuntime, "__init__", counting_init)
+    config = _config()
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(runtime.get_runtime(config))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 1
+    assert all(instance is built[0] for instance in seen)
+    #Later callers need no config at all
+    assert runtime.get_runtime() is built[0]
+
+
+def test_concurrent_sessions_are_answered_on_the_shared_loop(fresh_runtime):
+    shared = runtime.get_runtime(_config())
+    answers = [None] * 4
+
+    def ask(i):
+        answers[i] = shared.ask(f"What is the price of the Classic 350 in city {i}?", timeout=10)
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(answers)
+    status = shared.health_check()
+    assert status["healthy"], status
@@ -0,0 +1,35 @@
+import pytest
+from utils.session_store import SessionHistory, is_follow_up
+
+
+@pytest.mark.parametrize("query", [
+    "Classic 350 price",
+    "Tell me more about the Himalayan 450",
+    "What is the on-road price of Bullet 350 and does it have ABS?",
+    "Which other bikes do you have in stock?",
+    "Hello",
+    "Show me one cruiser under 2 lakh",
+])
+def test_standalone_questions_are_not_follow_ups(query):
+    assert not is_follow_up(query)
+
+
+@pytest.mark.parametrize("query", [
+    "what about its price?",
+    "And in black?",
+    "Is it available this week?",
+    "How does that one compare on mileage?",
+    "Which one is cheaper?",
+])
+def test_follow_ups(query):
+    assert is_follow_up(query)
+
+
+def test_window_folds_old_turns_into_the_summary():
+    history = SessionHistory("s", window=2)
+    for n in range(3):
+        history.append({"role": "user", "content": f"question {n}"})
+        history.append({"role": "assistant", "content": f"Answer {n}. More detail."})
+    assert history.turn_count() == 3
+    assert history.summary.splitlines() == ["User asked: question 0 | Assistant: Answer 0.", "User asked: question 1 | Assistant: Answer 1."]
+    assert "User: question 2" in history.context()
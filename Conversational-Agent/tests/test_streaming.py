@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("numpy")
+from types import SimpleNamespace
+from benchmarks.run import build_stack, build_assistant
+
+
+def _assistant():
+    args = SimpleNamespace(redis_latency=0, embed_latency=0, vector_latency=0, llm_latency=0.05, token_latency=0.001, search_latency=0)
+    stack = build_stack(args)
+    stack["store"].add_texts(["model: Classic 350\nprice: 193000"])
+    return build_assistant(stack, args)
+
+
+def _collect(assistant, query, **kwargs):
+    async def run():
+        timings = {}
+        parts = [part async for part in assistant.stream_query(query, timings=timings, **kwargs)]
+        return parts, timings
+    return asyncio.run(run())
+
+
+def test_answer_streams_token_by_token_then_comes_from_the_cache():
+    assistant = _assistant()
+    query = "Tell me about the features of the Classic 350"
+
+    parts, timings = _collect(assistant, query)
+    assert len(parts) > 10
+    assert timings["time_to_first_token"] < timings["total_time"]
+    assert "cached" not in timings
+
+    #The streamed answer was cached whole, so a repeat arrives as a single chunk
+    again, timings = _collect(assistant, query)
+    assert again == ["".join(parts)]
+    assert timings["cached"]
+
+
+def test_by_sentence_yields_whole_sentences():
+    assistant = _assistant()
+
+    parts, _ = _collect(assistant, "Which bike should I buy for city rides?", by_sentence=True)
+
+    assert len(parts) > 1
+    assert all(part.rstrip().endswith(".") for part in parts)
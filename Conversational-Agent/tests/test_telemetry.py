@@ -0,0 +1,84 @@
+import json
+import socket
+import urllib.request
+from utils import telemetry
+from utils.telemetry import MetricsRegistry, PrometheusSink, JsonLinesSink, Trace, span, count, record_tokens
+
+
+def test_spans_nest_and_sum_per_stage_in_the_trace():
+    trace = Trace("message")
+    with trace.activate():
+        with span("retrieval"):
+            with span("tavily", results=2):
+                pass
+            with span("tavily", results=0):
+                pass
+        count("cache_lookups", cache="response", result="miss")
+
+    breakdown = {stage["stage"]: stage for stage in trace.breakdown()}
+    assert breakdown["retrieval"]["depth"] == 0 and breakdown["tavily"]["depth"] == 1
+    assert breakdown["tavily"]["calls"] == 2
+    assert trace.counters == {"cache_lookups.response.miss": 1}
+
+
+def test_token_counts_fall_back_to_an_estimate():
+    trace = Trace("message")
+    assert record_tokens("generation", {"input_tokens": 120, "output_tokens": 40}, trace=trace, model="gpt-4") == (120, 40)
+    assert record_tokens("expansion", None, "x" * 10, "y" * 40, trace=trace) == (10, 3)
+
+    assert trace.counters["llm_tokens.input.gpt-4.generation"] == 120
+    assert trace.counters["llm_token_estimates.expansion"] == 1
+    assert trace.attrs["models"] == {"generation": "gpt-4"}
+
+
+def test_prometheus_text_has_cumulative_buckets_and_collector_gauges():
+    registry = MetricsRegistry(namespace="test")
+    registry.inc("errors", stage="generation")
+    for seconds in (0.02, 0.2, 40.0):
+        registry.observe("stage_seconds", seconds, stage="knn")
+    registry.register_collector("cache", lambda: {"hit_ratio": 0.5, "enabled": True, "name": "bike_cache"})
+
+    lines = registry.render_prometheus().splitlines()
+
+    assert 'test_errors_total{stage="generation"} 1' in lines
+    assert 'test_stage_seconds_bucket{stage="knn",le="0.05"} 1' in lines
+    assert 'test_stage_seconds_bucket{stage="knn",le="0.25"} 2' in lines
+    assert 'test_stage_seconds_bucket{stage="knn",le="+Inf"} 3' in lines
+    assert 'test_stage_seconds_count{stage="knn"} 3' in lines
+    assert "test_cache_hit_ratio 0.5" in lines
+    assert not any("enabled" in line or "bike_cache" in line for line in lines)
+
+
+def test_workers_bind_the_next_free_port_of_the_range():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        first = probe.getsockname()[1]
+    registry = MetricsRegistry(namespace="ranged")
+    registry.inc("requests")
+    sinks = [PrometheusSink(port=first, host="127.0.0.1", registry=registry, last_port=first + 1)]
+    try:
+        sinks.append(PrometheusSink(port=first, host="127.0.0.1", registry=registry, last_port=first + 1))
+        assert [sink.port for sink in sinks] == [first, first + 1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{sinks[1].port}/metrics").read().decode("utf-8")
+        assert "ranged_requests_total 1" in body
+    finally:
+        for sink in sinks:
+            sink.close()
+
+
+def test_finished_trace_is_written_once_as_a_json_line(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    sink = telemetry.add_sink(JsonLinesSink(str(path)))
+    try:
+        trace = Trace("message", query="price of the Classic 350")
+        with span("generation", trace=trace):
+            pass
+        trace.finish()
+        trace.finish()
+    finally:
+        telemetry._sinks.remove(sink)
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(records) == 1
+    assert records[0]["attrs"] == {"query": "price of the Classic 350"}
+    assert [s["name"] for s in records[0]["spans"]] == ["generation"]
@@ -0,0 +1,21 @@
+import threading
+from benchmarks.fakes import fake_synthesizer
+from utils.tts import SpeechPipeline, register_engine, get_speech_executor
+
+register_engine("test_engine", fake_synthesizer(seconds_per_char=0))
+
+
+def test_pipelines_reuse_one_process_wide_executor():
+    first = SpeechPipeline(engine="test_engine", use_cache=False)
+    first.feed("The Classic 350 costs Rs. 1,93,000. It weighs 195 kg.")
+    audio = first.join().getvalue()
+    threads = threading.active_count()
+
+    for _ in range(20):
+        pipeline = SpeechPipeline(engine="test_engine", use_cache=False)
+        pipeline.feed("The Classic 350 costs Rs. 1,93,000. It weighs 195 kg.")
+        assert pipeline.join().getvalue() == audio
+        assert pipeline._pool is first._pool
+
+    assert first._pool is get_speech_executor("test_engine")
+    assert threading.active_count() <= threads + first._pool._max_workers
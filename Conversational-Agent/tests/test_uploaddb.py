@@ -0,0 +1,79 @@
+import csv
+import json
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+from benchmarks.fakes import LocalRedis, FakeEmbeddings, FakeVectorStore
+from essentials.uploaddb import ingest_csv
+
+
+def _write(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "model", "price"])
+        writer.writerows(rows)
+
+
+def test_key_repeated_in_a_pending_batch_leaves_no_orphaned_vectors(tmp_path):
+    redis_client = LocalRedis()
+    embeddings = FakeEmbeddings(latency=0)
+    store = FakeVectorStore(redis_client, "test_index", embeddings, latency=0)
+    csv_path = str(tmp_path / "inventory.csv")
+    #"1" is edited in the second batch while the first is still being embedded
+    _write(csv_path, [["1", "Classic 350", "193000"], ["2", "Hunter 350", "150000"], ["1", "Classic 350", "199000"], ["3", "Bullet 350", "175000"]])
+
+    report = ingest_csv(
+        csv_path, redis_url=None, index_name="test_index", source="inventory.csv", key_column="id",
+        batch_size=2, embed_workers=4, resume=False, embeddings=embeddings, vector_store=store, redis_client=redis_client
+    )
+
+    assert report["added"] == 3 and report["updated"] == 1
+    manifest = redis_client.hgetall("ingest_manifest:test_index:inventory.csv")
+    listed = {key for entry in manifest.values() for key in json.loads(entry)["keys"]}
+    stored = set(redis_client.scan_iter(match="test_index:*"))
+    assert stored == listed
+    assert len(stored) == 3
+
+
+def test_worker_that_did_not_ingest_rebuilds_its_keyword_index(tmp_path):
+    from types import SimpleNamespace
+    from utils.hybrid_retriever import HybridRetriever, KeywordIndex
+
+    redis_client = LocalRedis()
+    embeddings = FakeEmbeddings(latency=0)
+    store = FakeVectorStore(redis_client, "worker_index", embeddings, latency=0)
+    csv_path = str(tmp_path / "inventory.csv")
+
+    def ingest(rows):
+        _write(csv_path, rows)
+        ingest_csv(
+            csv_path, redis_url=None, index_name="worker_index", source="inventory.csv", key_column="id",
+            batch_size=2, resume=False, embeddings=embeddings, vector_store=store, redis_client=redis_client
+        )
+
+    #Another API worker: its own keyword index, only Redis in common with the ingesting process
+    doc_store = SimpleNamespace(index_name="worker_index", load_existing_store=lambda: store, _redis_client=lambda: redis_client)
+    retriever = HybridRetriever(doc_store, KeywordIndex(), version_check_interval=0)
+
+    ingest([["1", "Classic 350", "193000"], ["2", "Hunter 350", "150000"]])
+    retriever.ensure_index()
+    assert any("Hunter" in text for _, _, text in retriever.keyword_index.search("Hunter"))
+
+    ingest([["1", "Classic 350", "193000"], ["2", "Meteor 350", "150000"]])
+    retriever.ensure_index()
+    assert retriever.counters["rebuilds"] == 1
+    assert retriever.keyword_index.search("Hunter") == []
+    assert any("Meteor" in text for _, _, text in retriever.keyword_index.search("Meteor"))
+
+    #Nothing changed since, so the next check keeps the loaded index
+    retriever.ensure_index()
+    assert retriever.counters["rebuilds"] == 1
+
+
+def test_guess_key_column_prefers_identifiers_over_descriptions():
+    from essentials.uploaddb import guess_key_column
+
+    assert guess_key_column(["Description", "Model", "ID", "Price"]) == "ID"
+    assert guess_key_column(["Description", "Part Number", "Price"]) == "Part Number"
+    assert guess_key_column(["name", "bike_model", "price"]) == "bike_model"
+    assert guess_key_column(["Description", "Price"]) is None
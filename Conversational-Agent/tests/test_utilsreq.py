@@ -0,0 +1,37 @@
+from utils.utilsreq import parse_sub_questions
+
+
+def test_fenced_json():
+    reply = 'Here are the questions:\n```json\n{"questions": ["What is the price of the Classic 350?", "Is it in stock?"]}\n```'
+    assert parse_sub_questions(reply) == ["What is the price of the Classic 350?", "Is it in stock?"]
+
+
+def test_chatty_json():
+    reply = 'Sure! {"questions": ["Classic 350 mileage?", "Classic 350 colours?"]} Hope that helps.'
+    assert parse_sub_questions(reply) == ["Classic 350 mileage?", "Classic 350 colours?"]
+
+
+def test_bare_list():
+    assert parse_sub_questions('["Hunter 350 price?", "Hunter 350 weight?"]') == ["Hunter 350 price?", "Hunter 350 weight?"]
+
+
+def test_numbered_lines():
+    reply = "1. What is the Meteor 350 price?\n2) Which colours are available?\n- Is there a waiting period?"
+    assert parse_sub_questions(reply) == [
+        "What is the Meteor 350 price?", "Which colours are available?", "Is there a waiting period?"
+    ]
+
+
+def test_truncated_json():
+    assert parse_sub_questions('{"questions": ["What') == ["What"]
+    reply = '```json\n{"questions": ["What is the Bullet 350 price?", "Does the Bullet 350 have ABS?", '
+    assert parse_sub_questions(reply) == ["What is the Bullet 350 price?", "Does the Bullet 350 have ABS?"]
+
+
+def test_duplicates_and_limit():
+    reply = '{"questions": ["A 350 price?", "a 350 price ?", "B 350?", "C 350?", "D 350?", "E 350?"]}'
+    assert parse_sub_questions(reply, limit=3) == ["A 350 price?", "B 350?", "C 350?"]
+
+
+def test_unusable_reply():
+    assert parse_sub_questions("I cannot help with that.") == []
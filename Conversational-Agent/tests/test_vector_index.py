@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+from utils.vector_index import LocalVectorIndex
+
+
+def _fill(index, rows: int, dim: int = 8):
+    vectors = np.random.default_rng(0).standard_normal((rows, dim), dtype=np.float32)
+    texts = [f"row {i} " + "x" * (i % 7) for i in range(rows)]
+    index.add_vectors(vectors, texts, metadatas=[{"row": i} for i in range(rows)], keys=[f"k{i}" for i in range(rows)])
+    return vectors, texts
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_reader_searches_through_a_compaction_before_it_refreshes(tmp_path, dtype):
+    writer = LocalVectorIndex(str(tmp_path / "index"), dtype=dtype)
+    vectors, texts = _fill(writer, 50)
+    reader = LocalVectorIndex(str(tmp_path / "index"), readonly=True, refresh_interval=3600)
+    writer.delete([f"k{i}" for i in range(0, 50, 2)])
+    writer.compact()
+
+    #Still on the pre-compaction mapping: every hit must resolve to the text it was stored with
+    for record, score in reader.search(vectors[:5], k=3)[0]:
+        assert record["text"] == texts[record["metadata"]["row"]]
+
+    reader.refresh_interval = 0
+    hits = reader.search(vectors[1:2], k=1)[0]
+    assert hits[0][0]["key"] == "k1"
+    assert len(reader) == 25
+
+
+def test_key_repeated_within_one_batch_keeps_only_its_last_row(tmp_path):
+    index = LocalVectorIndex(str(tmp_path / "index"))
+    vectors = np.eye(3, dtype=np.float32)
+    index.add_vectors(vectors, ["first k", "second k", "z"], keys=["k", "k", "z"])
+
+    assert len(index) == 2
+    assert sorted(index.records()) == [("k", "second k"), ("z", "z")]
+    hits = index.search(vectors[0], k=3)[0]
+    assert sorted(record["text"] for record, _ in hits) == ["second k", "z"]
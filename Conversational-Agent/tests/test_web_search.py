@@ -0,0 +1,56 @@
+import asyncio
+from benchmarks.fakes import LocalRedis
+from utils.web_search import WebSearchCache, StubSearchBackend
+import utils.web_search as web_search
+
+
+def test_concurrent_identical_searches_share_one_backend_call():
+    backend = StubSearchBackend(latency=0.1)
+    cache = WebSearchCache(backend)
+
+    async def run():
+        return await asyncio.gather(*(cache.search(query) for query in ["Classic 350 price", "classic 350 price?", "Classic  350 PRICE"]))
+
+    results = asyncio.run(run())
+
+    assert backend.calls == 1
+    assert results[0] == results[1] == results[2]
+    assert cache.stats()["coalesced"] == 2
+
+
+def test_results_are_shared_through_redis_and_expire_locally(monkeypatch):
+    redis_client = LocalRedis()
+    backend = StubSearchBackend()
+    asyncio.run(WebSearchCache(backend, redis_client=redis_client, ttl=60).search("Hunter 350 mileage"))
+
+    #Another worker reads the stored result instead of calling Tavily
+    other = WebSearchCache(backend, redis_client=redis_client, ttl=60)
+    asyncio.run(other.search("Hunter 350 mileage"))
+    assert backend.calls == 1 and other.stats()["redis_hits"] == 1
+
+    local = WebSearchCache(backend, ttl=60)
+    asyncio.run(local.search("Meteor 350 colours"))
+    now = web_search.time.time()
+    monkeypatch.setattr(web_search.time, "time", lambda: now + 61)
+    asyncio.run(local.search("Meteor 350 colours"))
+    assert backend.calls == 3
+
+
+def test_a_caller_timing_out_does_not_cancel_the_search_for_others():
+    backend = StubSearchBackend(latency=0.2)
+    cache = WebSearchCache(backend)
+
+    async def run():
+        impatient = asyncio.wait_for(cache.search("Bullet 350 weight"), timeout=0.05)
+        patient = cache.search("Bullet 350 weight")
+        return await asyncio.gather(impatient, patient, return_exceptions=True)
+
+    impatient, patient = asyncio.run(run())
+
+    assert isinstance(impatient, asyncio.TimeoutError)
+    assert patient == {"query": "Bullet 350 weight", "results": []}
+    assert backend.calls == 1
+
+
+def test_unique_merges_sub_questions_that_differ_only_in_case_and_punctuation():
+    assert WebSearchCache.unique(["Classic 350 price?", "classic 350 price", "Hunter 350 price", "?"]) == ["Classic 350 price?", "Hunter 350 price"]
@@ -0,0 +1,52 @@
+import json
+import httpx
+from llm.Errors import ServiceOverloadedError
+
+
+#Thin client of the headless service (api.py), used by the Streamlit app when ASSISTANT_API_URL is set
+class AssistantClient:
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        self.http = httpx.Client(base_url=base_url.rstrip("/"), timeout=httpx.Timeout(timeout, connect=5.0))
+
+    def _check(self, response):
+        if response.status_code == 503:
+            response.read()
+            raise ServiceOverloadedError(response.text)
+        response.raise_for_status()
+
+    def ask(self, question: str, conversation: str = None) -> dict:
+        response = self.http.post("/ask", json={"question": question, "conversation": conversation})
+        self._check(response)
+        return response.json()
+
+    #Yields text deltas; the closing event's timings, stages and route land in timings (under "server" as a whole)
+    def ask_stream(self, question: str, by_sentence: bool = False, timings: dict = None, conversation: str = None):
+        timings = timings if timings is not None else {}
+        body = {"question": question, "by_sentence": by_sentence, "conversation": conversation}
+        with self.http.stream("POST", "/ask/stream", json=body) as response:
+            self._check(response)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "delta" in event:
+                    yield event["delta"]
+                elif event.get("done"):
+                    timings.update(event.get("timings") or {})
+                    timings["server"] = event
+                elif "error" in event:
+                    if event.get("overloaded"):
+                        raise ServiceOverloadedError(event["error"])
+                    print(f"The Service Stream Error : {event['error']}")
+
+    def ingest(self, csv_path: str, source: str, key_column: str = None) -> dict:
+        params = {"source": source}
+        if key_column:
+            params["key_column"] = key_column
+        with open(csv_path, "rb") as f:
+            response = self.http.post("/ingest", params=params, content=f, headers={"Content-Type": "text/csv"}, timeout=None)
+        self._check(response)
+        return response.json()
+
+    def close(self):
+        self.http.close()
@@ -1,14 +1,12 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
+from utils.config import get_client
 
-load_dotenv()
+#Smoke test of the OpenAI key; run with python -m utils.api_testing
+if __name__ == "__main__":
+    client = get_client("openai")
 
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    response = client.responses.create(
+        model="gpt-4o",
+        input="Latest Bike in Royal Enfield Showroom"
+    )
 
-response = client.responses.create(
-    model="gpt-4o",
-    input="Latest Bike in Royal Enfield Showroom"
-)
-
-print(response.output_text)
\ No newline at end of file
+    print(response.output_text)
\ No newline at end of file
@@ -1,14 +1,32 @@
-import os
 import json
-import redis
+import time
 import asyncio
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from tavily import TavilyClient
 from utils.document_store import DocumentStore
+from utils.response_cache import ResponseCache
+from utils.utilsreq import SENTENCE_BOUNDARY, parse_sub_questions
+from utils.web_search import WebSearchCache, TavilyBackend
+from utils.hybrid_retriever import HybridRetriever, get_keyword_index
+from utils.query_router import QueryRouter, LOOKUP
+from utils.context_assembler import ContextAssembler
+from utils.session_store import is_follow_up
+from utils.telemetry import REGISTRY, Trace, current_trace, span, count, record_tokens
+from db.neo4j_client import generate_parameterized_cypher
 
-load_dotenv()
+def _model_name(llm) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+
+#Function-calling schema for expansion; maxItems is a hint to the model, the cap itself is applied when parsing
+def _sub_question_schema(limit: int) -> dict:
+    return {
+        "title": "sub_questions",
+        "description": "Standalone questions to research before answering the customer",
+        "type": "object",
+        "properties": {
+            "questions": {"type": "array", "items": {"type": "string"}, "maxItems": limit, "description": f"At most {limit} questions"}
+        },
+        "required": ["questions"]
+    }
 
 # redis_cache_host: str, redis_cache_port: int, redis_cache_db: int,
 class RoyalEnfieldBikeAssistant:
@@ -21,105 +39,394 @@ class RoyalEnfieldBikeAssistant:
                  redis_port: int,
                  redis_cache_password: str,
                  redis_cache_db: int, 
-                 vector_index: str
+                 vector_index: str,
+                 retrieval_concurrency: int = 8,
+                 tavily_timeout: float = 10.0,
+                 vector_timeout: float = 5.0,
+                 redis_max_connections: int = 16,
+                 http_client=None,
+                 http_async_client=None,
+                 cache_ttl: int = 3600,
+                 semantic_cache_threshold: float = 0.92,
+                 semantic_cache_entries: int = 256,
+                 web_cache_ttl: int = 900,
+                 search_backend=None,
+                 graph_executor=None,
+                 graph_timeout: float = 5.0,
+                 context_token_budget: int = 1500,
+                 rate_limiter=None,
+                 expansion_model: str = None,
+                 max_sub_questions: int = 4,
+                 llm=None,
+                 expansion_llm=None,
+                 redis_client=None,
+                 doc_store=None
         ):
+        self.retrieval_concurrency = retrieval_concurrency
+        self.tavily_timeout = tavily_timeout
+        self.vector_timeout = vector_timeout
+        self.graph_executor = graph_executor
+        self.graph_timeout = graph_timeout
+        self.max_sub_questions = max_sub_questions
+        self._expansion_runners = {}
         try:
-            self.llm = ChatOpenAI(model_name=llm_model, temperature=0,api_key=openai_api_key)
-            self.tavily = TavilyClient(api_key=tavily_api_key)
+            #llm, expansion_llm, redis_client and doc_store let benchmarks and tests substitute local stand-ins
+            if llm is None or (expansion_llm is None and expansion_model and expansion_model != llm_model):
+                from langchain_openai import ChatOpenAI
+                #rate_limiter (a LangChain BaseRateLimiter) lets batch jobs share one OpenAI request budget
+                limits = {"rate_limiter": rate_limiter} if rate_limiter is not None else {}
+
+                def chat_model(model_name):
+                    return ChatOpenAI(
+                        model_name=model_name,
+                        temperature=0,
+                        api_key=openai_api_key,
+                        http_client=http_client,
+                        http_async_client=http_async_client,
+                        stream_usage=True,
+                        **limits
+                    )
+                #Model tiers: the large model writes the answer, a small fast one rewrites the question
+                if llm is None:
+                    llm = chat_model(llm_model)
+                if expansion_llm is None and expansion_model and expansion_model != llm_model:
+                    expansion_llm = chat_model(expansion_model)
+            self.llm = llm
+            self.expansion_llm = expansion_llm or llm
+            self.stage_models = {"expansion": _model_name(self.expansion_llm), "generation": _model_name(self.llm)}
             #self.redis_cache = redis.StrictRedis(host=redis_cache_host, port=redis_cache_port, db=redis_cache_db)
+            self.redis_pool = None
             try:
-              self.redis_cache = redis.StrictRedis(
-                   host=redis_cache_host,
-                   port=redis_port,
-                   decode_responses=True,
-                   username="default",
-                   password=redis_cache_password,
-                   db = redis_cache_db
+                if redis_client is not None:
+                    self.redis_cache = redis_client
+                else:
+                    import redis
+                    #Bounded pool shared by every request served by this assistant
+                    self.redis_pool = redis.BlockingConnectionPool(
+                        host=redis_cache_host,
+                        port=redis_port,
+                        decode_responses=True,
+                        username="default",
+                        password=redis_cache_password,
+                        db = redis_cache_db,
+                        max_connections=redis_max_connections
                     )
+                    self.redis_cache = redis.StrictRedis(connection_pool=self.redis_pool)
             except Exception as e:
                 raise ValueError(f"the Exception Arises in configuration of Cache:{e}")
-            self.doc_store = DocumentStore(redis_url=redis_url, index_name=vector_index)
+            #Any object with search(query) -> dict can stand in for Tavily
+            self.web_search = WebSearchCache(
+                search_backend or TavilyBackend(api_key=tavily_api_key),
+                redis_client=self.redis_cache,
+                ttl=web_cache_ttl
+            )
+            self.doc_store = doc_store or DocumentStore(redis_url=redis_url, index_name=vector_index)
+            self.retriever = HybridRetriever(self.doc_store, get_keyword_index(self.doc_store.index_name))
+            self.router = QueryRouter()
+            self.context_assembler = ContextAssembler(token_budget=context_token_budget)
+            self.response_cache = ResponseCache(
+                self.redis_cache,
+                embeddings=self.doc_store.embeddings,
+                ttl=cache_ttl,
+                semantic_threshold=semantic_cache_threshold,
+                max_semantic_entries=semantic_cache_entries
+            )
+            #Cache hit ratios and routing shares are read at scrape time
+            REGISTRY.register_collector("response_cache", self.response_cache.stats)
+            REGISTRY.register_collector("web_cache", self.web_search.stats)
+            REGISTRY.register_collector("router", self.router.stats)
+            if hasattr(self.doc_store.embeddings, "stats"):
+                REGISTRY.register_collector("embedding_cache", self.doc_store.embeddings.stats)
         except Exception as e:
             print(f"the Error in the COnfigurational Settings : {e}")
 
     def _check_cache(self, query: str) -> str:
-        key = f"bike_cache:{query}"
-        if self.redis_cache.exists(key):
-            return self.redis_cache.get(key).decode("utf-8")
-        return None
+        return self.response_cache.get(query)
 
     def _update_cache(self, query: str, response: str):
-        key = f"bike_cache:{query}"
-        self.redis_cache.set(key, response, ex=3600)
+        self.response_cache.set(query, response)
+
+    #Runs one source call (blocking ones in a worker thread), degrading to None on timeout or failure
+    async def _run_source(self, semaphore: asyncio.Semaphore, timeout: float, source: str, fn, *args, **kwargs):
+        async with semaphore:
+            with span(source.lower()) as attrs:
+                try:
+                    call = fn(*args, **kwargs) if asyncio.iscoroutinefunction(fn) else asyncio.to_thread(fn, *args, **kwargs)
+                    result = await asyncio.wait_for(call, timeout=timeout)
+                    attrs["results"] = len(result) if isinstance(result, list) else len((result or {}).get("results", []))
+                    return result
+                except asyncio.TimeoutError:
+                    attrs["error"] = "timeout"
+                    count("source_failures", source=source, reason="timeout")
+                    print(f"The {source} source timed out after {timeout}s for: {args[0] if args else ''}")
+                except Exception as e:
+                    attrs["error"] = type(e).__name__
+                    count("source_failures", source=source, reason="error")
+                    print(f"The {source} source failed : {e}")
+                return None
+
+    #Fans out every web search and vector search for every sub-question at once
+    async def _gather_context(self, questions: list, include_web: bool = True):
+        with span("retrieval", questions=len(questions)) as attrs:
+            tavily_results, documents = await self._fan_out(questions, include_web)
+            retrieved = sum(len(ranked) for ranked in documents if ranked)
+            attrs.update(web_results=len(tavily_results), documents=retrieved)
+        count("retrieved_documents", retrieved)
+        return tavily_results, documents
+
+    async def _fan_out(self, questions: list, include_web: bool):
+        semaphore = asyncio.Semaphore(max(1, self.retrieval_concurrency))
+        #Near-identical sub-questions are merged so each distinct search runs once
+        web_queries = WebSearchCache.unique(questions) if include_web else []
+        tavily_tasks = [
+            self._run_source(semaphore, self.tavily_timeout, "Tavily", self.web_search.search, query)
+            for query in web_queries
+        ]
+        #Keyword hits answer exact model/part lookups; the rest share one embedding call and one pipelined KNN round trip
+        vector_task = self._run_source(
+            semaphore, self.vector_timeout, "VectorDB", self.retriever.retrieve_batch, questions, k=3
+        )
+        results = await asyncio.gather(*tavily_tasks, vector_task)
+        tavily_results = [result for result in results[:len(web_queries)] if result]
+        #One ranked document list per sub-question; the context assembler merges and trims them
+        return tavily_results, results[-1] or []
     
-    #Algorithm for Determining the User Query Regaridng the Request
-    async def processed_query(self, user_query : str) -> str:
+    #Prompt | model per (conversation or not); structured output where the model supports tool calling
+    def _expansion_runner(self, with_conversation: bool):
+        runner = self._expansion_runners.get(with_conversation)
+        if runner is not None:
+            return runner
+        from langchain_core.prompts import ChatPromptTemplate
+        messages = [
+            ("system", "The task for you is to write an elaborative and more informative question from the user's normal question regarding the bikes that belong to royal enfield company and their showrooms. The answer must be strictly in JSON format with key 'questions' and value as a list. "
+                       f"Return at most {self.max_sub_questions} questions."),
+            ("user", "The Query to be given is: {user_query}")
+        ]
+        if with_conversation:
+            #Follow-ups ("what about its price?") become standalone questions before retrieval
+            messages.insert(1, ("system", "Resolve references in the query using this conversation, so every question stands on its own:\n{conversation}"))
+        prompt1 = ChatPromptTemplate.from_messages(messages)
         try:
-            prompt1 = ChatPromptTemplate.from_messages(
-                [
-                    ("system", "The task for you is to write an elaborative and more informative question from the user's normal question regarding the bikes that belong to royal enfield company and their showrooms. The answer must be strictly in JSON format with key 'questions' and value as a list."),
-                    ("user", f"The Query to be given is: {user_query}")
-                ]
+            #include_raw keeps the reply when schema parsing fails, so it can be recovered without a second call
+            llm = self.expansion_llm.with_structured_output(_sub_question_schema(self.max_sub_questions), include_raw=True)
+        except (NotImplementedError, AttributeError, ValueError):
+            llm = self.expansion_llm
+        runner = self._expansion_runners[with_conversation] = prompt1 | llm
+        return runner
+
+    #Algorithm for Determining the User Query Regaridng the Request
+    async def _expand_query(self, user_query: str, conversation: str = None) -> list:
+        model = self.stage_models["expansion"]
+        with span("expansion", model=model) as attrs:
+            result = await self._expansion_runner(bool(conversation)).ainvoke({"user_query": user_query, "conversation": conversation or ""})
+            if isinstance(result, dict) and "raw" in result:
+                ai_message = result["raw"]
+                if result.get("parsed"):
+                    outcome, subqs_content = "structured", json.dumps(result["parsed"])
+                else:
+                    #Malformed tool arguments or a plain-text reply; parsed leniently below
+                    calls = getattr(ai_message, "additional_kwargs", {}).get("tool_calls") or []
+                    outcome = "recovered"
+                    subqs_content = calls[0]["function"]["arguments"] if calls else getattr(ai_message, "content", "")
+            else:
+                ai_message = result
+                outcome = "text"
+                subqs_content = ai_message.content if hasattr(ai_message, "content") else str(ai_message)
+            attrs["input_tokens"], attrs["output_tokens"] = record_tokens(
+                "expansion", getattr(ai_message, "usage_metadata", None), subqs_content, user_query, model=model
             )
 
-            llm = self.llm 
-            runner1 = prompt1 | llm 
-            ai_message = await runner1.ainvoke({"user_query": user_query})
-            subqs_content = ai_message.content if hasattr(ai_message, "content") else str(ai_message)
-            
-            #print the raw response(Test)
-            #print("Raw LLM response:", subqs_content)
+            #Fenced, chatty or truncated JSON is recovered locally; only an unusable reply falls back
+            questions = parse_sub_questions(subqs_content, limit=self.max_sub_questions)
+            if not questions:
+                outcome = "fallback"
+                print(f"The Expansion Parse Error, answering the original question : {subqs_content[:200]!r}")
+            attrs.update(parse=outcome, questions=len(questions))
+        count("expansion_parse", result=outcome, model=model)
+        #A broken expansion degrades to answering the original question instead of losing it
+        return questions or [user_query]
+
+    #Structured price/part lookups answered from Neo4j through the cached, read-only executor
+    async def _graph_context(self, user_query: str):
+        if self.graph_executor is None:
+            return None
+        with span("graph") as attrs:
             try:
-                queries = json.loads(subqs_content)
-            except Exception as json_err:
-                print(f"JSON parsing error: {json_err}")
+                cypher, params = await asyncio.to_thread(generate_parameterized_cypher, user_query)
+                rows = await asyncio.wait_for(self.graph_executor.run(cypher, params), timeout=self.graph_timeout)
+                attrs["rows"] = len(rows)
+                return rows
+            except Exception as e:
+                attrs["error"] = type(e).__name__
+                print(f"The Graph Lookup Error : {e}")
                 return None
 
-            if not queries or "questions" not in queries or not isinstance(queries["questions"], list):
-                print("Invalid JSON structure or missing 'questions' key.")
-                return None
-            
-            #Caching the Previous Response
-            cached = [self._check_cache(query) for query in queries["questions"]]
-            if all(cached):
-                return cached
-            
-            #Retriving Data form Web search and VectorDB
-            tavily_results = [self.tavily.search(query) for query in queries["questions"]]
-            docs = [self.doc_store.retrieve_similar(query, k=3) for query in queries["questions"]]
-            docs_content = ["\n".join([d.page_content for d in doc]) for doc in docs]
-
-            prompt2 = ChatPromptTemplate.from_messages(
-                [
-                    ("system", "Use the sub-questions, Tavily results, and document content to craft a conversational response. The Response should be more human and the generated response should be in a way of a dealer convincing the customer to buy the bike. with the below data's provide a speech which convinces the customer and make them interactive with your statementsv, Note: The showroom is selling Royal Enfield Bies only use that bikes."),
-                    ("user","Sub-questions: {subqs}\nTavily: {tavily}\nDocuments: {docs}")
-                ],
-            )
-            runner2 = prompt2 | llm 
-            final_result = await runner2.ainvoke({
-                "subqs": queries['questions'],
-                "tavily": tavily_results,
-                "docs": docs_content
-            })
-
-            # Updating Cache File
-            self._update_cache(user_query, final_result.content if hasattr(final_result, "content") else str(final_result))
-            return final_result.content if hasattr(final_result, "questions") else str(final_result)
+    async def _prepare_answer(self, user_query: str, timings: dict = None, conversation: str = None):
+        #Simple lookups skip sub-question expansion and cost a single LLM call
+        route = self.router.route(user_query, follow_up=bool(conversation))
+        if timings is not None:
+            timings["route"] = route
+            #Which model serves each stage; the stage latencies are in the trace breakdown
+            timings["models"] = dict(self.stage_models)
+        trace = current_trace()
+        if trace is not None:
+            trace.attrs["route"] = route
+        graph_rows = None
+        if route == LOOKUP:
+            queries = {"questions": [user_query]}
+            graph_rows = await self._graph_context(user_query)
+        else:
+            queries = {"questions": await self._expand_query(user_query, conversation=conversation)}
         
-        except Exception as e:
-            print(f"The Exception : {e}")
-            return None
+        #Retriving Data form Web search and VectorDB; a graph answer makes the web search unnecessary
+        tavily_results, documents = await self._gather_context(queries["questions"], include_web=not graph_rows)
+        count("sub_questions", len(queries["questions"]), route=route)
+        pinned = ["Inventory graph: " + json.dumps(graph_rows, default=str)] if graph_rows else []
+        with span("context_assembly") as attrs:
+            inputs, report = self.context_assembler.assemble(queries["questions"], tavily_results, documents, pinned=pinned)
+            attrs.update(report)
+        count("context_tokens", report["tokens"])
+        count("context_tokens_saved", report["tokens_saved"])
+        if timings is not None:
+            timings["context"] = report
+        if trace is not None:
+            trace.attrs["context"] = report
+        inputs["history"] = conversation or "none"
+        return inputs
+
+    def _answer_chain(self):
+        from langchain_core.prompts import ChatPromptTemplate
+        prompt2 = ChatPromptTemplate.from_messages(
+            [
+                ("system", "Use the sub-questions, Tavily results, and document content to craft a conversational response. The Response should be more human and the generated response should be in a way of a dealer convincing the customer to buy the bike. with the below data's provide a speech which convinces the customer and make them interactive with your statementsv, Note: The showroom is selling Royal Enfield Bies only use that bikes."),
+                ("user","Conversation so far: {history}\nSub-questions: {subqs}\nTavily: {tavily}\nDocuments: {docs}")
+            ],
+        )
+        return prompt2 | self.llm
+
+    #Only follow-ups are answered against the conversation. A standalone question gets the same answer in every
+    #session and stays cacheable; an answer whose prompt held a conversation is never read from or written to the cache
+    @staticmethod
+    def _conversation_for(user_query: str, conversation: str = None):
+        return conversation if conversation and is_follow_up(user_query) else None
+
+    async def _cached_answer(self, user_query: str):
+        with span("cache_lookup") as attrs:
+            cached = await asyncio.to_thread(self._check_cache, user_query)
+            attrs["hit"] = bool(cached)
+        count("cache_lookups", cache="response", result="hit" if cached else "miss")
+        return cached
+
+    #conversation is the session's rolling summary and last turns (SessionHistory.context())
+    async def processed_query(self, user_query : str, trace: Trace = None, conversation: str = None) -> str:
+        #Callers such as the UI pass their own trace to add TTS and rendering to the same breakdown
+        own_trace = trace is None
+        trace = trace or Trace("processed_query", query=user_query)
+        stage = "cache_lookup"
+        conversation = self._conversation_for(user_query, conversation)
+        cacheable = conversation is None
+        with trace.activate():
+            try:
+                #Repeat questions skip both LLM calls and all retrieval
+                cached = await self._cached_answer(user_query) if cacheable else None
+                if cached:
+                    return cached
+
+                stage = "prepare"
+                inputs = await self._prepare_answer(user_query, conversation=conversation)
+                if inputs is None:
+                    return None
+                stage = "generation"
+                with span("generation", model=self.stage_models["generation"]) as attrs:
+                    final_result = await self._answer_chain().ainvoke(inputs)
+                    content = final_result.content if hasattr(final_result, "content") else str(final_result)
+                    attrs["input_tokens"], attrs["output_tokens"] = record_tokens(
+                        "generation", getattr(final_result, "usage_metadata", None), content, json.dumps(inputs, default=str),
+                        model=self.stage_models["generation"]
+                    )
+
+                # Updating Cache File
+                stage = "cache_update"
+                if cacheable:
+                    await asyncio.to_thread(self._update_cache, user_query, content)
+                return content
+            
+            except Exception as e:
+                trace.error(stage, e)
+                print(f"The Exception : {e}")
+                return None
+            finally:
+                if own_trace:
+                    trace.finish()
+
+    #Yields the final answer as the LLM produces it; by_sentence groups tokens into whole sentences
+    async def stream_query(self, user_query: str, by_sentence: bool = False, timings: dict = None, trace: Trace = None, conversation: str = None):
+        timings = timings if timings is not None else {}
+        own_trace = trace is None
+        trace = trace or Trace("stream_query", query=user_query)
+        stage = "cache_lookup"
+        conversation = self._conversation_for(user_query, conversation)
+        cacheable = conversation is None
+        started = time.perf_counter()
+        parts = []
+        buffer = ""
+        with trace.activate():
+            try:
+                cached = await self._cached_answer(user_query) if cacheable else None
+                if cached:
+                    timings["time_to_first_token"] = time.perf_counter() - started
+                    timings["cached"] = True
+                    yield cached
+                    return
+
+                stage = "prepare"
+                inputs = await self._prepare_answer(user_query, timings=timings, conversation=conversation)
+                if inputs is None:
+                    return
+                stage = "generation"
+                usage = None
+                with span("generation", model=self.stage_models["generation"]) as attrs:
+                    async for chunk in self._answer_chain().astream(inputs):
+                        #With stream_usage the token counts arrive on the last chunk
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        text = chunk.content if hasattr(chunk, "content") else str(chunk)
+                        if not text:
+                            continue
+                        if "time_to_first_token" not in timings:
+                            timings["time_to_first_token"] = time.perf_counter() - started
+                            attrs["time_to_first_token"] = timings["time_to_first_token"]
+                        parts.append(text)
+                        if not by_sentence:
+                            yield text
+                            continue
+                        buffer += text
+                        sentences = SENTENCE_BOUNDARY.split(buffer)
+                        buffer = sentences.pop()
+                        for sentence in sentences:
+                            yield sentence + " "
+                    if buffer:
+                        yield buffer
+                    attrs["input_tokens"], attrs["output_tokens"] = record_tokens(
+                        "generation", usage, "".join(parts), json.dumps(inputs, default=str),
+                        model=self.stage_models["generation"]
+                    )
+
+                stage = "cache_update"
+                if cacheable:
+                    await asyncio.to_thread(self._update_cache, user_query, "".join(parts))
+
+            except Exception as e:
+                trace.error(stage, e)
+                print(f"The Exception : {e}")
+            finally:
+                timings["total_time"] = time.perf_counter() - started
+                if own_trace:
+                    trace.finish()
     
 if __name__ == "__main__":
-    agent = RoyalEnfieldBikeAssistant(
-        llm_model="gpt-4",
-        tavily_api_key=os.environ["TAVILY_API_KEY"],
-        redis_url=os.environ["REDIS_URL"],
-        #redis_cache_host="localhost",
-        #redis_cache_port=6379,
-        #redis_cache_db=0,
-        vector_index="bike_index"
-    )
+    #Single query smoke test; essentials/batch_queries.py runs whole query files
+    from utils.config import assistant_config
+    agent = RoyalEnfieldBikeAssistant(**assistant_config())
     user_input = "Tell me about the latest Royal Enfield bike model available with larger spec and its features"
     result = asyncio.run(agent.processed_query(user_input))
     print(result)
@@ -0,0 +1,111 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+EXTENSIONS = {"gtts": ".mp3", "pyttsx3": ".wav"}
+
+
+#Content-addressed audio files on disk, evicted least-recently-used once over max_bytes
+class AudioStore:
+    def __init__(self, directory: str = None, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "ecom_ai_audio")
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    #Rebuilds the LRU order from file modification times left by earlier processes
+    def _load_index(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path) and not name.endswith(".tmp"):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+
+    @staticmethod
+    def key_for(text: str, lang: str = "en", engine: str = "gtts") -> str:
+        digest = hashlib.sha256(f"{engine}\0{lang}\0{text.strip()}".encode("utf-8")).hexdigest()
+        return f"{digest}{EXTENSIONS.get(engine, '.bin')}"
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._entries:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+        try:
+            os.utime(self.path(key))
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+            return None
+
+    def put(self, key: str, data: bytes) -> str:
+        tmp_path = f"{self.path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path(key))
+        with self._lock:
+            self._size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+        return key
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.counters["evictions"] += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def get_or_create(self, text: str, synthesize_fn, lang: str = "en", engine: str = "gtts") -> bytes:
+        key = self.key_for(text, lang=lang, engine=engine)
+        data = self.get(key)
+        if data is None:
+            data = synthesize_fn()
+            self.put(key, data)
+        return data
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": self.counters["hits"] / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._size
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_audio_store() -> AudioStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AudioStore()
+    return _store
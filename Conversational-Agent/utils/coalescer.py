@@ -0,0 +1,130 @@
+import asyncio
+import contextlib
+from llm.Errors import ServiceOverloadedError
+
+
+#Admits at most max_concurrent pipeline runs, queues up to max_waiting more and turns the rest away
+class AdmissionGate:
+    def __init__(self, max_concurrent: int = 32, max_waiting: int = 64, wait_timeout: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.counters = {"admitted": 0, "rejected": 0, "timed_out": 0}
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        #A free slot is taken without queueing; wait_for suspends even then, so a burst would otherwise fill the queue
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_waiting:
+                self.counters["rejected"] += 1
+                raise ServiceOverloadedError(f"{self.active} running and {self.waiting} queued")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.wait_timeout)
+            except asyncio.TimeoutError:
+                self.counters["timed_out"] += 1
+                raise ServiceOverloadedError(f"no slot freed up within {self.wait_timeout}s")
+            finally:
+                self.waiting -= 1
+        self.counters["admitted"] += 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    #True when a new run would be turned away right now
+    def saturated(self) -> bool:
+        return self.waiting >= self.max_waiting
+
+    def stats(self) -> dict:
+        return {**self.counters, "active": self.active, "waiting": self.waiting, "max_concurrent": self.max_concurrent}
+
+
+#Chunks of one streaming run, replayed from the start to every subscriber that joins while it is running
+class StreamFlight:
+    def __init__(self):
+        self.chunks = []
+        self.meta = {}
+        self.done = False
+        self.error = None
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _publish(self, chunk=None):
+        if chunk is not None:
+            self.chunks.append(chunk)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+#Identical questions arriving while one is already running share that run instead of starting another
+class RequestCoalescer:
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self.counters = {"leaders": 0, "followers": 0}
+
+    def _forget(self, registry: dict, key, value):
+        if registry.get(key) is value:
+            del registry[key]
+
+    #factory() -> awaitable; returns (result, coalesced)
+    async def run(self, key, factory):
+        task = self._calls.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.counters["followers"] += 1
+        else:
+            self.counters["leaders"] += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(self._calls, key, done))
+        #A caller that disconnects must not cancel the run the other callers are waiting on
+        return await asyncio.shield(task), coalesced
+
+    #factory(meta) -> async iterator of chunks; it may fill meta (timings, trace) for every subscriber.
+    #Returns (flight, coalesced)
+    def stream(self, key, factory):
+        flight = self._streams.get(key)
+        if flight is not None:
+            self.counters["followers"] += 1
+            return flight, True
+        self.counters["leaders"] += 1
+        flight = StreamFlight()
+        self._streams[key] = flight
+        #The flight holds its producer task so it is not garbage collected mid-run
+        flight.task = asyncio.ensure_future(self._produce(key, flight, factory))
+        return flight, False
+
+    async def _produce(self, key, flight: StreamFlight, factory):
+        try:
+            async for chunk in factory(flight.meta):
+                flight._publish(chunk)
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(self._streams, key, flight)
+            flight._publish()
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": len(self._calls) + len(self._streams)}
@@ -0,0 +1,261 @@
+import os
+import sys
+import threading
+from functools import lru_cache
+from llm.Errors import ConfigurationError
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Where each setting lives in .streamlit/secrets.toml; environment variables of the same name take precedence
+SECRET_PATHS = {
+    "OPENAI_API_KEY": ("openai", "api_key"),
+    "TAVILY_API_KEY": ("tavily", "api_key"),
+    "REDIS_URL": ("redis", "REDIS_URL"),
+    "REDIS_HOST": ("redis", "REDIS_HOST"),
+    "REDIS_PORT": ("redis", "REDIS_PORT"),
+    "REDIS_PASSWORD": ("redis", "REDIS_PASSWORD"),
+    "NEO4J_URI": ("neo4j", "NEO4J_URI"),
+    "NEO4J_USER": ("neo4j", "NEO4J_USER"),
+    "NEO4J_PASSWORD": ("neo4j", "NEO4J_PASSWORD"),
+}
+
+DEFAULTS = {
+    "LLM_MODEL": "gpt-4",
+    "EXPANSION_MODEL": "gpt-4o-mini",
+    "CYPHER_MODEL": "gpt-4",
+    "MAX_SUB_QUESTIONS": "4",
+    "VECTOR_INDEX": "bike_index",
+    "REDIS_PORT": "17094",
+    "REDIS_DB": "0",
+    "NEO4J_POOL_SIZE": "32",
+    "TELEMETRY_SINKS": "",
+    "CONTEXT_TOKEN_BUDGET": "1500",
+    "SEMANTIC_CACHE_ENTRIES": "256",
+    "EMBEDDING_CACHE_TTL": "2592000",
+    "SESSION_WINDOW": "20",
+    "SESSION_TTL": "604800",
+    "VECTOR_BACKEND": "redis",
+    "LOCAL_INDEX_DIR": os.path.join(PROJECT_DIR, "data", "vector_index"),
+    "LOCAL_INDEX_DTYPE": "float32",
+    "API_HOST": "0.0.0.0",
+    "API_PORT": "8000",
+    "API_WORKERS": "",
+    "API_MAX_CONCURRENT": "32",
+    "API_MAX_QUEUE": "64",
+    "API_QUEUE_TIMEOUT": "10",
+    "API_HTTP_CONNECTIONS": "32",
+    "API_REDIS_CONNECTIONS": "16",
+}
+
+#Modules timed by the import report; app.py is a Streamlit script and is left out
+REPORT_MODULES = [
+    "utils.config", "utils.runtime", "utils.assistant_agent", "utils.document_store", "essentials.uploaddb",
+    "utils.tts", "utils.vector_index", "db.neo4j_client", "db.executor", "db.graph_loader", "llm.query", "api",
+]
+
+
+#.env is read once, on the first setting lookup, and never overrides the real environment
+@lru_cache(maxsize=1)
+def _load_dotenv():
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return False
+    for directory in (os.getcwd(), PROJECT_DIR):
+        path = os.path.join(directory, ".env")
+        if os.path.exists(path):
+            return load_dotenv(path, override=False)
+    return False
+
+
+#Streamlit's own secrets when running under Streamlit, otherwise secrets.toml read directly
+@lru_cache(maxsize=1)
+def _secrets() -> dict:
+    if "streamlit" in sys.modules:
+        try:
+            secrets = sys.modules["streamlit"].secrets
+            return secrets.to_dict() if hasattr(secrets, "to_dict") else {k: dict(v) if hasattr(v, "keys") else v for k, v in secrets.items()}
+        except Exception as e:
+            print(f"The Streamlit Secrets Error : {e}")
+    import tomllib
+    for directory in (os.getcwd(), PROJECT_DIR):
+        path = os.path.join(directory, ".streamlit", "secrets.toml")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return tomllib.load(f)
+    return {}
+
+
+def setting(name: str, default=None, required: bool = False):
+    _load_dotenv()
+    value = os.environ.get(name)
+    if value is None:
+        secrets = _secrets()
+        section, key = SECRET_PATHS.get(name, (None, name))
+        value = secrets.get(section, {}).get(key) if section else None
+        if value is None:
+            value = secrets.get(name)
+    if value is None:
+        value = default if default is not None else DEFAULTS.get(name)
+    if value is None and required:
+        raise ConfigurationError(f"{name} is not set in the environment, .env or .streamlit/secrets.toml")
+    return value
+
+
+def assistant_config() -> dict:
+    return {
+        "llm_model": setting("LLM_MODEL"),
+        "expansion_model": setting("EXPANSION_MODEL"),
+        "max_sub_questions": int(setting("MAX_SUB_QUESTIONS")),
+        "openai_api_key": setting("OPENAI_API_KEY", required=True),
+        "tavily_api_key": setting("TAVILY_API_KEY", required=True),
+        "redis_url": setting("REDIS_URL", required=True),
+        "redis_cache_host": setting("REDIS_HOST", required=True),
+        "redis_port": int(setting("REDIS_PORT")),
+        "redis_cache_password": setting("REDIS_PASSWORD"),
+        "redis_cache_db": int(setting("REDIS_DB")),
+        "vector_index": setting("VECTOR_INDEX"),
+        "context_token_budget": int(setting("CONTEXT_TOKEN_BUDGET")),
+        "semantic_cache_entries": int(setting("SEMANTIC_CACHE_ENTRIES")),
+    }
+
+
+#Each factory imports its dependency when first called, so unused clients cost nothing at start-up
+def _http_client():
+    import httpx
+    return httpx.Client()
+
+
+def _http_async_client():
+    import httpx
+    return httpx.AsyncClient()
+
+
+#Standalone Redis connection for callers without an assistant, such as the Streamlit app in client mode
+def _redis():
+    import redis
+    return redis.StrictRedis(
+        host=setting("REDIS_HOST", required=True),
+        port=int(setting("REDIS_PORT")),
+        username="default",
+        password=setting("REDIS_PASSWORD"),
+        db=int(setting("REDIS_DB")),
+        decode_responses=True
+    )
+
+
+def _openai():
+    from openai import OpenAI
+    return OpenAI(api_key=setting("OPENAI_API_KEY", required=True), http_client=get_client("http_client"))
+
+
+def _openai_embeddings():
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(api_key=setting("OPENAI_API_KEY", required=True), http_client=get_client("http_client"))
+
+
+_factories = {
+    "http_client": _http_client,
+    "http_async_client": _http_async_client,
+    "redis": _redis,
+    "openai": _openai,
+    "openai_embeddings": _openai_embeddings,
+}
+_clients = {}
+_clients_lock = threading.RLock()
+
+
+def register_client(name: str, factory):
+    with _clients_lock:
+        _factories[name] = factory
+        _clients.pop(name, None)
+
+
+#Hands an already-built client (for example the runtime's pooled HTTP client) to everything built after it
+def provide_client(name: str, client):
+    with _clients_lock:
+        _clients[name] = client
+
+
+def get_client(name: str):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                if name not in _factories:
+                    raise ConfigurationError(f"no client named {name!r} is registered")
+                client = _clients[name] = _factories[name]()
+    return client
+
+
+def reset_clients():
+    with _clients_lock:
+        _clients.clear()
+
+
+#Imports each module in a fresh interpreter under -X importtime; the tooling modules load only here
+def import_report(modules: list = None, top: int = 5) -> list:
+    import re
+    import time
+    import subprocess
+    #"import time: self [us] | cumulative | imported package"
+    import_line = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+    report = []
+    for module in modules or REPORT_MODULES:
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PROJECT_DIR, capture_output=True, text=True
+        )
+        wall = time.perf_counter() - started
+        entries = [
+            (match.group(4), int(match.group(2)), len(match.group(3)))
+            for match in map(import_line.match, result.stderr.splitlines()) if match
+        ]
+        own = next((i for i in range(len(entries) - 1, -1, -1) if entries[i][0] == module), None)
+        #The module's direct imports are the deeper-indented lines printed just before its own line
+        children = []
+        if own is not None:
+            depth = entries[own][2]
+            for name, cumulative, indent in reversed(entries[:own]):
+                if indent <= depth:
+                    break
+                if indent == depth + 2:
+                    children.append((name, cumulative))
+        heaviest = sorted(children, key=lambda e: -e[1])
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        report.append({
+            "module": module,
+            "ok": result.returncode == 0,
+            "import_ms": entries[own][1] / 1000 if own is not None and result.returncode == 0 else None,
+            "process_ms": wall * 1000,
+            "heaviest": [{"package": name, "ms": cumulative / 1000} for name, cumulative in heaviest[:top]],
+            "error": errors[-1] if result.returncode and errors else None,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    parser = argparse.ArgumentParser(description="Settings and import-time report for the assistant")
+    parser.add_argument("--import-report", nargs="*", metavar="MODULE", help="time importing these modules (default: the main ones)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    if args.import_report is not None:
+        report = import_report(args.import_report)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            for entry in report:
+                timing = f"{entry['import_ms']:.1f} ms" if entry["import_ms"] is not None else "failed"
+                heaviest = ", ".join(f"{h['package']} {h['ms']:.0f} ms" for h in entry["heaviest"])
+                print(f"{entry['module']:<24} {timing:>10}   {heaviest}")
+                if entry["error"]:
+                    print(f"{'':<24} {entry['error']}")
+    else:
+        for name in sorted(set(SECRET_PATHS) | set(DEFAULTS)):
+            value = setting(name)
+            shown = "set" if value and ("KEY" in name or "PASSWORD" in name) else value
+            print(f"{name}: {shown}")
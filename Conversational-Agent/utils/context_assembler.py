@@ -0,0 +1,185 @@
+import re
+import math
+import json
+import hashlib
+from utils.hybrid_retriever import tokenize, query_terms
+
+WHITESPACE = re.compile(r"\s+")
+DIGIT = re.compile(r"\d")
+#"column: value" lines, the layout every ingested inventory row is rendered in
+FIELD = re.compile(r"^\s*[^:\n]{1,40}:\s*\S")
+
+
+#Same 4-characters-per-token estimate the telemetry falls back to, so budgets and reports agree
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+def _normalize(text: str) -> str:
+    return WHITESPACE.sub(" ", text).strip().lower()
+
+
+def _shingles(text: str, size: int = 3) -> frozenset:
+    words = tokenize(text)
+    if len(words) <= size:
+        return frozenset([" ".join(words)]) if words else frozenset()
+    return frozenset(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+#One candidate for the prompt: a retrieved chunk or a trimmed web result
+class Passage:
+    def __init__(self, text: str, kind: str, rank: int, question: int = None):
+        self.text = text
+        self.kind = kind
+        self.rank = rank
+        self.question = question
+        self.tokens = estimate_tokens(text)
+        self.shingles = _shingles(text)
+        self.terms = frozenset(tokenize(text))
+        #Field lines of inventory chunks; two rows of one model differ only in a few of these
+        self.fields = frozenset(_normalize(line) for line in text.splitlines() if FIELD.match(line)) if kind == "doc" else frozenset()
+        self.relevance = 0.0
+
+
+#Turns raw retrieval results into a prompt context that fits a token budget.
+#Exact and near-duplicate passages are dropped, web results keep only title/snippet/URL,
+#and passages are picked by maximal marginal relevance against every sub-question
+class ContextAssembler:
+    def __init__(
+            self,
+            token_budget: int = 1500,
+            near_duplicate: float = 0.8,
+            mmr_lambda: float = 0.7,
+            rank_weight: float = 0.5,
+            snippet_chars: int = 300,
+            min_shared_line: int = 40
+        ):
+        self.token_budget = token_budget
+        self.near_duplicate = near_duplicate
+        self.mmr_lambda = mmr_lambda
+        self.rank_weight = rank_weight
+        self.snippet_chars = snippet_chars
+        self.min_shared_line = min_shared_line
+
+    def web_passages(self, tavily_results: list) -> list:
+        passages = []
+        for response in tavily_results or []:
+            results = response.get("results", []) if isinstance(response, dict) else []
+            for rank, result in enumerate(results):
+                title = (result.get("title") or "").strip()
+                snippet = WHITESPACE.sub(" ", result.get("content") or "").strip()
+                if len(snippet) > self.snippet_chars:
+                    snippet = snippet[:self.snippet_chars].rsplit(" ", 1)[0] + "..."
+                if not (title or snippet):
+                    continue
+                url = result.get("url") or ""
+                passages.append(Passage(f"{title}: {snippet} ({url})" if url else f"{title}: {snippet}", "web", rank))
+        return passages
+
+    def document_passages(self, documents: list) -> list:
+        #documents holds one ranked list per sub-question
+        return [
+            Passage(document.page_content, "doc", rank, question)
+            for question, ranked in enumerate(documents or []) if ranked
+            for rank, document in enumerate(ranked) if document.page_content.strip()
+        ]
+
+    #A near-duplicate is only dropped when it adds nothing to the kept passage: no new term, no new field line,
+    #and no number among the shingles the two do not share (a different price or stock count is a different fact)
+    def _adds_nothing(self, passage: Passage, other: Passage) -> bool:
+        if _jaccard(passage.shingles, other.shingles) < self.near_duplicate:
+            return False
+        if not (passage.terms <= other.terms and passage.fields <= other.fields):
+            return False
+        return not any(DIGIT.search(shingle) for shingle in passage.shingles - other.shingles)
+
+    def _deduplicate(self, passages: list) -> tuple:
+        seen = set()
+        kept = []
+        dropped = 0
+        #Better-ranked copies win, so the same inventory row found by several sub-questions keeps its best position
+        for passage in sorted(passages, key=lambda p: p.rank):
+            digest = hashlib.sha1(_normalize(passage.text).encode("utf-8")).hexdigest()
+            if digest in seen or any(self._adds_nothing(passage, other) for other in kept):
+                dropped += 1
+                continue
+            seen.add(digest)
+            kept.append(passage)
+        return kept, dropped
+
+    def _score(self, passages: list, questions: list):
+        question_terms = [query_terms(question) for question in questions] or [frozenset()]
+        for passage in passages:
+            coverage = max(len(terms & passage.terms) / len(terms) if terms else 0.0 for terms in question_terms)
+            passage.relevance = self.rank_weight / (passage.rank + 1) + (1 - self.rank_weight) * coverage
+
+    def _select(self, passages: list, budget: int) -> list:
+        selected = []
+        remaining = list(passages)
+        while remaining:
+            best, best_score = None, None
+            for passage in remaining:
+                if passage.tokens > budget:
+                    continue
+                redundancy = max((_jaccard(passage.terms, other.terms) for other in selected), default=0.0)
+                score = self.mmr_lambda * passage.relevance - (1 - self.mmr_lambda) * redundancy
+                if best_score is None or score > best_score:
+                    best, best_score = passage, score
+            if best is None:
+                break
+            selected.append(best)
+            remaining.remove(best)
+            budget -= best.tokens
+        return selected
+
+    #Long lines already emitted by an earlier passage are left out, which strips the text neighbouring chunks share.
+    #Short lines such as "engine: 349cc" belong to their own row and are always kept
+    def _render(self, passages: list) -> list:
+        emitted = set()
+        rendered = []
+        for passage in passages:
+            lines = []
+            for line in passage.text.splitlines():
+                key = _normalize(line)
+                if len(key) >= self.min_shared_line:
+                    if key in emitted:
+                        continue
+                    emitted.add(key)
+                lines.append(line)
+            text = "\n".join(lines).strip()
+            if text:
+                rendered.append(text)
+        return rendered
+
+    #Returns (context, report); context has the same subqs/tavily/docs keys the answer prompt expects
+    def assemble(self, questions: list, tavily_results: list, documents: list, pinned: list = None) -> tuple:
+        pinned = [text for text in pinned or [] if text]
+        raw_tokens = estimate_tokens(json.dumps(tavily_results, default=str)) + sum(
+            estimate_tokens(document.page_content) for ranked in documents or [] if ranked for document in ranked
+        ) + sum(estimate_tokens(text) for text in pinned)
+
+        candidates, duplicates = self._deduplicate(self.web_passages(tavily_results) + self.document_passages(documents))
+        self._score(candidates, questions)
+        #Graph rows answer the question directly and always go in first
+        budget = max(0, self.token_budget - sum(estimate_tokens(text) for text in pinned))
+        selected = self._select(candidates, budget)
+
+        web = self._render([p for p in selected if p.kind == "web"])
+        docs = pinned + self._render([p for p in selected if p.kind == "doc"])
+        tokens = sum(estimate_tokens(text) for text in web + docs)
+        report = {
+            "raw_tokens": raw_tokens,
+            "tokens": tokens,
+            "tokens_saved": max(0, raw_tokens - tokens),
+            "candidates": len(candidates) + duplicates,
+            "duplicates": duplicates,
+            "selected": len(selected) + len(pinned),
+            "budget": self.token_budget,
+        }
+        return {"subqs": questions, "tavily": "\n".join(web), "docs": "\n\n".join(docs)}, report
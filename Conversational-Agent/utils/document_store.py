@@ -1,60 +1,172 @@
-import os
-from dotenv import load_dotenv
-from langchain_community.document_loaders import DirectoryLoader, CSVLoader
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters.character import RecursiveCharacterTextSplitter
-from langchain_redis import RedisVectorStore
-from langchain_openai import OpenAIEmbeddings
-import streamlit as st
+import sys
+from utils.config import get_client, setting
+from utils.embedding_cache import get_cached_embeddings
+from utils.telemetry import span, count
 
-load_dotenv()
+#LangChain loaders, the Redis store, the local index and NumPy are imported on the code paths that use them
 
 class DocumentStore:
-    def __init__(self, redis_url: str, index_name: str, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(
+            self,
+            redis_url: str,
+            index_name: str,
+            chunk_size: int = 1000,
+            chunk_overlap: int = 200,
+            embeddings=None,
+            redis_client=None,
+            vector_store=None,
+            vector_backend: str = None
+        ):
         self.redis_url = redis_url
         self.index_name = index_name
+        #"redis" (RedisVectorStore) or "local" (memory-mapped index under LOCAL_INDEX_DIR)
+        self.vector_backend = vector_backend or setting("VECTOR_BACKEND")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.embeddings = OpenAIEmbeddings(
-            api_key=st.secrets["openai"]["api_key"]
-        )
+        #Store and raw Redis handles are kept for the lifetime of the DocumentStore
+        self._store = vector_store
+        self._redis = redis_client
+        #The OpenAI client comes from the shared registry and uses the runtime's pooled HTTP client
+        self.embeddings = embeddings or get_cached_embeddings(get_client("openai_embeddings"), redis_url=redis_url)
 
     def ingest_directory(self, directory_path: str, glob_pattern: str = "*.*"):
+        from langchain_community.document_loaders import DirectoryLoader
         loader = DirectoryLoader(directory_path, glob=glob_pattern)
         docs = loader.load()
         return self._chunk_and_store(docs)
 
     def ingest_csv(self, csv_path: str):
+        from langchain_community.document_loaders import CSVLoader
         loader = CSVLoader(csv_path)
         docs = loader.load()
         return self._chunk_and_store(docs)
 
     def ingest_text(self, text_path: str):
+        from langchain_community.document_loaders import TextLoader
         loader = TextLoader(text_path, encoding="utf-8")
         docs = loader.load()
         return self._chunk_and_store(docs)
 
+    def _local_index(self, readonly: bool):
+        from utils.vector_index import LocalVectorIndex, index_path
+        return LocalVectorIndex(
+            index_path(self.index_name),
+            embeddings=self.embeddings,
+            dtype=setting("LOCAL_INDEX_DTYPE"),
+            readonly=readonly
+        )
+
     def _chunk_and_store(self, documents):
+        from langchain_text_splitters.character import RecursiveCharacterTextSplitter
         splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
         chunks = splitter.split_documents(documents)
+        if self.vector_backend == "local":
+            index = self._local_index(readonly=False)
+            index.add_texts([chunk.page_content for chunk in chunks], metadatas=[chunk.metadata for chunk in chunks])
+            #Searches go through a read-only mapping that follows this writer's appends
+            self._store = None
+            return self.load_existing_store()
+        from langchain_redis import RedisVectorStore
         vector_store = RedisVectorStore.from_documents(
             documents=chunks,
             embedding=self.embeddings,
             index_name=self.index_name,
             redis_url=self.redis_url
         )
+        self._store = vector_store
         return vector_store
 
     def load_existing_store(self):
+        if self._store is not None:
+            return self._store
         try:
-            return RedisVectorStore(
+            if self.vector_backend == "local":
+                self._store = self._local_index(readonly=True)
+                return self._store
+            from langchain_redis import RedisVectorStore
+            self._store = RedisVectorStore(
                 embeddings=self.embeddings,
                 redis_url=self.redis_url,
                 index_name=self.index_name,
             )
+            return self._store
         except Exception as e:
             print(f"The Error While Loading the Store:{e}")
 
+    def _redis_client(self):
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url)
+        return self._redis
+
     def retrieve_similar(self, query: str, k: int = 3):
         store = self.load_existing_store()
         return store.similarity_search(query, k=k)
+
+    #Embeds every query in one request and runs all the KNN searches in one pipelined round trip
+    def retrieve_similar_batch(self, queries: list, k: int = 3):
+        if not queries:
+            return []
+        store = self.load_existing_store()
+        with span("query_embedding", queries=len(queries)):
+            vectors = self.embeddings.embed_documents(list(queries))
+        with span("knn", queries=len(vectors), k=k) as attrs:
+            results = self._search_vectors(store, vectors, k)
+            attrs["documents"] = sum(len(docs) for docs in results)
+        count("vector_results", attrs["documents"])
+        return results
+
+    def _search_vectors(self, store, vectors: list, k: int):
+        #The local index scores every query in one matrix product
+        if hasattr(store, "similarity_search_by_vectors"):
+            return store.similarity_search_by_vectors(vectors, k=k)
+        #Pipelined FT.SEARCH only applies to the Redis store; any other store is searched per vector
+        redis_stores = sys.modules.get("langchain_redis")
+        if redis_stores is None or not isinstance(store, redis_stores.RedisVectorStore):
+            return [store.similarity_search_by_vector(vector, k=k) for vector in vectors]
+        try:
+            return self._pipelined_knn(store, vectors, k)
+        except Exception as e:
+            count("knn_fallbacks")
+            print(f"The Error in Pipelined Search, falling back to per-query search:{e}")
+            return [store.similarity_search_by_vector(vector, k=k) for vector in vectors]
+
+    def _pipelined_knn(self, store, vectors: list, k: int):
+        import numpy as np
+        config = store.config
+        content_field = getattr(config, "content_field", "text")
+        vector_field = getattr(config, "embedding_field", "embedding")
+        dtype = np.dtype(str(getattr(config, "vector_datatype", "float32")).lower())
+        knn = f"*=>[KNN {k} @{vector_field} $vector AS vector_distance]"
+
+        pipe = self._redis_client().pipeline(transaction=False)
+        for vector in vectors:
+            pipe.execute_command(
+                "FT.SEARCH", self.index_name, knn,
+                "PARAMS", 2, "vector", np.asarray(vector, dtype=dtype).tobytes(),
+                "RETURN", 2, content_field, "vector_distance",
+                "SORTBY", "vector_distance",
+                "LIMIT", 0, k,
+                "DIALECT", 2
+            )
+        return [self._parse_search_reply(reply, content_field) for reply in pipe.execute()]
+
+    @staticmethod
+    def _parse_search_reply(reply, content_field: str):
+        from langchain_core.documents import Document
+        #FT.SEARCH replies as [total, key1, [field, value, ...], key2, [...], ...]
+        documents = []
+        for key, fields in zip(reply[1::2], reply[2::2]):
+            values = {
+                _decode(fields[i]): _decode(fields[i + 1])
+                for i in range(0, len(fields) - 1, 2)
+            }
+            documents.append(Document(
+                page_content=values.get(content_field, ""),
+                metadata={"id": _decode(key), "distance": float(values.get("vector_distance", 0.0))}
+            ))
+        return documents
+
+
+def _decode(value):
+    return value.decode("utf-8", errors="replace") if isinstance(value, bytes) else value
@@ -0,0 +1,120 @@
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from utils.config import setting
+
+
+#Content-addressed embedding cache: local LRU in front of Redis, keyed on model name + chunk text.
+#Redis entries expire after ttl seconds (None keeps them), so one-off query texts do not pile up forever.
+#Implements LangChain's Embeddings interface by duck typing, so importing it does not load langchain_core
+class CachedEmbeddings:
+    def __init__(
+            self,
+            embeddings,
+            redis_url: str = None,
+            redis_client=None,
+            prefix: str = "emb_cache",
+            max_local_entries: int = 4096,
+            ttl: int = None
+        ):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.redis_url = redis_url
+        self._redis = redis_client
+        self.prefix = prefix
+        self.max_local_entries = max_local_entries
+        self.ttl = ttl
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+
+    def _redis_client(self):
+        if self._redis is None and self.redis_url:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url)
+        return self._redis
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def _remember(self, key: str, vector: list):
+        with self._lock:
+            self._local[key] = vector
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [self._key(text) for text in texts]
+        vectors = [None] * len(texts)
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._local:
+                    self._local.move_to_end(key)
+                    vectors[i] = self._local[key]
+                    self.counters["local_hits"] += 1
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        client = self._redis_client()
+        if missing and client is not None:
+            try:
+                stored = client.mget([keys[i] for i in missing])
+                for i, blob in zip(missing, stored):
+                    if blob:
+                        vectors[i] = array("f", blob).tolist()
+                        self._remember(keys[i], vectors[i])
+                        self.counters["redis_hits"] += 1
+            except Exception as e:
+                print(f"The Embedding Cache Read Error : {e}")
+
+        #Only texts never seen before reach the embeddings API, deduplicated, in one call
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = dict(zip(unique_texts, self.embeddings.embed_documents(unique_texts)))
+            self.counters["misses"] += len(missing)
+            pipe = client.pipeline(transaction=False) if client is not None else None
+            for i in missing:
+                vectors[i] = fresh[texts[i]]
+                self._remember(keys[i], vectors[i])
+                if pipe is not None:
+                    #Packed float32, the same bytes NumPy's float32 tobytes() writes
+                    pipe.set(keys[i], array("f", vectors[i]).tobytes(), ex=self.ttl)
+            if pipe is not None:
+                try:
+                    pipe.execute()
+                except Exception as e:
+                    print(f"The Embedding Cache Write Error : {e}")
+        return vectors
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list) -> list:
+        import asyncio
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> list:
+        import asyncio
+        return await asyncio.to_thread(self.embed_query, text)
+
+    def stats(self) -> dict:
+        lookups = sum(self.counters.values())
+        hits = self.counters["local_hits"] + self.counters["redis_hits"]
+        return {**self.counters, "hit_ratio": hits / lookups if lookups else 0.0}
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+#Ingestion and querying share one wrapper (and so one local tier) per model and Redis URL
+def get_cached_embeddings(embeddings, redis_url: str) -> CachedEmbeddings:
+    key = (getattr(embeddings, "model", type(embeddings).__name__), redis_url)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = CachedEmbeddings(embeddings, redis_url=redis_url, ttl=int(setting("EMBEDDING_CACHE_TTL")) or None)
+        return _shared[key]
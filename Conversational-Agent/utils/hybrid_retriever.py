@@ -0,0 +1,258 @@
+import re
+import math
+import time
+import threading
+from collections import Counter, defaultdict
+
+TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are at be by can do does for from has have how i in is it me of on or show tell the "
+    "their there this to what which with you your".split()
+)
+
+
+def tokenize(text: str) -> list:
+    return TOKEN.findall(text.lower())
+
+
+def query_terms(query: str) -> set:
+    return {term for term in tokenize(query) if term not in STOPWORDS}
+
+
+#Ingestion bumps this counter with every commit, so API workers that did not run it can tell their index is stale
+def keyword_version_key(index_name: str) -> str:
+    return f"keyword_index_version:{index_name}"
+
+
+#In-process BM25 inverted index over the ingested inventory chunks, keyed by their Redis keys
+class KeywordIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self.version = None
+        self._texts = {}
+        self._lengths = {}
+        self._postings = defaultdict(dict)
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, doc_id: str, text: str):
+        with self._lock:
+            if doc_id in self._texts:
+                self.remove(doc_id)
+            tokens = tokenize(text)
+            self._texts[doc_id] = text
+            self._lengths[doc_id] = len(tokens)
+            self._total_length += len(tokens)
+            for term, tf in Counter(tokens).items():
+                self._postings[term][doc_id] = tf
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            text = self._texts.pop(doc_id, None)
+            if text is None:
+                return
+            self._total_length -= self._lengths.pop(doc_id)
+            for term in set(tokenize(text)):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    #Applies one ingestion batch; before the first bootstrap the next bootstrap picks changes up instead.
+    #version is the shared counter after this batch: the index keeps up with it only if it saw every earlier batch
+    def apply(self, added: list = None, removed: list = None, version: int = None):
+        if not self.ready:
+            return
+        with self._lock:
+            for doc_id in removed or []:
+                self.remove(doc_id)
+            for doc_id, text in added or []:
+                self.add(doc_id, text)
+            if version is not None and self.version is not None and version == self.version + 1:
+                self.version = version
+
+    #Loads every chunk of the vector index straight from its Redis hashes
+    def bootstrap(self, redis_client, index_name: str, content_field: str = "text", batch_size: int = 500, version: int = None):
+        texts = {}
+        keys = []
+
+        def flush():
+            pipe = redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.hget(key, content_field)
+            for key, text in zip(keys, pipe.execute()):
+                if text is not None:
+                    texts[_decode(key)] = _decode(text)
+            keys.clear()
+
+        for key in redis_client.scan_iter(match=f"{index_name}:*", count=batch_size, _type="HASH"):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                flush()
+        if keys:
+            flush()
+        return self.load(texts.items(), version=version)
+
+    #Replaces the whole index with (doc_id, text) pairs, such as the records of a local vector index
+    def load(self, items, version: int = None) -> int:
+        texts = dict(items)
+        with self._lock:
+            self._texts.clear()
+            self._lengths.clear()
+            self._postings.clear()
+            self._total_length = 0
+            for doc_id, text in texts.items():
+                self.add(doc_id, text)
+            self.version = version
+            self.ready = True
+        return len(texts)
+
+    def search(self, query: str, k: int = 3) -> list:
+        terms = query_terms(query)
+        with self._lock:
+            total = len(self._texts)
+            if not total or not terms:
+                return []
+            avg_length = self._total_length / total
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(doc_id, score, self._texts[doc_id]) for doc_id, score in ranked]
+
+    def coverage(self, query: str, doc_id: str) -> float:
+        terms = query_terms(query)
+        with self._lock:
+            matched = sum(1 for term in terms if doc_id in self._postings.get(term, {}))
+        return matched / len(terms) if terms else 0.0
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_keyword_index(index_name: str) -> KeywordIndex:
+    with _indexes_lock:
+        if index_name not in _indexes:
+            _indexes[index_name] = KeywordIndex()
+        return _indexes[index_name]
+
+
+#Merges BM25 and vector KNN with reciprocal rank fusion, skipping the vector path for confident keyword hits
+class HybridRetriever:
+    def __init__(
+            self,
+            doc_store,
+            keyword_index: KeywordIndex,
+            rrf_k: int = 60,
+            lexical_coverage: float = 0.8,
+            lexical_margin: float = 1.5,
+            version_check_interval: float = 2.0
+        ):
+        self.doc_store = doc_store
+        self.keyword_index = keyword_index
+        self.rrf_k = rrf_k
+        self.lexical_coverage = lexical_coverage
+        self.lexical_margin = lexical_margin
+        self.version_check_interval = version_check_interval
+        self._bootstrap_lock = threading.Lock()
+        self._version_checked_at = 0.0
+        self.counters = {"lexical_only": 0, "hybrid": 0, "rebuilds": 0}
+
+    #The ingestion counter in Redis, or None when it cannot be read (the loaded index is then kept)
+    def _shared_version(self):
+        try:
+            value = self.doc_store._redis_client().get(keyword_version_key(self.doc_store.index_name))
+            return int(value or 0)
+        except Exception as e:
+            print(f"The Keyword Index Version Error : {e}")
+            return None
+
+    #At most once per interval, so a hot path pays one Redis GET every few seconds rather than per query
+    def _stale(self) -> bool:
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return False
+        self._version_checked_at = now
+        version = self._shared_version()
+        return version is not None and version != self.keyword_index.version
+
+    def ensure_index(self):
+        if self.keyword_index.ready and not self._stale():
+            return
+        with self._bootstrap_lock:
+            #Read before loading: a batch committed mid-load leaves the index one version behind, not silently stale
+            version = self._shared_version()
+            if self.keyword_index.ready and (version is None or version == self.keyword_index.version):
+                return
+            if self.keyword_index.ready:
+                self.counters["rebuilds"] += 1
+            store = self.doc_store.load_existing_store()
+            if hasattr(store, "records"):
+                #A local vector index holds its own texts, so Redis is only needed for the version here
+                count = self.keyword_index.load(store.records(), version=version)
+            else:
+                content_field = getattr(getattr(store, "config", None), "content_field", "text")
+                count = self.keyword_index.bootstrap(
+                    self.doc_store._redis_client(), self.doc_store.index_name,
+                    content_field=content_field, version=version
+                )
+            print(f"The Keyword Index loaded {count} chunks")
+
+    #Confident = the top hit covers the query's content words and clearly outscores the runner-up
+    def _confident(self, query: str, hits: list) -> bool:
+        if not hits or self.keyword_index.coverage(query, hits[0][0]) < self.lexical_coverage:
+            return False
+        return len(hits) == 1 or hits[0][1] >= self.lexical_margin * hits[1][1]
+
+    def _fuse(self, lexical: list, vector: list, k: int) -> list:
+        from langchain_core.documents import Document
+        scores = defaultdict(float)
+        documents = {}
+        for rank, (doc_id, _, text) in enumerate(lexical):
+            scores[text] += 1.0 / (self.rrf_k + rank + 1)
+            documents.setdefault(text, Document(page_content=text, metadata={"id": doc_id}))
+        for rank, document in enumerate(vector):
+            scores[document.page_content] += 1.0 / (self.rrf_k + rank + 1)
+            documents.setdefault(document.page_content, document)
+        ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [documents[text] for text in ranked]
+
+    def retrieve_batch(self, queries: list, k: int = 3) -> list:
+        try:
+            self.ensure_index()
+        except Exception as e:
+            print(f"The Keyword Index Error : {e}")
+        from langchain_core.documents import Document
+        lexical = [self.keyword_index.search(query, k=k) for query in queries]
+        results = [None] * len(queries)
+        needs_vectors = []
+        for i, query in enumerate(queries):
+            if self._confident(query, lexical[i]):
+                self.counters["lexical_only"] += 1
+                results[i] = [Document(page_content=text, metadata={"id": doc_id}) for doc_id, _, text in lexical[i]]
+            else:
+                self.counters["hybrid"] += 1
+                needs_vectors.append(i)
+
+        if needs_vectors:
+            vector_results = self.doc_store.retrieve_similar_batch([queries[i] for i in needs_vectors], k=k)
+            for i, documents in zip(needs_vectors, vector_results):
+                results[i] = self._fuse(lexical[i], documents, k)
+        return results
+
+
+def _decode(value):
+    return value.decode("utf-8", errors="replace") if isinstance(value, bytes) else value
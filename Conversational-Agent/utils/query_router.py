@@ -0,0 +1,66 @@
+import re
+import threading
+from collections import Counter, deque
+
+LOOKUP = "lookup"
+EXPAND = "expand"
+
+#Cues for a single factual or inventory answer
+LOOKUP_CUES = re.compile(
+    r"\b(price|prices|cost|costs|how much|rate|on[- ]road|ex[- ]showroom|stock|available|availability|in stock|"
+    r"part|parts|spare|quantity|mileage|colou?rs?|timings?|open|address|location|emi|down ?payment|"
+    r"cc|engine capacity|weight|seat height|fuel tank)\b",
+    re.IGNORECASE
+)
+#Cues for open-ended questions that benefit from sub-question expansion
+EXPAND_CUES = re.compile(
+    r"\b(compare|comparison|vs|versus|difference|better|best|recommend|suggest|should i|which one|"
+    r"why|explain|tell me about|pros|cons|review|experience|latest|upcoming|features)\b",
+    re.IGNORECASE
+)
+#"Classic 350", "Hunter 350", "Interceptor 650" and similar model names
+MODEL_NAME = re.compile(r"\b[a-z]+\s?\d{3}\b", re.IGNORECASE)
+
+
+#Cheap local classifier deciding whether a message needs sub-question expansion
+class QueryRouter:
+    def __init__(self, max_lookup_words: int = 14, history_size: int = 100):
+        self.max_lookup_words = max_lookup_words
+        self.counters = Counter()
+        self.recent = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+
+    def classify(self, query: str, follow_up: bool = False):
+        words = query.split()
+        questions = query.count("?")
+        #A follow-up is rewritten against the conversation by the expansion step before anything is retrieved
+        if follow_up:
+            return EXPAND, "follow-up"
+        if EXPAND_CUES.search(query):
+            return EXPAND, "open-ended cue"
+        if questions > 1 or len(MODEL_NAME.findall(query)) > 1:
+            return EXPAND, "multiple questions or models"
+        if len(words) > self.max_lookup_words:
+            return EXPAND, "long query"
+        if LOOKUP_CUES.search(query):
+            return LOOKUP, "lookup cue"
+        if MODEL_NAME.search(query):
+            return LOOKUP, "single model name"
+        return EXPAND, "default"
+
+    def route(self, query: str, follow_up: bool = False) -> str:
+        route, reason = self.classify(query, follow_up=follow_up)
+        with self._lock:
+            self.counters[route] += 1
+            self.recent.append({"query": query, "route": route, "reason": reason})
+        return route
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self.counters.values())
+            return {
+                "total": total,
+                **{route: self.counters[route] for route in (LOOKUP, EXPAND)},
+                "lookup_share": self.counters[LOOKUP] / total if total else 0.0,
+                "recent": list(self.recent)[-10:]
+            }
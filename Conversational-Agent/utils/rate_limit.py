@@ -0,0 +1,99 @@
+import time
+import asyncio
+import threading
+
+
+#Token bucket shared by every caller of one upstream API. Callers reserve tokens up front and wait out any
+#deficit, so waiters are served roughly in arrival order; rate <= 0 means unlimited
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None, name: str = ""):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.name = name
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.counters = {"acquired": 0, "throttled": 0, "waited_s": 0.0}
+
+    def _reserve(self, cost: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= cost
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.counters["acquired"] += 1
+            if wait:
+                self.counters["throttled"] += 1
+                self.counters["waited_s"] += wait
+            return wait
+
+    #Blocking, for code running in worker threads (Tavily and embedding calls)
+    def acquire(self, cost: float = 1.0):
+        wait = self._reserve(cost)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, cost: float = 1.0):
+        wait = self._reserve(cost)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        return {**self.counters, "rate": self.rate}
+
+
+#Adapts a bucket to LangChain's rate limiter interface so ChatOpenAI waits on it before every request
+def langchain_rate_limiter(bucket: TokenBucket):
+    from langchain_core.rate_limiters import BaseRateLimiter
+
+    class BucketRateLimiter(BaseRateLimiter):
+        def acquire(self, *, blocking: bool = True) -> bool:
+            bucket.acquire()
+            return True
+
+        async def aacquire(self, *, blocking: bool = True) -> bool:
+            await bucket.aacquire()
+            return True
+
+    return BucketRateLimiter()
+
+
+#Any search backend (search(query) -> dict), limited; sits behind the web cache so only misses are counted
+class RateLimitedSearch:
+    def __init__(self, backend, bucket: TokenBucket):
+        self.backend = backend
+        self.bucket = bucket
+
+    def search(self, query: str) -> dict:
+        self.bucket.acquire()
+        return self.backend.search(query)
+
+
+#Raw embeddings client, limited; wrapped inside the embedding cache so cache hits cost nothing
+class RateLimitedEmbeddings:
+    def __init__(self, embeddings, bucket: TokenBucket):
+        self.embeddings = embeddings
+        self.bucket = bucket
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def embed_documents(self, texts: list) -> list:
+        self.bucket.acquire()
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        self.bucket.acquire()
+        return self.embeddings.embed_query(text)
+
+
+#A Cypher generator's complete(shape, notes) callable, limited; sits behind the Cypher cache so only new shapes are counted
+class RateLimitedCompletion:
+    def __init__(self, complete, bucket: TokenBucket):
+        self.complete = complete
+        self.bucket = bucket
+
+    def __call__(self, *args, **kwargs):
+        self.bucket.acquire()
+        return self.complete(*args, **kwargs)
@@ -0,0 +1,210 @@
+import re
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return re.sub(r"\s+", " ", query).strip()
+
+
+#Model names differ mostly by digits ("Classic 350" vs "Classic 650"), so those must match exactly
+def _numeric_tokens(normalized: str) -> frozenset:
+    return frozenset(re.findall(r"\d+", normalized))
+
+
+#Stored unit-length, so a cosine against a stored vector is a single dot product
+def _unit(vector) -> tuple:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return tuple(x / norm for x in vector) if norm else tuple(vector)
+
+
+def _dot(a, b) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+#Answer cache: in-process LRU in front of Redis, plus an optional embedding-similarity tier.
+#The semantic tier is capped at max_semantic_entries and bucketed by the numbers in the question,
+#so a miss is scored only against the few entries that name the same models.
+#Only the exact tier is shared through Redis: the semantic tier holds the questions this process answered,
+#so with several API workers a paraphrase hits only on the worker that saw the original
+class ResponseCache:
+    def __init__(
+            self,
+            redis_client,
+            embeddings=None,
+            prefix: str = "bike_cache",
+            ttl: int = 3600,
+            max_local_entries: int = 256,
+            semantic_threshold: float = 0.92,
+            max_semantic_entries: int = 256
+        ):
+        self.redis = redis_client
+        self.embeddings = embeddings
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_local_entries = max_local_entries
+        self.semantic_threshold = semantic_threshold
+        self.max_semantic_entries = max_semantic_entries
+        self._local = OrderedDict()
+        #numbers -> {key: (unit vector, expires_at)}; _semantic_order keeps every key in LRU order for the cap
+        self._semantic = {}
+        self._semantic_order = OrderedDict()
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"local_hits": 0, "redis_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    def _key(self, normalized: str) -> str:
+        return f"{self.prefix}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.embeddings is not None and self.semantic_threshold is not None
+
+    def _local_get(self, key: str):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key: str, value: str):
+        with self._lock:
+            self._local[key] = (value, time.time() + self.ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def _redis_get(self, key: str):
+        try:
+            value = self.redis.get(key)
+        except Exception as e:
+            print(f"The Cache Read Error : {e}")
+            return None
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    #The query is embedded exactly as retrieval embeds it, so with the shared embedding cache the vector search
+    #of a miss reuses this vector instead of calling the API again; memoised so set() does not re-embed either
+    def _embed(self, query: str):
+        with self._lock:
+            if query in self._vectors:
+                return self._vectors[query]
+        vector = _unit(self.embeddings.embed_query(query))
+        with self._lock:
+            self._vectors[query] = vector
+            while len(self._vectors) > self.max_semantic_entries:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def _semantic_match(self, normalized: str, vector):
+        now = time.time()
+        numbers = _numeric_tokens(normalized)
+        with self._lock:
+            bucket = self._semantic.get(numbers, {})
+            expired = [key for key, (_, expires_at) in bucket.items() if expires_at < now]
+            for key in expired:
+                self._semantic_remove(key)
+            candidates = list(bucket.items())
+        #Scored outside the lock, so concurrent lookups do not queue behind one scan
+        best_key, best_score = None, self.semantic_threshold
+        for key, (stored, _) in candidates:
+            score = _dot(vector, stored)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    #Caller holds the lock
+    def _semantic_remove(self, key: str):
+        numbers = self._semantic_order.pop(key, None)
+        bucket = self._semantic.get(numbers)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._semantic[numbers]
+
+    #Lookups run on many request threads at once, so counts are updated under the lock
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, query: str):
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        key = self._key(normalized)
+
+        value = self._local_get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+
+        value = self._redis_get(key)
+        if value is not None:
+            self._count("redis_hits")
+            self._local_set(key, value)
+            return value
+
+        if self.semantic_enabled:
+            try:
+                match = self._semantic_match(normalized, self._embed(query))
+            except Exception as e:
+                print(f"The Semantic Cache Error : {e}")
+                match = None
+            if match is not None:
+                value = self._local_get(match) or self._redis_get(match)
+                if value is not None:
+                    self._count("semantic_hits")
+                    self._local_set(key, value)
+                    return value
+
+        self._count("misses")
+        return None
+
+    def set(self, query: str, response: str):
+        normalized = normalize_query(query)
+        if not normalized or not response:
+            return
+        key = self._key(normalized)
+        self._local_set(key, response)
+        try:
+            self.redis.set(key, response, ex=self.ttl)
+        except Exception as e:
+            print(f"The Cache Write Error : {e}")
+
+        if self.semantic_enabled:
+            try:
+                vector = self._embed(query)
+            except Exception as e:
+                print(f"The Semantic Cache Error : {e}")
+                return
+            numbers = _numeric_tokens(normalized)
+            with self._lock:
+                self._semantic_remove(key)
+                self._semantic.setdefault(numbers, {})[key] = (vector, time.time() + self.ttl)
+                self._semantic_order[key] = numbers
+                while len(self._semantic_order) > self.max_semantic_entries:
+                    self._semantic_remove(next(iter(self._semantic_order)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            local_entries = len(self._local)
+            semantic_entries = len(self._semantic_order)
+        lookups = sum(counters.values())
+        hits = lookups - counters["misses"]
+        return {
+            **counters,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "local_entries": local_entries,
+            "semantic_entries": semantic_entries
+        }
@@ -0,0 +1,132 @@
+import queue
+import asyncio
+import threading
+import httpx
+from utils.assistant_agent import RoyalEnfieldBikeAssistant
+from utils.config import setting, provide_client
+from utils.telemetry import configure_sinks
+from db.executor import CypherExecutor
+
+_runtime = None
+_runtime_lock = threading.Lock()
+_STREAM_END = object()
+
+
+#Shared by the Streamlit runtime and the HTTP service so both build the assistant the same way
+def build_assistant(assistant_config: dict, http_client=None, http_async_client=None, redis_max_connections: int = 16):
+    assistant = RoyalEnfieldBikeAssistant(
+        **assistant_config,
+        redis_max_connections=redis_max_connections,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
+    #The graph path is only enabled where a Neo4j instance is configured
+    if setting("NEO4J_URI"):
+        assistant.graph_executor = CypherExecutor(redis_client=assistant.redis_cache)
+    return assistant
+
+
+#Opens the pooled Redis connection and the vector store before the first user message arrives
+def warm_up_assistant(assistant):
+    try:
+        assistant.redis_cache.ping()
+        assistant.doc_store.load_existing_store()
+        assistant.retriever.ensure_index()
+    except Exception as e:
+        print(f"The Warm Up Error : {e}")
+
+
+#One assistant, one connection pool, one set of HTTP clients and one event loop per process
+class AssistantRuntime:
+    def __init__(self, assistant_config: dict, redis_max_connections: int = 16, http_max_connections: int = 32):
+        #"jsonl[:path]" and/or "prometheus[:port]", comma separated
+        configure_sinks(setting("TELEMETRY_SINKS"))
+        limits = httpx.Limits(max_connections=http_max_connections, max_keepalive_connections=http_max_connections)
+        self.http_client = httpx.Client(limits=limits)
+        self.http_async_client = httpx.AsyncClient(limits=limits)
+        #Clients built later from the registry (OpenAI embeddings, the Cypher LLM) share these pools
+        provide_client("http_client", self.http_client)
+        provide_client("http_async_client", self.http_async_client)
+
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._run_loop, name="assistant-runtime-loop", daemon=True)
+        self._loop_thread.start()
+
+        self.assistant = build_assistant(assistant_config, self.http_client, self.http_async_client, redis_max_connections)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    #Schedules a coroutine on the long-lived loop and blocks the calling (Streamlit) thread for the result
+    def run(self, coro, timeout: float = None):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(timeout=timeout)
+
+    def ask(self, user_query: str, timeout: float = None, trace=None, conversation: str = None):
+        return self.run(self.assistant.processed_query(user_query=user_query, trace=trace, conversation=conversation), timeout=timeout)
+
+    #Drains an async generator on the long-lived loop and hands its items to a plain (Streamlit) iterator
+    def iterate(self, agen, timeout: float = None):
+        items = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put(item)
+            except Exception as e:
+                print(f"The Stream Error : {e}")
+            finally:
+                items.put(_STREAM_END)
+
+        asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        while True:
+            item = items.get(timeout=timeout)
+            if item is _STREAM_END:
+                return
+            yield item
+
+    def ask_stream(self, user_query: str, by_sentence: bool = False, timings: dict = None, timeout: float = None, trace=None, conversation: str = None):
+        return self.iterate(
+            self.assistant.stream_query(
+                user_query=user_query, by_sentence=by_sentence, timings=timings, trace=trace, conversation=conversation
+            ),
+            timeout=timeout
+        )
+
+    def warm_up(self):
+        warm_up_assistant(self.assistant)
+
+    def health_check(self) -> dict:
+        status = {"event_loop": self.loop.is_running(), "redis": False, "vector_store": False}
+        try:
+            status["redis"] = bool(self.assistant.redis_cache.ping())
+        except Exception as e:
+            print(f"The Redis Health Check Error : {e}")
+        try:
+            status["vector_store"] = self.assistant.doc_store.load_existing_store() is not None
+        except Exception as e:
+            print(f"The Vector Store Health Check Error : {e}")
+        status["healthy"] = all(status.values())
+        return status
+
+    def close(self):
+        if self.assistant.graph_executor is not None:
+            self.run(self.assistant.graph_executor.close())
+        self.run(self.http_async_client.aclose())
+        self.http_client.close()
+        if self.assistant.redis_pool is not None:
+            self.assistant.redis_pool.disconnect()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._loop_thread.join(timeout=5)
+
+
+def get_runtime(assistant_config: dict = None, **runtime_options) -> AssistantRuntime:
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                if assistant_config is None:
+                    raise ValueError("The assistant runtime has not been configured yet")
+                _runtime = AssistantRuntime(assistant_config, **runtime_options)
+    return _runtime
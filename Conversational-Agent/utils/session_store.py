@@ -0,0 +1,164 @@
+import re
+import json
+import threading
+from collections import deque
+from utils.utilsreq import split_sentences
+from utils.query_router import MODEL_NAME
+
+#Questions that only make sense with the conversation behind them ("what about its price?", "and in black?"):
+#a leading connective or an anaphoric pronoun, and no model name of their own
+LEADING = re.compile(r"^\s*(and|also|but|so|then|what about|how about|what else|which one|same for|compared to)\b", re.IGNORECASE)
+ANAPHOR = re.compile(
+    r"\b(it|its|it's|they|them|their|those|these|that one|this one|the other one|the same|same one|"
+    r"(?:that|this) (?:bike|model|one))\b",
+    re.IGNORECASE
+)
+
+
+def is_follow_up(query: str) -> bool:
+    if MODEL_NAME.search(query):
+        return False
+    return bool(LEADING.match(query) or ANAPHOR.search(query))
+
+
+#Extractive summary line for one folded turn; no model call, so reruns never wait on the LLM
+def summarize_turn(question: str, answer: str, max_chars: int = 160) -> str:
+    sentences = split_sentences(answer or "")
+    gist = sentences[0] if sentences else (answer or "")
+    if len(gist) > max_chars:
+        gist = gist[:max_chars].rsplit(" ", 1)[0] + "..."
+    return f"User asked: {question.strip()} | Assistant: {gist.strip()}"
+
+
+#Conversation of one chat session: the last `window` messages in memory, every message in a Redis list with a TTL,
+#and turns that fall out of the window folded into a bounded rolling summary
+class SessionHistory:
+    def __init__(
+            self,
+            session_id: str,
+            redis_client=None,
+            window: int = 20,
+            ttl: int = 7 * 24 * 3600,
+            summary_max_chars: int = 2000,
+            summarizer=None,
+            prefix: str = "session"
+        ):
+        self.session_id = session_id
+        self.redis = redis_client
+        self.window = window
+        self.ttl = ttl
+        self.summary_max_chars = summary_max_chars
+        #summarizer(question, answer) -> one line; defaults to the extractive summarize_turn
+        self.summarizer = summarizer or summarize_turn
+        self.prefix = prefix
+        self.recent = deque()
+        self.summary = ""
+        self.total = 0
+        self._pending_question = None
+        self._lock = threading.Lock()
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{self.session_id}:{name}"
+
+    def append(self, message: dict):
+        with self._lock:
+            self.recent.append(message)
+            self.total += 1
+            evicted = []
+            while len(self.recent) > self.window:
+                evicted.append(self.recent.popleft())
+            for old in evicted:
+                self._fold(old)
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                #Traces only feed the latency sidebar of recent messages and are not persisted
+                stored = {name: value for name, value in message.items() if name != "trace"}
+                pipe.rpush(self._key("messages"), json.dumps(stored, default=str))
+                pipe.expire(self._key("messages"), self.ttl)
+                if evicted:
+                    pipe.set(self._key("summary"), self.summary, ex=self.ttl)
+                pipe.execute()
+            except Exception as e:
+                print(f"The Session Store Write Error : {e}")
+
+    def _fold(self, message: dict):
+        if message.get("role") == "user":
+            self._pending_question = message.get("content", "")
+            return
+        if self._pending_question is None:
+            return
+        line = self.summarizer(self._pending_question, message.get("content", ""))
+        self._pending_question = None
+        lines = [entry for entry in self.summary.splitlines() if entry] + [line]
+        #The oldest lines go first once the summary outgrows its budget
+        while len(lines) > 1 and sum(len(entry) + 1 for entry in lines) > self.summary_max_chars:
+            lines.pop(0)
+        self.summary = "\n".join(lines)
+
+    def older_count(self) -> int:
+        return max(0, self.total - len(self.recent))
+
+    #Page 0 is the newest page of messages that are no longer in memory; each page is oldest first
+    def older_page(self, page: int = 0, page_size: int = 10) -> list:
+        older = self.older_count()
+        start = max(0, older - (page + 1) * page_size)
+        end = older - page * page_size - 1
+        if self.redis is None or end < start:
+            return []
+        try:
+            return [json.loads(raw) for raw in self.redis.lrange(self._key("messages"), start, end)]
+        except Exception as e:
+            print(f"The Session Store Read Error : {e}")
+            return []
+
+    #Question/answer pairs newest first, for the sidebar; pages past the in-memory window come from Redis
+    def turns_page(self, page: int = 0, page_size: int = 5) -> list:
+        in_memory = self._pairs(list(self.recent))[::-1]
+        if (page + 1) * page_size <= len(in_memory) or self.redis is None:
+            return in_memory[page * page_size:(page + 1) * page_size]
+        end = self.total - 1 - page * page_size * 2
+        start = max(0, end - page_size * 2)
+        if end < 0:
+            return []
+        try:
+            messages = [json.loads(raw) for raw in self.redis.lrange(self._key("messages"), start, end)]
+        except Exception as e:
+            print(f"The Session Store Read Error : {e}")
+            return in_memory[page * page_size:(page + 1) * page_size]
+        return self._pairs(messages)[::-1][:page_size]
+
+    @staticmethod
+    def _pairs(messages: list) -> list:
+        pairs = []
+        question = None
+        for message in messages:
+            if message.get("role") == "user":
+                question = message.get("content", "")
+            elif question is not None:
+                pairs.append((question, message.get("content", "")))
+                question = None
+        return pairs
+
+    def turn_count(self) -> int:
+        return self.total // 2
+
+    #What the assistant sees of the conversation: the rolling summary plus the last few turns, trimmed
+    def context(self, recent_turns: int = 2, max_chars: int = 400) -> str:
+        parts = [f"Earlier: {self.summary}"] if self.summary else []
+        for question, answer in self._pairs(list(self.recent))[-recent_turns:]:
+            answer = answer if len(answer) <= max_chars else answer[:max_chars].rsplit(" ", 1)[0] + "..."
+            parts.append(f"User: {question}\nAssistant: {answer}")
+        return "\n".join(parts)
+
+    def clear(self):
+        with self._lock:
+            self.recent.clear()
+            self.summary = ""
+            self.total = 0
+            self._pending_question = None
+        if self.redis is not None:
+            try:
+                self.redis.delete(self._key("messages"), self._key("summary"))
+            except Exception as e:
+                print(f"The Session Store Delete Error : {e}")
@@ -0,0 +1,327 @@
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+#Seconds; the last bucket is +Inf
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_span_depth = contextvars.ContextVar("span_depth", default=0)
+
+
+def _label_key(labels: dict):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+#Process-wide counters, stage latency histograms and stats collectors behind the Prometheus text format
+class MetricsRegistry:
+    def __init__(self, namespace: str = "assistant"):
+        self.namespace = namespace
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.setdefault(key, {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0})
+            index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if value <= bound), len(LATENCY_BUCKETS))
+            histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    #stats_fn() -> dict of numbers, read at scrape time (cache hit ratios, entry counts)
+    def register_collector(self, name: str, stats_fn):
+        with self._lock:
+            self._collectors[name] = stats_fn
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {f"{name}{_format_labels(labels)}": value for (name, labels), value in self._counters.items()}
+            histograms = {
+                f"{name}{_format_labels(labels)}": {"count": h["count"], "sum": h["sum"]}
+                for (name, labels), h in self._histograms.items()
+            }
+            collectors = dict(self._collectors)
+        gauges = {}
+        for name, stats_fn in collectors.items():
+            try:
+                gauges[name] = {key: value for key, value in stats_fn().items() if isinstance(value, (int, float))}
+            except Exception as e:
+                print(f"The Metrics Collector Error : {name} : {e}")
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            collectors = sorted(self._collectors.items())
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{self.namespace}_{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), h in histograms:
+            metric = f"{self.namespace}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, count in zip(list(LATENCY_BUCKETS) + [math.inf], h["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {h['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {h['count']}")
+        for name, stats_fn in collectors:
+            try:
+                stats = stats_fn()
+            except Exception as e:
+                print(f"The Metrics Collector Error : {name} : {e}")
+                continue
+            for key, value in sorted(stats.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f"{self.namespace}_{name}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+#Spans, token counts and counters for one unit of work, such as a chat message or an ingestion run
+class Trace:
+    def __init__(self, name: str = "message", **attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.counters = {}
+        self.errors = []
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, duration: float, depth: int = 0, **attrs):
+        with self._lock:
+            self.spans.append({"name": name, "start": start - self._started, "duration": duration, "depth": depth, **attrs})
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def error(self, stage: str, exc: Exception):
+        with self._lock:
+            self.errors.append({"stage": stage, "error": f"{type(exc).__name__}: {exc}"})
+        REGISTRY.inc("errors", stage=stage)
+
+    #Total seconds per stage in first-seen order; concurrent spans of one stage are summed
+    def breakdown(self) -> list:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+        totals = {}
+        for span in spans:
+            entry = totals.setdefault(span["name"], {"stage": span["name"], "seconds": 0.0, "calls": 0, "depth": span["depth"]})
+            entry["seconds"] += span["duration"]
+            entry["calls"] += 1
+        return list(totals.values())
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                "name": self.name,
+                "started_at": self.started_at,
+                "duration": self.duration,
+                "attrs": dict(self.attrs),
+                "counters": dict(self.counters),
+                "errors": list(self.errors),
+                "spans": list(self.spans),
+            }
+
+    @contextmanager
+    def activate(self):
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def finish(self) -> dict:
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+            REGISTRY.observe("trace_seconds", self.duration, trace=self.name)
+            record = self.to_dict()
+            for sink in list(_sinks):
+                try:
+                    sink.emit(record)
+                except Exception as e:
+                    print(f"The Telemetry Sink Error : {e}")
+        return self.to_dict()
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+#Times a stage into the stage histogram and the current (or given) trace; the yielded dict takes extra attributes
+@contextmanager
+def span(name: str, trace: Trace = None, **attrs):
+    trace = trace or current_trace()
+    depth = _span_depth.get()
+    token = _span_depth.set(depth + 1)
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        _span_depth.reset(token)
+        REGISTRY.observe("stage_seconds", duration, stage=name)
+        if trace is not None:
+            trace.add_span(name, started, duration, depth=depth, **attrs)
+
+
+def count(name: str, value: float = 1, trace: Trace = None, **labels):
+    REGISTRY.inc(name, value, **labels)
+    trace = trace or current_trace()
+    if trace is not None:
+        suffix = ".".join(label for _, label in _label_key(labels))
+        trace.count(f"{name}.{suffix}" if suffix else name, value)
+
+
+#Token usage as reported by the model (usage_metadata); falls back to a 4-characters-per-token estimate.
+#With model given, tokens are also labelled by model and the trace records which model served the stage
+def record_tokens(stage: str, usage: dict = None, output_text: str = "", prompt_text: str = "", trace: Trace = None, model: str = None):
+    usage = usage or {}
+    input_tokens = usage.get("input_tokens", math.ceil(len(prompt_text) / 4))
+    output_tokens = usage.get("output_tokens", math.ceil(len(output_text) / 4))
+    labels = {"model": model} if model else {}
+    count("llm_tokens", input_tokens, trace=trace, stage=stage, kind="input", **labels)
+    count("llm_tokens", output_tokens, trace=trace, stage=stage, kind="output", **labels)
+    trace = trace or current_trace()
+    if model and trace is not None:
+        trace.attrs.setdefault("models", {})[stage] = model
+    if not usage:
+        count("llm_token_estimates", 1, trace=trace, stage=stage)
+    return input_tokens, output_tokens
+
+
+#Writes every finished trace as one JSON line (stdout by default)
+class JsonLinesSink:
+    def __init__(self, path: str = None):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            else:
+                sys.stdout.write(line + "\n")
+                sys.stdout.flush()
+
+
+#Serves the registry at /metrics for a Prometheus scraper; traces themselves are not pushed anywhere.
+#The registry is per process, so with several service workers each one binds the first free port of
+#port..last_port and the scraper lists every port of the range as its own target
+class PrometheusSink:
+    def __init__(self, port: int = 9464, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY, last_port: int = None):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.registry = registry
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = sink.registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        for candidate in range(port, max(port, last_port or port) + 1):
+            try:
+                self.server = ThreadingHTTPServer((host, candidate), Handler)
+                break
+            except OSError as e:
+                if candidate >= (last_port or port):
+                    raise OSError(f"no free port in {port}-{last_port or port}: {e}") from e
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-endpoint", daemon=True)
+        self._thread.start()
+
+    def emit(self, record: dict):
+        pass
+
+    def close(self):
+        self.server.shutdown()
+
+
+_sinks = []
+_configured = set()
+_sinks_lock = threading.Lock()
+
+
+def add_sink(sink):
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+
+#"jsonl", "jsonl:/var/log/assistant.jsonl", "prometheus:9464" and, for several worker processes, "prometheus:9464-9471",
+#comma separated; each spec is set up once per process
+def configure_sinks(spec: str):
+    for item in [part.strip() for part in (spec or "").split(",") if part.strip()]:
+        with _sinks_lock:
+            if item in _configured:
+                continue
+            _configured.add(item)
+        kind, _, option = item.partition(":")
+        try:
+            if kind == "jsonl":
+                add_sink(JsonLinesSink(option or None))
+            elif kind == "prometheus":
+                first, _, last = (option or "9464").partition("-")
+                sink = add_sink(PrometheusSink(port=int(first), last_port=int(last) if last else None))
+                if last:
+                    print(f"The Metrics Endpoint of process {os.getpid()} listens on port {sink.port}")
+            else:
+                print(f"The Telemetry Sink {kind!r} is not supported")
+        except Exception as e:
+            print(f"The Telemetry Sink Error : {item} : {e}")
@@ -1,10 +1,16 @@
-import pyttsx3
 import tempfile
 import io
-from gtts import gTTS
+import wave
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.utilsreq import SENTENCE_BOUNDARY
+from utils.audio_cache import get_audio_store
+from utils.telemetry import REGISTRY, current_trace, span
 
 #Buffer and Streaming for faster transmission to user
+#Each engine is imported on first use, so the text-only paths never load it
 def speak_stream(text):
+    import pyttsx3
     engine = pyttsx3.init()
     buf = io.BytesIO()
     with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as fp:
@@ -17,12 +23,115 @@ def speak_stream(text):
     return buf
 
 def speaker_stream(text, lang="en"):
+    from gtts import gTTS
     buf = io.BytesIO()
     tts = gTTS(text=text, lang=lang)
     tts.write_to_fp(buf)
     buf.seek(0)
     return buf
 
+#gTTS needs the network and returns MP3; pyttsx3 runs offline and returns WAV
+ENGINES = {
+    "gtts": {"format": "audio/mp3", "workers": None, "synthesize": lambda text, lang: speaker_stream(text, lang=lang).getvalue()},
+    "pyttsx3": {"format": "audio/wav", "workers": 1, "synthesize": lambda text, lang: speak_stream(text).getvalue()},
+}
+
+#Extra engines (for example a benchmark stand-in) plug in with synthesize(text, lang) -> bytes
+def register_engine(name, synthesize_fn, format="audio/mp3", workers=None):
+    ENGINES[name] = {"format": format, "workers": workers, "synthesize": synthesize_fn}
+
+def audio_format(engine="gtts"):
+    return ENGINES[engine]["format"]
+
+def _synthesize_uncached(text, engine="gtts", lang="en", trace=None):
+    with span("tts_engine", trace=trace, engine=engine, chars=len(text)):
+        return ENGINES[engine]["synthesize"](text, lang)
+
+#Repeated sentences and stock phrases are served from the content-addressed audio store
+def synthesize(text, engine="gtts", lang="en", use_cache=True, trace=None):
+    with span("tts_synthesis", trace=trace, engine=engine, chars=len(text)):
+        if not use_cache:
+            return _synthesize_uncached(text, engine=engine, lang=lang, trace=trace)
+        return get_audio_store().get_or_create(
+            text, lambda: _synthesize_uncached(text, engine=engine, lang=lang, trace=trace), lang=lang, engine=engine
+        )
+
+#MP3 frames concatenate directly, WAV segments are re-framed under a single header
+def join_segments(segments, engine="gtts"):
+    buf = io.BytesIO()
+    if audio_format(engine) == "audio/wav" and segments:
+        with wave.open(buf, "wb") as out:
+            for i, segment in enumerate(segments):
+                with wave.open(io.BytesIO(segment), "rb") as part:
+                    if i == 0:
+                        out.setparams(part.getparams())
+                    out.writeframes(part.readframes(part.getnframes()))
+    else:
+        for segment in segments:
+            buf.write(segment)
+    buf.seek(0)
+    return buf
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+#One synthesis pool per engine and size for the whole process, shared by every message and session.
+#pyttsx3 drives a single native engine, so it is pinned to one worker
+def get_speech_executor(engine="gtts", workers=4):
+    max_workers = ENGINES[engine]["workers"] or workers
+    key = (engine, max_workers)
+    with _executors_lock:
+        if key not in _executors:
+            _executors[key] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"tts-{engine}")
+        return _executors[key]
+
+#Synthesizes sentence by sentence on the shared worker pool while the text is still arriving
+class SpeechPipeline:
+    def __init__(self, engine="gtts", lang="en", workers=4, use_cache=True, trace=None, executor=None):
+        self.engine = engine
+        self.lang = lang
+        self.use_cache = use_cache
+        #Worker threads do not inherit the caller's context, so the trace is carried explicitly
+        self.trace = trace or current_trace()
+        REGISTRY.register_collector("audio_cache", get_audio_store().stats)
+        self._pool = executor or get_speech_executor(engine, workers)
+        self._futures = []
+        self._buffer = ""
+
+    def _submit(self, sentence):
+        if sentence.strip():
+            self._futures.append(self._pool.submit(synthesize, sentence.strip(), self.engine, self.lang, self.use_cache, self.trace))
+
+    def feed(self, fragment):
+        self._buffer += fragment
+        sentences = SENTENCE_BOUNDARY.split(self._buffer)
+        self._buffer = sentences.pop()
+        for sentence in sentences:
+            self._submit(sentence)
+
+    #Flushes the trailing text and yields audio segments in sentence order
+    def segments(self):
+        self._submit(self._buffer)
+        self._buffer = ""
+        for future in self._futures:
+            yield future.result()
+
+    def join(self):
+        return join_segments(list(self.segments()), self.engine)
+
+    #Joins the segments into the audio store under the full text and returns its key
+    def save(self, text):
+        store = get_audio_store()
+        #Only the synthesis still outstanding once the text has finished streaming
+        with span("tts_finish", trace=self.trace, segments=len(self._futures)):
+            audio = self.join().getvalue()
+        return store.put(store.key_for(text, lang=self.lang, engine=self.engine), audio)
+
+def pipelined_speaker_stream(text, engine="gtts", lang="en", workers=4):
+    pipeline = SpeechPipeline(engine=engine, lang=lang, workers=workers)
+    pipeline.feed(text)
+    return pipeline.join()
+
 if __name__ == "__main__":
     text = "Hello all"
     output_wav = speaker_stream(text)
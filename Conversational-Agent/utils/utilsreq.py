@@ -1,4 +1,89 @@
 import re
+import json
+from utils.response_cache import normalize_query
 
 def clean_text(text):
     return re.sub(r'[^\w\s]', '', text)
+
+
+#Splits on whitespace that follows sentence-ending punctuation
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+def split_sentences(text):
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+
+FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+LIST_ITEM = re.compile(r"^\s*(?:[-*\u2022]|\d+[.)])\s+(.+)$")
+
+#Closes the string, arrays and objects a reply cut off at the token limit left open:
+#'{"questions": ["A?", "B' becomes '{"questions": ["A?", "B"]}'
+def _close_truncated(text):
+    closers = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+    if in_string:
+        text += "\\" if escaped else ""
+        text += '"'
+    text = text.rstrip().rstrip(",").rstrip()
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(closers))
+
+def _json_candidates(text):
+    for match in FENCE.finditer(text):
+        yield match.group(1)
+    yield text
+    #The outermost object or array inside chatty text ("Sure! Here you go: {...}")
+    for opening, closing in (("{", "}"), ("[", "]")):
+        start, end = text.find(opening), text.rfind(closing)
+        if start != -1 and end > start:
+            yield text[start:end + 1]
+    #Last resort: the reply was truncated before its closing brackets
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if starts:
+        yield _close_truncated(text[min(starts):])
+
+def _questions_from(value):
+    if isinstance(value, dict):
+        value = value.get("questions", next((item for item in value.values() if isinstance(item, list)), None))
+    if isinstance(value, list):
+        items = [item.get("question", "") if isinstance(item, dict) else item for item in value]
+        return [item for item in items if isinstance(item, str)]
+    return None
+
+#Sub-questions from a model reply that should be {"questions": [...]}: fenced or wrapped JSON, a bare list,
+#or failing all that, bulleted/numbered lines and lines ending in "?". Deduplicated and capped; [] when nothing is usable
+def parse_sub_questions(text, limit=4):
+    text = text or ""
+    questions = None
+    for candidate in _json_candidates(text):
+        try:
+            questions = _questions_from(json.loads(candidate))
+        except ValueError:
+            continue
+        if questions is not None:
+            break
+    if questions is None:
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        questions = [LIST_ITEM.match(line).group(1) for line in lines if LIST_ITEM.match(line)]
+        questions = questions or [line for line in lines if line.endswith("?")]
+    unique = {}
+    for question in questions:
+        question = question.strip().strip('"').strip()
+        if question:
+            unique.setdefault(normalize_query(question), question)
+    return [question for normalized, question in unique.items() if normalized][:limit]
@@ -0,0 +1,436 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+import numpy as np
+from utils.config import setting
+
+#On-disk layout of one index directory. Every file except the header is a fixed-width array opened with np.memmap,
+#so loading is mapping files, not parsing them, and processes opening the same directory share the page cache
+HEADER = "header.json"
+VECTORS = "vectors.bin"
+SCALES = "scales.f32"
+LIVE = "live.u8"
+SPANS = "spans.u64"
+RECORDS = "records.bin"
+DTYPES = {"float32": np.float32, "int8": np.int8}
+
+
+def index_path(index_name: str) -> str:
+    return os.path.join(setting("LOCAL_INDEX_DIR"), index_name)
+
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+#Positional read that leaves the handle's offset alone, so concurrent searches can share one handle
+_READ_LOCK = threading.Lock()
+
+def _read_at(handle, offset: int, size: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(handle.fileno(), size, offset)
+    with _READ_LOCK:
+        handle.seek(offset)
+        return handle.read(size)
+
+
+def _write_header(path: str, header: dict):
+    tmp_path = os.path.join(path, f".{HEADER}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(header, f)
+    #Readers see either the old or the new row count, never a partial header
+    os.replace(tmp_path, os.path.join(path, HEADER))
+
+
+#Exact cosine KNN over a memory-mapped float32 (or int8-quantized) matrix with a compact record sidecar.
+#Rows are L2-normalized on insert, so scoring is one matrix product; deletes clear a live flag and
+#snapshot() writes a compacted copy. One process writes, any number read the same directory
+class LocalVectorIndex:
+    def __init__(
+            self,
+            path: str,
+            embeddings=None,
+            dtype: str = "float32",
+            readonly: bool = False,
+            refresh_interval: float = 1.0,
+            block_rows: int = 65536
+        ):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {sorted(DTYPES)}, got {dtype!r}")
+        self.path = path
+        self.embeddings = embeddings
+        self.readonly = readonly
+        self.refresh_interval = refresh_interval
+        self.block_rows = block_rows
+        #uid changes whenever the directory is rebuilt (snapshot or compaction over it), version on every write
+        self.header = {"uid": uuid.uuid4().hex, "dim": None, "dtype": dtype, "count": 0, "capacity": 0, "deleted": 0, "version": 0}
+        self._arrays = None
+        self._keys = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        #A reader opened before the first ingestion stays empty until the writer creates the index
+        if os.path.exists(os.path.join(path, HEADER)):
+            self._open()
+
+    @property
+    def dtype(self) -> str:
+        return self.header["dtype"]
+
+    def __len__(self):
+        return self.header["count"] - self.header["deleted"]
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _map(self, name: str, dtype, shape):
+        return np.memmap(self._file(name), dtype=dtype, mode="r" if self.readonly else "r+", shape=shape)
+
+    def _read_header(self) -> dict:
+        with open(self._file(HEADER)) as f:
+            return json.load(f)
+
+    def _open(self):
+        self.header = self._read_header()
+        self._remap()
+
+    def _remap(self):
+        capacity, dim = self.header["capacity"], self.header["dim"]
+        if not capacity:
+            self._arrays = None
+            return
+        self._arrays = {
+            "vectors": self._map(VECTORS, DTYPES[self.dtype], (capacity, dim)),
+            "scales": self._map(SCALES, np.float32, (capacity,)) if self.dtype == "int8" else None,
+            "live": self._map(LIVE, np.uint8, (capacity,)),
+            "spans": self._map(SPANS, np.uint64, (capacity, 2)),
+            #Opened with the spans it is read through: after a compaction swaps the directory, a reader that has
+            #not refreshed yet keeps resolving its old offsets against the old records file, not the new one
+            "records": open(self._file(RECORDS), "rb", buffering=0),
+        }
+
+    #Readers pick up rows appended or deleted by the writer process at most refresh_interval seconds late
+    def _maybe_refresh(self):
+        if not self.readonly or time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            header = self._read_header()
+        except (FileNotFoundError, ValueError):
+            return
+        if (header["uid"], header["version"]) == (self.header["uid"], self.header["version"]):
+            return
+        with self._lock:
+            remap = header["uid"] != self.header["uid"] or header["capacity"] != self.header["capacity"]
+            self.header = header
+            if remap:
+                self._remap()
+
+    def _grow(self, needed: int, dim: int):
+        capacity = self.header["capacity"]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        os.makedirs(self.path, exist_ok=True)
+        if self._arrays is not None:
+            for array in self._arrays.values():
+                if array is not None:
+                    array.flush()
+        widths = {VECTORS: dim * np.dtype(DTYPES[self.dtype]).itemsize, LIVE: 1, SPANS: 16}
+        if self.dtype == "int8":
+            widths[SCALES] = 4
+        for name, width in widths.items():
+            #Extending a file leaves the existing pages, and any reader's mapping of them, untouched
+            with open(self._file(name), "ab") as f:
+                f.truncate(new_capacity * width)
+        open(self._file(RECORDS), "ab").close()
+        self.header.update(dim=dim, capacity=new_capacity)
+        self._remap()
+
+    def _records(self, arrays: dict, rows) -> list:
+        records = []
+        for row in rows:
+            start, end = (int(value) for value in arrays["spans"][row])
+            records.append(json.loads(_read_at(arrays["records"], start, end - start)))
+        return records
+
+    #key -> row for live rows; only writers need it, so it is built on the first add or delete
+    def _key_rows(self) -> dict:
+        if self._keys is None:
+            self._keys = {}
+            if self._arrays is not None:
+                rows = np.flatnonzero(self._arrays["live"][:self.header["count"]])
+                for row, record in zip(rows, self._records(self._arrays, rows)):
+                    self._keys[record["key"]] = int(row)
+        return self._keys
+
+    def _commit(self, **changes):
+        for array in self._arrays.values():
+            if array is not None:
+                array.flush()
+        self.header.update(changes, version=self.header["version"] + 1)
+        _write_header(self.path, self.header)
+
+    def add_vectors(self, vectors, texts: list, metadatas: list = None, keys: list = None) -> list:
+        if self.readonly:
+            raise PermissionError(f"{self.path} is opened read-only")
+        matrix = _normalize(vectors)
+        if matrix.shape[0] != len(texts):
+            raise ValueError(f"{matrix.shape[0]} vectors for {len(texts)} texts")
+        metadatas = metadatas or [{} for _ in texts]
+        keys = [str(key) for key in keys] if keys else [uuid.uuid4().hex for _ in texts]
+        with self._lock:
+            dim = self.header["dim"] or matrix.shape[1]
+            if matrix.shape[1] != dim:
+                raise ValueError(f"vectors have {matrix.shape[1]} dimensions, the index has {dim}")
+            key_rows = self._key_rows()
+            start = self.header["count"]
+            self._grow(start + len(texts), dim)
+            arrays = self._arrays
+            rows = slice(start, start + len(texts))
+            if self.dtype == "int8":
+                #Symmetric per-row quantization; the stored scale turns int8 dot products back into cosines
+                peaks = np.abs(matrix).max(axis=1)
+                peaks[peaks == 0] = 1.0
+                arrays["vectors"][rows] = np.round(matrix * (127.0 / peaks)[:, None]).astype(np.int8)
+                arrays["scales"][rows] = peaks / 127.0
+            else:
+                arrays["vectors"][rows] = matrix
+            with open(self._file(RECORDS), "ab") as f:
+                offset = f.tell()
+                for i, (key, text, metadata) in enumerate(zip(keys, texts, metadatas)):
+                    payload = json.dumps({"key": key, "text": text, "metadata": metadata}, default=str).encode("utf-8")
+                    f.write(payload)
+                    arrays["spans"][start + i] = (offset, offset + len(payload))
+                    offset += len(payload)
+            #Marked live first, so a key repeated within this batch retires its own earlier row as well
+            arrays["live"][rows] = 1
+            replaced = 0
+            for i, key in enumerate(keys):
+                #Re-adding a key replaces its row, matching how a Redis hash write overwrites
+                if key in key_rows:
+                    arrays["live"][key_rows[key]] = 0
+                    replaced += 1
+                key_rows[key] = start + i
+            self._commit(count=start + len(texts), deleted=self.header["deleted"] + replaced)
+        return keys
+
+    #Same call shape as the LangChain vector stores used by DocumentStore and ingest_csv
+    def add_texts(self, texts: list, metadatas: list = None, keys: list = None, **kwargs) -> list:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(self.embeddings.embed_documents(texts), texts, metadatas=metadatas, keys=keys)
+
+    def delete(self, ids: list = None, **kwargs) -> bool:
+        if self.readonly:
+            raise PermissionError(f"{self.path} is opened read-only")
+        with self._lock:
+            key_rows = self._key_rows()
+            rows = [key_rows.pop(str(key)) for key in ids or [] if str(key) in key_rows]
+            if rows:
+                self._arrays["live"][rows] = 0
+                self._commit(deleted=self.header["deleted"] + len(rows))
+        return bool(rows)
+
+    def _scores(self, arrays: dict, count: int, queries: np.ndarray) -> np.ndarray:
+        scores = np.empty((queries.shape[0], count), dtype=np.float32)
+        #Scored in blocks so an int8 matrix is widened a block at a time, not all at once
+        for start in range(0, count, self.block_rows):
+            end = min(count, start + self.block_rows)
+            block = arrays["vectors"][start:end]
+            if self.dtype == "int8":
+                scores[:, start:end] = (queries @ block.astype(np.float32).T) * arrays["scales"][start:end]
+            else:
+                scores[:, start:end] = queries @ block.T
+        scores[:, arrays["live"][:count] == 0] = -np.inf
+        return scores
+
+    #Returns [(record, score)] per query, best first
+    def search(self, vectors, k: int = 4) -> list:
+        self._maybe_refresh()
+        with self._lock:
+            arrays, count = self._arrays, self.header["count"]
+        queries = _normalize(vectors)
+        if arrays is None or count == 0 or k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+        scores = self._scores(arrays, count, queries)
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            ranked = [int(row) for row in candidates[np.argsort(-query_scores[candidates])] if np.isfinite(query_scores[row])]
+            results.append(list(zip(self._records(arrays, ranked), (float(query_scores[row]) for row in ranked))))
+        return results
+
+    def _documents(self, hits: list) -> list:
+        from langchain_core.documents import Document
+        return [
+            Document(
+                page_content=record["text"],
+                metadata={**record["metadata"], "id": record["key"], "distance": 1.0 - score}
+            )
+            for record, score in hits
+        ]
+
+    #Every query in one matrix product; DocumentStore uses this instead of a search per vector
+    def similarity_search_by_vectors(self, vectors: list, k: int = 4) -> list:
+        return [self._documents(hits) for hits in self.search(vectors, k=k)]
+
+    def similarity_search_by_vector(self, embedding: list, k: int = 4, **kwargs) -> list:
+        return self.similarity_search_by_vectors([embedding], k=k)[0]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> list:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k)
+
+    #(key, text) of every live row, for bootstrapping the keyword index without Redis
+    def records(self):
+        self._maybe_refresh()
+        with self._lock:
+            arrays, count = self._arrays, self.header["count"]
+        if arrays is None:
+            return
+        rows = np.flatnonzero(arrays["live"][:count])
+        for start in range(0, len(rows), self.block_rows):
+            for record in self._records(arrays, rows[start:start + self.block_rows]):
+                yield record["key"], record["text"]
+
+    #Writes a compacted copy (live rows only) to destination, replacing it atomically; load it with LocalVectorIndex(destination)
+    def snapshot(self, destination: str, dtype: str = None) -> dict:
+        dtype = dtype or self.dtype
+        staging = f"{destination.rstrip(os.sep)}.{os.getpid()}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        with self._lock:
+            arrays, count = self._arrays, self.header["count"]
+            copy = LocalVectorIndex(staging, dtype=dtype)
+            if arrays is not None:
+                live_rows = np.flatnonzero(arrays["live"][:count])
+                for start in range(0, len(live_rows), self.block_rows):
+                    rows = live_rows[start:start + self.block_rows]
+                    vectors = arrays["vectors"][rows].astype(np.float32)
+                    if self.dtype == "int8":
+                        vectors *= arrays["scales"][rows][:, None]
+                    records = self._records(arrays, rows)
+                    copy.add_vectors(
+                        vectors,
+                        [record["text"] for record in records],
+                        metadatas=[record["metadata"] for record in records],
+                        keys=[record["key"] for record in records]
+                    )
+            if copy.header["dim"] is None:
+                os.makedirs(staging, exist_ok=True)
+                _write_header(staging, copy.header)
+        previous = f"{destination.rstrip(os.sep)}.{os.getpid()}.old"
+        if os.path.exists(destination):
+            os.replace(destination, previous)
+        os.replace(staging, destination)
+        shutil.rmtree(previous, ignore_errors=True)
+        return dict(copy.header)
+
+    #Compacts in place by snapshotting over this directory and re-opening it
+    def compact(self) -> dict:
+        with self._lock:
+            header = self.snapshot(self.path)
+            self._keys = None
+            self._open()
+        return header
+
+    def stats(self) -> dict:
+        header = self.header
+        row_bytes = (header["dim"] or 0) * np.dtype(DTYPES[self.dtype]).itemsize
+        return {
+            "rows": len(self),
+            "deleted": header["deleted"],
+            "dim": header["dim"],
+            "dtype": self.dtype,
+            "matrix_mb": header["count"] * row_bytes / 1e6,
+        }
+
+
+#Copies an existing Redis vector index (text, float32 embedding and metadata fields of every hash) into a local index
+def import_redis(index: LocalVectorIndex, redis_client, index_name: str, content_field: str = "text",
+                 vector_field: str = "embedding", batch_size: int = 500) -> int:
+    keys = []
+    imported = 0
+
+    def flush():
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        texts, vectors, metadatas, ids = [], [], [], []
+        for key, fields in zip(keys, pipe.execute()):
+            fields = {(name.decode() if isinstance(name, bytes) else name): value for name, value in fields.items()}
+            if content_field not in fields or vector_field not in fields:
+                continue
+            text = fields.pop(content_field)
+            vectors.append(np.frombuffer(fields.pop(vector_field), dtype=np.float32))
+            texts.append(text.decode("utf-8", errors="replace") if isinstance(text, bytes) else text)
+            metadatas.append({
+                name: value.decode("utf-8", errors="replace") if isinstance(value, bytes) else value
+                for name, value in fields.items()
+            })
+            ids.append(key.decode() if isinstance(key, bytes) else key)
+        if ids:
+            index.add_vectors(np.stack(vectors), texts, metadatas=metadatas, keys=ids)
+        keys.clear()
+        return len(ids)
+
+    for key in redis_client.scan_iter(match=f"{index_name}:*", count=batch_size, _type="HASH"):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            imported += flush()
+    if keys:
+        imported += flush()
+    return imported
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Manage the local memory-mapped vector index")
+    parser.add_argument("--index", default=setting("VECTOR_INDEX"))
+    parser.add_argument("--path", default=None, help="index directory (default: LOCAL_INDEX_DIR/<index>)")
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default=setting("LOCAL_INDEX_DTYPE"))
+    parser.add_argument("--import-redis", action="store_true", help="copy the Redis vector index into the local one")
+    parser.add_argument("--snapshot", metavar="DESTINATION", help="write a compacted copy")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--bench", type=int, metavar="ROWS", help="time KNN over ROWS random vectors in a scratch index")
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+    path = args.path or index_path(args.index)
+
+    if args.bench:
+        import tempfile
+        scratch = tempfile.mkdtemp(prefix="vector_bench_")
+        try:
+            bench = LocalVectorIndex(scratch, dtype=args.dtype)
+            rng = np.random.default_rng(0)
+            for start in range(0, args.bench, 10000):
+                rows = min(10000, args.bench - start)
+                bench.add_vectors(rng.standard_normal((rows, args.dim), dtype=np.float32), [""] * rows)
+            queries = rng.standard_normal((200, args.dim), dtype=np.float32)
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                bench.search([query], k=3)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            print(f"{args.bench} rows x {args.dim} {args.dtype}: p50 {timings[len(timings) // 2] * 1000:.3f} ms, "
+                  f"p95 {timings[int(len(timings) * 0.95)] * 1000:.3f} ms")
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    else:
+        index = LocalVectorIndex(path, dtype=args.dtype)
+        if args.import_redis:
+            import redis
+            client = redis.Redis.from_url(setting("REDIS_URL", required=True))
+            print(f"The Import copied {import_redis(index, client, args.index)} vectors")
+        if args.compact:
+            index.compact()
+        if args.snapshot:
+            index.snapshot(args.snapshot)
+        print(index.stats())
@@ -0,0 +1,130 @@
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from utils.response_cache import normalize_query
+
+
+class TavilyBackend:
+    def __init__(self, api_key: str):
+        from tavily import TavilyClient
+        self.client = TavilyClient(api_key=api_key)
+
+    def search(self, query: str) -> dict:
+        return self.client.search(query)
+
+
+#Offline stand-in for Tavily: canned results per normalized query plus optional simulated latency
+class StubSearchBackend:
+    def __init__(self, results: dict = None, latency: float = 0.0):
+        self.results = {normalize_query(query): result for query, result in (results or {}).items()}
+        self.latency = latency
+        self.calls = 0
+
+    def search(self, query: str) -> dict:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.results.get(normalize_query(query), {"query": query, "results": []})
+
+
+#TTL cache in front of a search backend, with single-flight for identical searches already running
+class WebSearchCache:
+    def __init__(
+            self,
+            backend,
+            redis_client=None,
+            ttl: int = 900,
+            max_local_entries: int = 1024,
+            prefix: str = "web_cache"
+        ):
+        self.backend = backend
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_local_entries = max_local_entries
+        self.prefix = prefix
+        self._local = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.counters = {"local_hits": 0, "redis_hits": 0, "coalesced": 0, "misses": 0}
+
+    @staticmethod
+    def unique(queries: list) -> list:
+        merged = OrderedDict()
+        for query in queries:
+            merged.setdefault(normalize_query(query), query)
+        return [query for normalized, query in merged.items() if normalized]
+
+    def _local_get(self, normalized: str):
+        with self._lock:
+            entry = self._local.get(normalized)
+            if entry is None:
+                return None
+            result, expires_at = entry
+            if expires_at < time.time():
+                del self._local[normalized]
+                return None
+            self._local.move_to_end(normalized)
+            return result
+
+    def _local_set(self, normalized: str, result):
+        with self._lock:
+            self._local[normalized] = (result, time.time() + self.ttl)
+            self._local.move_to_end(normalized)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def _fetch(self, query: str, normalized: str):
+        key = f"{self.prefix}:{normalized}"
+        if self.redis is not None:
+            try:
+                stored = self.redis.get(key)
+                if stored:
+                    self.counters["redis_hits"] += 1
+                    result = json.loads(stored)
+                    self._local_set(normalized, result)
+                    return result
+            except Exception as e:
+                print(f"The Web Cache Read Error : {e}")
+
+        self.counters["misses"] += 1
+        result = self.backend.search(query)
+        self._local_set(normalized, result)
+        if self.redis is not None:
+            try:
+                self.redis.set(key, json.dumps(result), ex=self.ttl)
+            except Exception as e:
+                print(f"The Web Cache Write Error : {e}")
+        return result
+
+    def _forget(self, normalized: str, task):
+        self._inflight.pop(normalized, None)
+        #Marks the exception as retrieved even when every waiter has already timed out
+        if not task.cancelled():
+            task.exception()
+
+    async def search(self, query: str):
+        normalized = normalize_query(query)
+        result = self._local_get(normalized)
+        if result is not None:
+            self.counters["local_hits"] += 1
+            return result
+
+        #The fetch runs as its own task so one caller timing out never cancels it for the others
+        task = self._inflight.get(normalized)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(self._fetch, query, normalized))
+            self._inflight[normalized] = task
+            task.add_done_callback(lambda done: self._forget(normalized, done))
+        else:
+            self.counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        lookups = sum(self.counters.values())
+        return {
+            **self.counters,
+            "hit_ratio": (lookups - self.counters["misses"]) / lookups if lookups else 0.0,
+            "local_entries": len(self._local)
+        }